@@ -0,0 +1,22 @@
+// Made by Kiwi!
+
+// Client side of background_server.BackgroundServer. While the model plays, every step
+// request asks for a frame of the model running in the background, and stopping pauses
+// it. The step counter shows the model's own step, since frames can skip steps.
+const BackgroundControl = function () {
+  const stop = controller.stop;
+  controller.stop = function () {
+    stop.call(this);
+    send({ type: "pause" });
+  };
+  controller.step = function () {
+    send({ type: "get_step", background: this.running });
+  };
+
+  this.render = function (step) {
+    controller.tick = step;
+    stepDisplay.innerText = step;
+  };
+
+  this.reset = function () {};
+};
@@ -0,0 +1,81 @@
+// Made by Kiwi!
+
+// Draws the frames of delta_canvas.DeltaCanvasGrid. A frame is either the whole grid as one
+// byte per cell, or the indices and bytes of the cells that changed since the last frame.
+// Cell bytes are 0 for an empty cell, otherwise type code * 2, plus 1 for an output of 1.
+const DeltaCanvasModule = function (canvas_width, canvas_height) {
+  const canvas = document.createElement("canvas");
+  Object.assign(canvas, {
+    width: canvas_width,
+    height: canvas_height,
+    style: "border:1px dotted",
+  });
+  document.getElementById("elements").appendChild(canvas);
+  const context = canvas.getContext("2d");
+
+  // Indexed by type code, see model.py
+  const colors = [null, "#0000FF", "#FF0000", "#808080", "#00FF00", "#000000"];
+
+  let width = 0;
+  let height = 0;
+  let cells = new Uint8Array(0);
+
+  const decode = function (text) {
+    const binary = atob(text);
+    const bytes = new Uint8Array(binary.length);
+    for (let i = 0; i < binary.length; i++) {
+      bytes[i] = binary.charCodeAt(i);
+    }
+    return bytes;
+  };
+
+  const drawCell = function (index) {
+    const cellWidth = canvas_width / width;
+    const cellHeight = canvas_height / height;
+    const x = Math.floor(index / height);
+    // The grid's origin is the bottom left corner
+    const y = height - 1 - (index % height);
+    context.clearRect(x * cellWidth, y * cellHeight, cellWidth, cellHeight);
+
+    const code = cells[index];
+    if (code === 0) {
+      return;
+    }
+    const radius = (Math.min(cellWidth, cellHeight) / 2 - 1) * (code & 1 ? 0.5 : 1);
+    context.beginPath();
+    context.arc((x + 0.5) * cellWidth, (y + 0.5) * cellHeight, Math.max(radius, 0.5), 0, 2 * Math.PI);
+    context.fillStyle = colors[code >> 1];
+    context.fill();
+  };
+
+  this.render = function (frame) {
+    const codes = decode(frame.codes);
+    if (frame.full) {
+      width = frame.width;
+      height = frame.height;
+      cells = codes;
+      context.clearRect(0, 0, canvas_width, canvas_height);
+      for (let i = 0; i < cells.length; i++) {
+        if (cells[i] !== 0) {
+          drawCell(i);
+        }
+      }
+      return;
+    }
+
+    const indexBytes = decode(frame.indices);
+    const indices = new DataView(indexBytes.buffer);
+    for (let i = 0; i < codes.length; i++) {
+      const index = indices.getUint32(4 * i, true);
+      cells[index] = codes[i];
+      drawCell(index);
+    }
+  };
+
+  this.reset = function () {
+    width = 0;
+    height = 0;
+    cells = new Uint8Array(0);
+    context.clearRect(0, 0, canvas_width, canvas_height);
+  };
+};
@@ -0,0 +1,54 @@
+// Made by Kiwi!
+
+// Line chart of background_server.StepChart. Every frame carries all the steps since the
+// previous frame, so no points are lost when the server skips steps.
+const StepChartModule = function (series, canvas_width, canvas_height) {
+  const canvas = document.createElement("canvas");
+  Object.assign(canvas, {
+    width: canvas_width,
+    height: canvas_height,
+    style: "border:1px dotted",
+  });
+  document.getElementById("elements").appendChild(canvas);
+  const context = canvas.getContext("2d");
+
+  const datasets = series.map((s) => ({
+    borderColor: s.Color,
+    label: s.Label,
+    data: [],
+    pointRadius: 0,
+  }));
+
+  const chart = new Chart(context, {
+    type: "line",
+    data: { labels: [], datasets: datasets },
+    options: {
+      responsive: true,
+      animation: false,
+      scales: {
+        x: { display: true, ticks: { maxTicksLimit: 11 } },
+        y: { display: true },
+      },
+    },
+  });
+
+  this.render = function (frame) {
+    for (let i = 0; i < frame.steps.length; i++) {
+      chart.data.labels.push(frame.steps[i]);
+    }
+    frame.values.forEach((values, i) => {
+      for (let j = 0; j < values.length; j++) {
+        chart.data.datasets[i].data.push(values[j]);
+      }
+    });
+    chart.update();
+  };
+
+  this.reset = function () {
+    chart.data.labels.length = 0;
+    chart.data.datasets.forEach((dataset) => {
+      dataset.data.length = 0;
+    });
+    chart.update();
+  };
+};
@@ -0,0 +1,670 @@
+# Made by Kiwi!
+
+import numpy as np
+import os
+
+from model import (
+    EMPTY,
+    TRUSTING,
+    UNTRUSTING,
+    SEMI_TRUSTING,
+    BENIGN,
+    MALICIOUS,
+    TYPE_NAMES,
+    CASCADE_COLUMNS,
+    LLM_CSV_HEADER,
+    check_convergence,
+    output_data_to_file1,
+)
+from convergence import ConvergenceMonitor
+from metrics import MODEL_REPORTERS, ColumnCollector, step_reporters
+from space import moore_offsets
+
+# How many neighbors a human listens to in set_informed_or_not
+NUM_INFLUENCERS = 4
+# Upper bound on the (humans x neighbors) scratch arrays built in the influence phase
+CHUNK_CELLS = 1 << 22
+# Every per-agent array, these travel with the agent when it moves
+AGENT_FIELDS = (
+    "kind", "output", "confidence", "information", "LLMtrustCoefficient",
+    "flipCount", "stepsSinceFlip", "justFlipped", "LLMThatFlipped",
+    "numNeigborsFlipped", "totalNumMovesPerAgent", "lastMoveWasRandom",
+    "isHappy", "flipped",
+)
+
+
+def ring_offsets(distance, width, height):
+    '''
+    Offsets of the cells exactly `distance` steps away (Chebyshev) on a width x height torus
+    '''
+    return [
+        (dx, dy) for dx, dy in moore_offsets(distance, width, height)
+        if max(abs(dx), abs(dy)) == distance
+    ]
+
+
+def window_sum(values, radius):
+    '''
+    Sum of `values` over the Moore neighborhood of every cell, center excluded, on a torus
+    The box is summed one axis at a time, so the cost does not grow with radius squared.
+    The grid is the last two axes, any axes before them are separate grids (see ensemble.py)
+    '''
+    total = values.astype(np.int32)
+    for axis in (-2, -1):
+        size = total.shape[axis]
+        if 2 * radius + 1 >= size:
+            # The neighborhood wraps around the whole axis, every cell is counted once
+            total = np.broadcast_to(total.sum(axis=axis, keepdims=True), total.shape).copy()
+        else:
+            summed = total.copy()
+            for shift in range(1, radius + 1):
+                summed += np.roll(total, shift, axis=axis)
+                summed += np.roll(total, -shift, axis=axis)
+            total = summed
+    return total - values
+
+
+class Tile:
+    """
+    A band of rows (x values) of the grid, the whole grid by default
+
+    A tile reads the grid with `halo` extra rows on both sides, wrapping around the torus,
+    so window sums over the rows it owns come out the same as over the whole grid.
+    """
+
+    def __init__(self, width, height, start=0, stop=None, halo=0):
+        """
+        Create a tile.
+
+        Args:
+            width, height: Size of the grid
+            start, stop: The rows the tile owns, the whole grid by default
+            halo: Rows read on both sides of the tile, at least the radius of any window sum
+        """
+        self.height = height
+        self.start = start
+        self.stop = width if stop is None else stop
+        self.halo = halo
+        if halo:
+            self.index = np.arange(self.start - halo, self.stop + halo) % width
+        else:
+            self.index = slice(self.start, self.stop)
+
+    def read(self, array):
+        '''
+        The rows of array the tile owns, plus its halo
+        '''
+        return array[self.index]
+
+    def own(self, array):
+        '''
+        The rows of array the tile owns, as a view that can be written to
+        '''
+        return array[self.start:self.stop]
+
+    def window_sum(self, values, radius):
+        '''
+        window_sum of values read with read(), for the rows the tile owns
+        '''
+        total = window_sum(values, radius)
+        return total[self.halo:len(total) - self.halo]
+
+    def cells(self, mask):
+        '''
+        Flat grid indices of the cells set in mask, a mask over the rows the tile owns
+        '''
+        return np.flatnonzero(mask) + self.start * self.height
+
+
+class ArraySimulation:
+    """
+    Simulation Model for a community with Human Agents and LLM Agents, stored as NumPy arrays
+
+    Every agent field lives in a (width, height) array indexed like the Mesa grid, so a
+    step runs each phase of HumanAgent.step over the whole grid at once. All humans update
+    synchronously from the state at the start of each phase, where the agent model
+    updates them one at a time in random order.
+
+    Relocation differs the most. Who should move, and the cells they may move to, are judged
+    on the grid at the start of the step. A contested cell goes to one human in a random
+    order, and the others fall back to their next suitable cell. A cell vacated during the
+    step only becomes a destination the next step, and a human doesn't become happy because
+    someone moved next to it. So the engine moves less and ends with fewer happy humans than
+    the agent model: at radius 2 and inconvenienceThreshold 3 on 50x50, over 100 steps, 25k
+    moves against 44k and 81% of the humans happy against 94%.
+    """
+
+    def __init__(
+        self,
+        height=20,
+        width=20,
+        trustingHumans=0.5,
+        untrustingHumans=0.5,
+        proportionLLMs=0.05,
+        maliciousLLMs=0.5,
+        radius=1,
+        inconvenienceThreshold=1,
+        resistance=0.5,
+        density=0.8,
+        maxIterations=100,
+        seed=None,
+        outputDir=".",
+        convergenceWindow=None,
+        convergenceTolerance=0.01,
+        convergencePatience=5,
+        stepMetrics=False,
+    ):
+        """
+        Create a new array-backed Simulation model.
+
+        Args:
+            The same as Simulation
+        """
+        self.height = height
+        self.width = width
+
+        self.informationingHumans = trustingHumans
+        self.untrustingHumans = untrustingHumans
+        self.maxIterations = maxIterations
+
+        self.proportionLLMs = proportionLLMs
+        self.maliciousLLMs = maliciousLLMs
+
+        self.radius = radius
+        self.InconvenienceThreshold = inconvenienceThreshold
+        self.density = density
+        self.resistance = resistance
+        self.outputDir = outputDir
+
+        self.running = True
+        self.iterations = 0
+        self.totalNumMoves = 0
+        self.totalMisinformedHumans = 0
+        self.happy = 0
+        if seed is None:
+            seed = int(np.random.SeedSequence().generate_state(1)[0])
+        self.seed = seed
+        # One stream per phase, so changing how one phase draws leaves the others alone
+        populationSeed, relocationSeed, influenceSeed = np.random.SeedSequence(seed).spawn(3)
+        self.populationRandom = np.random.default_rng(populationSeed)
+        self.relocationRandom = np.random.default_rng(relocationSeed)
+        self.influenceRandom = np.random.default_rng(influenceSeed)
+
+        self.offsets = moore_offsets(radius, width, height)
+
+        shape = (width, height)
+        self.kind = np.zeros(shape, dtype=np.int8)
+        self.output = np.zeros(shape, dtype=np.int8)
+        self.confidence = np.zeros(shape, dtype=np.float64)
+        self.information = np.zeros(shape, dtype=np.float64)
+        self.LLMtrustCoefficient = np.zeros(shape, dtype=np.float64)
+        self.flipCount = np.zeros(shape, dtype=np.int32)
+        self.stepsSinceFlip = np.zeros(shape, dtype=np.int32)
+        self.justFlipped = np.zeros(shape, dtype=bool)
+        self.LLMThatFlipped = np.zeros(shape, dtype=np.int8)
+        self.numNeigborsFlipped = np.zeros(shape, dtype=np.int32)
+        self.totalNumMovesPerAgent = np.zeros(shape, dtype=np.int32)
+        self.lastMoveWasRandom = np.zeros(shape, dtype=bool)
+        self.isHappy = np.ones(shape, dtype=bool)
+        # Number of flips each LLM took part in (LLMAgent.flipped)
+        self.flipped = np.zeros(shape, dtype=np.int32)
+        # Flip history entries recorded per LLM type, indexed by type code
+        self.flipsByLLMType = np.zeros(len(TYPE_NAMES) + 1, dtype=np.int64)
+        self.maliciousLLMFlips = 0
+        self.benignLLMFlips = 0
+        self.totalFlips = 0
+
+        self.agentFields = [getattr(self, name) for name in AGENT_FIELDS]
+        # Scratch state of the relocation phase
+        self.shouldMove = np.zeros(shape, dtype=bool)
+        self.trustingTarget = np.zeros(shape, dtype=bool)
+        self.untrustingTarget = np.zeros(shape, dtype=bool)
+        self.wholeGrid = Tile(width, height)
+
+        self.populate(trustingHumans, untrustingHumans)
+
+        # LLMs never move, so the number of LLMs within radius of every cell is computed once
+        self.maliciousInRadius = window_sum(self.kind == MALICIOUS, radius)
+        self.benignInRadius = window_sum(self.kind == BENIGN, radius)
+        self.LLMsInRadius = self.maliciousInRadius + self.benignInRadius
+
+        model_reporters = dict(MODEL_REPORTERS)
+        if stepMetrics:
+            model_reporters.update(step_reporters())
+        self.datacollector = ColumnCollector(model_reporters, (maxIterations or 0) + 1)
+        self.datacollector.collect(self)
+
+        self.convergence = None
+        self.convergenceStep = None
+        if convergenceWindow is not None:
+            self.convergence = ConvergenceMonitor(
+                self.numHumans, convergenceWindow, convergenceTolerance, convergencePatience
+            )
+
+    def populate(self, trustingHumans, untrustingHumans):
+        '''
+        Fill the grid with the same distribution of agents as Simulation.__init__
+        '''
+        rng = self.populationRandom
+        shape = self.kind.shape
+
+        val = rng.random(shape)
+        occupied = val < self.density
+        isLLM = occupied & (val < self.proportionLLMs)
+        isHuman = occupied & ~isLLM
+
+        # generate_LLM_agent_type
+        if self.maliciousLLMs == 0:
+            malicious = np.zeros(shape, dtype=bool)
+        else:
+            malicious = rng.random(shape) < self.maliciousLLMs
+        self.kind[isLLM & malicious] = MALICIOUS
+        self.kind[isLLM & ~malicious] = BENIGN
+
+        # generate_human_agent_type
+        curr = rng.random(shape)
+        trusting = curr < trustingHumans
+        untrusting = ~trusting & (curr < trustingHumans + untrustingHumans)
+        self.kind[isHuman & trusting] = TRUSTING
+        self.kind[isHuman & untrusting] = UNTRUSTING
+        self.kind[isHuman & ~trusting & ~untrusting] = SEMI_TRUSTING
+
+        # LLMs are fully confident and always output according to their type
+        self.output[self.kind == BENIGN] = 1
+        self.output[self.kind == MALICIOUS] = -1
+        self.confidence[isLLM] = 1
+
+        # Around 10% of humans start out misinformed
+        misinformed = rng.random(shape) < 0.1
+        self.output[isHuman] = np.where(misinformed[isHuman], -1, 1)
+        self.confidence[isHuman] = .5
+
+        trust = rng.random(shape)
+        for code, low, high in ((TRUSTING, 0.67, 1), (SEMI_TRUSTING, 0.34, 0.66), (UNTRUSTING, 0.01, 0.33)):
+            mask = self.kind == code
+            self.LLMtrustCoefficient[mask] = low + (high - low) * trust[mask]
+
+        self.totalMaliciousLLMs = int(np.count_nonzero(self.kind == MALICIOUS))
+        self.totalBenignLLMs = int(np.count_nonzero(self.kind == BENIGN))
+        self.totalTrustingHumans = int(np.count_nonzero(self.kind == TRUSTING))
+        self.totalUntrustingHumans = int(np.count_nonzero(self.kind == UNTRUSTING))
+        self.totalSemiTrustingHumans = int(np.count_nonzero(self.kind == SEMI_TRUSTING))
+        self.numLLMs = self.totalMaliciousLLMs + self.totalBenignLLMs
+        self.numHumans = self.totalTrustingHumans + self.totalUntrustingHumans + self.totalSemiTrustingHumans
+        self.numAgents = self.numLLMs + self.numHumans
+        self.count_humans()
+
+    def count_humans(self):
+        '''
+        Count the misinformed and the happy humans
+        '''
+        self.totalMisinformedHumans, self.happy = self.human_counts(self.wholeGrid)
+
+    def human_counts(self, tile):
+        '''
+        Number of misinformed and of happy humans in a tile
+        '''
+        kind = tile.own(self.kind)
+        humans = (kind > EMPTY) & (kind < BENIGN)
+        misinformed = int(np.count_nonzero(humans & (tile.own(self.output) < 0)))
+        return misinformed, int(np.count_nonzero(humans & tile.own(self.isHappy)))
+
+    def humans(self):
+        return (self.kind > EMPTY) & (self.kind < BENIGN)
+
+    def stepping(self, kind):
+        '''
+        Mask of the humans in kind, a tile of self.kind, that take part in the step
+        '''
+        return (kind > EMPTY) & (kind < BENIGN)
+
+    def neighbor_cells(self, cells, offsets):
+        '''
+        Flat indices of the cells at every offset (an (n, 2) array) from every cell in cells, on the torus
+        '''
+        area = self.width * self.height
+        # Offset of the grid the cells are on, 0 unless the arrays stack several grids
+        base = cells - cells % area
+        xs, ys = np.divmod(cells - base, self.height)
+        return (
+            base[:, None]
+            + ((xs[:, None] + offsets[None, :, 0]) % self.width) * self.height
+            + (ys[:, None] + offsets[None, :, 1]) % self.height
+        )
+
+    def replica_counts(self, cells):
+        '''
+        Number of cells in cells, per grid when the arrays stack several grids
+        '''
+        return len(cells)
+
+    def random_rows(self, rng, cells, shape):
+        '''
+        Uniform random numbers of the given shape, the row i is drawn for the cell cells[i]
+        '''
+        return rng.random(shape)
+
+    def random_order(self, rng, cells):
+        '''
+        Random permutation of the indices of cells
+        '''
+        return rng.permutation(len(cells))
+
+    def move(self, src, dst):
+        '''
+        Move the agents at flat indices src to the empty cells at flat indices dst
+        '''
+        if len(src) == 0:
+            return
+        for field in self.agentFields:
+            flat = field.reshape(-1)
+            flat[dst] = flat[src]
+            flat[src] = 0
+
+    def relocate(self):
+        '''
+        Neighborhood LLM census and relocation, the first half of HumanAgent.step
+        '''
+        tile = self.wholeGrid
+        leaving = self.census(tile)
+        if len(leaving):
+            self.move_randomly(leaving, self.empty_cells(tile))
+        self.clear_random_moves(tile)
+
+        if self.InconvenienceThreshold <= 1:
+            return
+
+        self.mark_targets(tile)
+        for code in (TRUSTING, UNTRUSTING):
+            losers = self.settle(*self.search(tile, code, self.relocationRandom))
+            # Humans that lost a contested cell try their next suitable one
+            while len(losers):
+                losers = self.settle(*self.search(tile, code, self.relocationRandom, losers))
+
+    def census(self, tile):
+        '''
+        Mark who should move and who is happy in a tile
+        Returns the flat indices of the agents that moved a lot and leave the area
+        '''
+        occupied = tile.read(self.kind) > EMPTY
+        numNeighbors = tile.window_sum(occupied, self.radius)
+        numLLMNeighbors = tile.own(self.LLMsInRadius)
+        threshold = (self.maliciousLLMs / 10) + self.proportionLLMs
+        with np.errstate(divide='ignore', invalid='ignore'):
+            LLMInNeighorhood = (numNeighbors > 0) & (numLLMNeighbors / np.maximum(numNeighbors, 1) > threshold)
+
+        kind = tile.own(self.kind)
+        humans = self.stepping(kind)
+        shouldMove = humans & (((kind == TRUSTING) & ~LLMInNeighorhood) | ((kind == UNTRUSTING) & LLMInNeighorhood))
+        tile.own(self.shouldMove)[:] = shouldMove
+        # Agents are happy where they are, or once they found a better place
+        isHappy = tile.own(self.isHappy)
+        isHappy[humans] = True
+        isHappy[shouldMove] = False
+
+        # Agents that moved a lot leave the area for a random empty space
+        return tile.cells(shouldMove & (tile.own(self.totalNumMovesPerAgent) > 10) & ~tile.own(self.lastMoveWasRandom))
+
+    def empty_cells(self, tile):
+        return tile.cells(tile.own(self.kind) == EMPTY)
+
+    def move_randomly(self, src, empties):
+        '''
+        Move the leaving agents at flat indices src to random cells among the flat indices empties
+        '''
+        count = min(len(src), len(empties))
+        if count:
+            src = self.relocationRandom.permutation(src)[:count]
+            dst = self.relocationRandom.choice(empties, size=count, replace=False)
+            self.move(src, dst)
+            self.shouldMove.reshape(-1)[dst] = True
+            self.shouldMove.reshape(-1)[src] = False
+
+    def clear_random_moves(self, tile):
+        tile.own(self.lastMoveWasRandom)[tile.own(self.shouldMove)] = False
+
+    def mark_targets(self, tile):
+        '''
+        Mark the cells of a tile the trusting and the untrusting humans would move to
+        Destinations are judged on the grid as it is before the search moves anyone
+        '''
+        kind = tile.read(self.kind)
+        isHuman = (kind > EMPTY) & (kind < BENIGN)
+        empty = tile.own(self.kind) == EMPTY
+        tile.own(self.trustingTarget)[:] = empty & (tile.own(self.LLMsInRadius) > 0)
+        tile.own(self.untrustingTarget)[:] = empty & (tile.window_sum(isHuman, self.radius) > 0)
+
+    def search(self, tile, code, rng, movers=None):
+        '''
+        Find a destination for every human of type code in a tile that should move, or for
+        the humans at the sorted flat indices movers
+        Returns the flat indices of the movers that found one, and of their destinations
+        '''
+        target = self.trustingTarget if code == TRUSTING else self.untrustingTarget
+        if movers is None:
+            movers = tile.cells(tile.own(self.shouldMove) & (tile.own(self.kind) == code))
+        choice = np.full(len(movers), -1, dtype=np.int64)
+        for distance in range(1, self.InconvenienceThreshold):
+            searching = np.flatnonzero(choice < 0)
+            if len(searching) == 0:
+                break
+            ring = np.array(ring_offsets(distance, self.width, self.height))
+            cells = self.neighbor_cells(movers[searching], ring)
+            # Pick uniformly among the suitable cells of the nearest ring
+            keys = np.where(target.reshape(-1)[cells], self.random_rows(rng, movers[searching], cells.shape), -1)
+            best = keys.argmax(axis=1)
+            found = keys[np.arange(len(searching)), best] >= 0
+            choice[searching[found]] = cells[found, best[found]]
+
+        wanted = choice >= 0
+        return movers[wanted], choice[wanted]
+
+    def settle(self, movers, choice):
+        '''
+        Move the movers found by search, contested cells go to the first mover in a random order
+        Returns the flat indices of the movers that lost their cell, in order
+        '''
+        if len(movers) == 0:
+            return movers
+        order = self.random_order(self.relocationRandom, movers)
+        _, first = np.unique(choice[order], return_index=True)
+        winners = order[first]
+        src, dst = movers[winners], choice[winners]
+        self.move(src, dst)
+        self.totalNumMovesPerAgent.reshape(-1)[dst] += 1
+        self.isHappy.reshape(-1)[dst] = True
+        self.totalNumMoves += self.replica_counts(dst)
+        self.trustingTarget.reshape(-1)[dst] = False
+        self.untrustingTarget.reshape(-1)[dst] = False
+        lost = np.ones(len(movers), dtype=bool)
+        lost[winners] = False
+        return movers[lost]
+
+    def influence(self):
+        '''
+        Influence phase, the array form of set_informed_or_not
+        '''
+        humans = np.flatnonzero(self.stepping(self.kind))
+        effects = self.influence_cells(humans, self.influenceRandom)
+        self.commit_influence(humans, effects)
+        self.count_influence(effects)
+
+    def influence_cells(self, humans, rng):
+        '''
+        Work out what the influence phase does to the humans at flat indices humans, without
+        changing the grid, so every human hears its neighbors as they were before the phase
+        '''
+        offsets = np.array(self.offsets)
+        kind = self.kind.reshape(-1)
+        output = self.output.reshape(-1)
+        confidence = self.confidence.reshape(-1)
+        trust = self.LLMtrustCoefficient.reshape(-1)
+        attribution = self.LLMThatFlipped.reshape(-1)
+        information = self.information.reshape(-1)
+        newInformation = np.zeros(len(humans), dtype=np.float64)
+        effects = {
+            name: [] for name in (
+                "flipCells", "creditCells", "credits", "flippedLLMs", "flippedHumans", "creditTypes", "creditTypeCells",
+            )
+        }
+
+        chunk = max(1, CHUNK_CELLS // len(offsets))
+        for start in range(0, len(humans), chunk):
+            cells = humans[start:start + chunk]
+            neighbors = self.neighbor_cells(cells, offsets)
+
+            # Listen to up to NUM_INFLUENCERS random neighbors
+            keys = np.where(kind[neighbors] > EMPTY, self.random_rows(rng, cells, neighbors.shape), 2.0)
+            if neighbors.shape[1] > NUM_INFLUENCERS:
+                picked = np.argpartition(keys, NUM_INFLUENCERS - 1, axis=1)[:, :NUM_INFLUENCERS]
+            else:
+                picked = np.broadcast_to(np.arange(neighbors.shape[1]), neighbors.shape)
+            rows = np.arange(len(cells))[:, None]
+            # Keep the influencers in the random order they were drawn
+            order = np.argsort(keys[rows, picked], axis=1)
+            picked = picked[rows, order]
+            valid = keys[rows, picked] < 2.0
+            influencers = neighbors[rows, picked]
+
+            influencerIsLLM = kind[influencers] >= BENIGN
+            weight = confidence[influencers] + np.where(influencerIsLLM, trust[cells, None], 0.4)
+            info = np.where(valid, output[influencers] * weight, 0).sum(axis=1)
+
+            old = information[cells]
+            flip = ((info > 0) & (old < 0)) | ((info < 0) & (old > 0))
+            newInformation[start:start + chunk] = info
+            if not flip.any():
+                continue
+
+            flipCells = cells[flip]
+            flipInfluencers = influencers[flip]
+            flipValid = valid[flip]
+            flipIsLLM = influencerIsLLM[flip] & flipValid
+            flipIsHuman = ~influencerIsLLM[flip] & flipValid
+            effects["flipCells"].append(flipCells)
+            effects["flippedLLMs"].append(flipInfluencers[flipIsLLM])
+            effects["flippedHumans"].append(flipInfluencers[flipIsHuman])
+
+            # The last influencer that can be traced back to an LLM is credited with the flip
+            credit = np.where(flipIsLLM, kind[flipInfluencers], np.where(flipIsHuman, attribution[flipInfluencers], 0))
+            effects["creditTypes"].append(credit[credit > 0])
+            effects["creditTypeCells"].append(np.broadcast_to(flipCells[:, None], credit.shape)[credit > 0])
+            hasCredit = (credit > 0).any(axis=1)
+            last = credit.shape[1] - 1 - (credit[:, ::-1] > 0).argmax(axis=1)
+            effects["creditCells"].append(flipCells[hasCredit])
+            effects["credits"].append(credit[hasCredit, last[hasCredit]])
+
+        effects = {
+            name: np.concatenate(parts) if parts else np.zeros(0, dtype=np.int64)
+            for name, parts in effects.items()
+        }
+        effects["flips"] = self.replica_counts(effects["flipCells"])
+
+        # Clamp the information against the resistance
+        resistance = self.resistance
+        newInformation = np.where(newInformation > resistance * 3, resistance, newInformation)
+        newInformation = np.where(newInformation < -resistance * 3, -resistance, newInformation)
+        effects["information"] = newInformation
+        return effects
+
+    def commit_influence(self, humans, effects):
+        '''
+        Write the effects of the influence phase on the humans themselves
+        '''
+        self.information.reshape(-1)[humans] = effects["information"]
+        self.output.reshape(-1)[humans] = np.sign(effects["information"]).astype(np.int8)
+        self.flipCount.reshape(-1)[effects["flipCells"]] += 1
+        self.justFlipped.reshape(-1)[effects["flipCells"]] = True
+        self.LLMThatFlipped.reshape(-1)[effects["creditCells"]] = effects["credits"]
+
+    def count_influence(self, effects):
+        '''
+        Count the flips of the influence phase, on the influencers and in the totals
+        '''
+        self.totalFlips += effects["flips"]
+        np.add.at(self.flipped.reshape(-1), effects["flippedLLMs"], 1)
+        np.add.at(self.numNeigborsFlipped.reshape(-1), effects["flippedHumans"], 1)
+        np.add.at(self.flipsByLLMType, effects["creditTypes"], 1)
+
+    def update_confidence(self, tile=None):
+        '''
+        Confidence phase, the end of HumanAgent.step, over a tile or the whole grid
+        '''
+        if tile is None:
+            tile = self.wholeGrid
+        kind = tile.own(self.kind)
+        humans = self.stepping(kind)
+        justFlipped = tile.own(self.justFlipped)
+        stepsSinceFlip = tile.own(self.stepsSinceFlip)
+        confidence = tile.own(self.confidence)
+        reset = humans & justFlipped
+        stepsSinceFlip[reset] = 0
+        confidence[reset] = .3
+        stepsSinceFlip[humans & ~justFlipped] += 1
+
+        occupied = tile.read(self.kind) > EMPTY
+        outputs = tile.read(self.output)
+        output = tile.own(self.output)
+        numNeighbors = tile.window_sum(occupied, self.radius)
+        numSameType = np.zeros(kind.shape, dtype=np.int32)
+        for value in (-1, 0, 1):
+            same = output == value
+            numSameType[same] = tile.window_sum(occupied & (outputs == value), self.radius)[same]
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ratio = numSameType / np.maximum(numNeighbors, 1)
+        isolated = humans & (numNeighbors == 0)
+        confidence[isolated & (confidence > 0)] -= .1
+        confidence[humans & ~isolated & (ratio > .70)] += .1
+        confidence[humans & ~isolated & (ratio <= .70)] -= .1
+        confidence[humans] = np.clip(confidence[humans], 0, 1)
+
+    def step(self):
+        """
+        Run one step of the model.
+        """
+        if self.iterations == 0:
+            output_data_to_file1(self)
+
+        self.iterations += 1
+
+        self.relocate()
+        self.influence()
+        self.update_confidence()
+
+        self.count_humans()
+        self.maliciousLLMFlips = int(self.flipsByLLMType[MALICIOUS])
+        self.benignLLMFlips = int(self.flipsByLLMType[BENIGN])
+
+        self.datacollector.collect(self)
+        if check_convergence(self):
+            self.convergenceStep = self.iterations
+        if self.iterations == self.maxIterations or self.happy == self.numHumans or self.convergenceStep is not None:
+            output_data_to_file1(self)
+            output_data_to_file2(self)
+            output_data_to_file3(self)
+            self.running = False
+
+
+def output_data_to_file2(model):
+    '''
+    Output the data to the CSV file, the same layout as model.output_data_to_file2
+    The array engine keeps no agent ids or flip cascades, so those columns are left empty
+    '''
+    with open(os.path.join(model.outputDir, "LLM.csv"), "w") as f2:
+        f2.write(LLM_CSV_HEADER)
+        for cell in np.flatnonzero(model.kind >= BENIGN):
+            f2.write("," + TYPE_NAMES[int(model.kind.flat[cell])] + "," + str(model.flipped.flat[cell])
+                     + "," * len(CASCADE_COLUMNS) + "\n")
+
+def output_data_to_file3(model):
+    '''
+    Output the data to the CSV file, the same layout as model.output_data_to_file3
+    '''
+    with open(os.path.join(model.outputDir, "Human.csv"), "w") as f3:
+        f3.write("type, confidence, LLMThatFlipped, misinformed, flipCount, numNeigborsFlipped, totalNumMoves, lastMoveWasRandom, LLMtrustCoefficient\n")
+        for cell in np.flatnonzero(model.humans()):
+            LLMThatFlipped = TYPE_NAMES.get(int(model.LLMThatFlipped.flat[cell]))
+            f3.write(TYPE_NAMES[int(model.kind.flat[cell])] + "," + str(model.confidence.flat[cell]) + "," + str(LLMThatFlipped) + ","
+                     + str(bool(model.output.flat[cell] < 0)) + "," + str(model.flipCount.flat[cell]) + "," + str(model.numNeigborsFlipped.flat[cell]) + ","
+                     + str(model.totalNumMovesPerAgent.flat[cell]) + "," + str(bool(model.lastMoveWasRandom.flat[cell])) + "," + str(model.LLMtrustCoefficient.flat[cell]) + "\n")
@@ -0,0 +1,221 @@
+# Made by Kiwi!
+
+import asyncio
+import os
+import threading
+import time
+import traceback
+import weakref
+
+import mesa
+import numpy as np
+import tornado.escape
+from mesa_viz_tornado.ModularVisualization import CHART_JS_FILE, SocketHandler
+
+from delta_canvas import rendering_for
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+class BackgroundControl(mesa.visualization.VisualizationElement):
+    """
+    Step counter of a BackgroundServer, and the client side of its protocol
+
+    BackgroundControl.js makes the Start button run the model in the background and the
+    Stop button pause it. Its render shows the model's own step, since the browser no
+    longer sees every step. A BackgroundServer adds this element itself.
+    """
+
+    local_includes = ["BackgroundControl.js"]
+    local_dir = HERE
+    js_code = "elements.push(new BackgroundControl());"
+
+    def render(self, model):
+        return model.iterations
+
+
+class StepChart(mesa.visualization.VisualizationElement):
+    """
+    Line chart of DataCollector or ColumnCollector model reporters that sends every step since the last frame
+
+    mesa's ChartModule only sends the latest value, so it loses the steps that were never
+    rendered. This chart sends all of them, labelled with their step. The steps already sent
+    are kept per connection, like DeltaCanvasGrid's frames, so every browser tab gets every
+    step. A frame rendered for a connection that isn't known only has the latest step.
+    """
+
+    package_includes = [CHART_JS_FILE]
+    local_includes = ["StepChartModule.js"]
+    local_dir = HERE
+
+    def __init__(self, series, canvas_width=500, canvas_height=200, data_collector_name="datacollector"):
+        """
+        Create a step chart.
+
+        Args:
+            series: List of {"Label": reporter name, "Color": line color} dicts, like ChartModule's
+            canvas_width, canvas_height: Size of the chart in pixels
+            data_collector_name: Name of the model attribute holding the DataCollector
+        """
+        super().__init__()
+        self.series = series
+        self.data_collector_name = data_collector_name
+        self.js_code = "elements.push(new StepChartModule({}, {}, {}));".format(
+            tornado.escape.json_encode(series), canvas_width, canvas_height,
+        )
+        # Connection -> the model and the number of collected steps sent to it
+        self.sent = weakref.WeakKeyDictionary()
+
+    def render(self, model):
+        model_vars = getattr(model, self.data_collector_name).model_vars
+        collected = len(model_vars[self.series[0]["Label"]])
+        client = rendering_for.get()
+        if client is None:
+            sent = max(collected - 1, 0)
+        else:
+            sentModel, sent = self.sent.get(client, (None, 0))
+            if model is not sentModel:
+                # A new connection, or a new model after a reset, send every step
+                sent = 0
+            self.sent[client] = (model, collected)
+        values = [np.asarray(model_vars[s["Label"]][sent:collected]).tolist() for s in self.series]
+        # The DataCollector collects once before the first step and once after every step
+        steps = list(range(sent, collected))
+        return {"steps": steps, "values": values}
+
+
+class BackgroundSocketHandler(SocketHandler):
+    '''
+    Websocket handler of a BackgroundServer
+    get_step messages sent while the model plays return a frame of wherever the background
+    worker got to, instead of stepping the model once
+    '''
+
+    async def on_message(self, message):
+        # The frames rendered here are for this connection, see DeltaCanvasGrid
+        token = rendering_for.set(self)
+        try:
+            await self.handle_message(message)
+        finally:
+            rendering_for.reset(token)
+
+    async def handle_message(self, message):
+        msg = tornado.escape.json_decode(message)
+        application = self.application
+        if msg["type"] == "get_step" and msg.get("background"):
+            application.play()
+            await application.wait_for_frame()
+            if application.frame_ready():
+                self.write_message({"type": "viz_state", "data": application.render_frame()})
+            else:
+                self.write_message({"type": "end"})
+        elif msg["type"] == "get_step":
+            application.pause()
+            with application.lock:
+                running = application.model.running
+                if running:
+                    application.model.step()
+            if running:
+                self.write_message({"type": "viz_state", "data": application.render_frame()})
+            else:
+                self.write_message({"type": "end"})
+        elif msg["type"] == "pause":
+            application.pause()
+        else:
+            super().on_message(message)
+
+
+class BackgroundServer(mesa.visualization.ModularServer):
+    """
+    ModularServer that steps the model in a background thread at full speed
+
+    While the model plays, a worker thread steps it as fast as it can and the browser
+    renders a frame whenever it asks for one, at the FPS set on the page. The elements only
+    render for those frames, the steps in between are skipped. With renderEvery, the
+    worker instead waits after every renderEvery steps until that frame was rendered.
+    Use StepChart instead of ChartModule, so the chart still gets the skipped steps.
+    """
+
+    def __init__(self, model_cls, visualization_elements, name="Mesa Model", model_params=None, port=None, renderEvery=None):
+        """
+        Create a background stepping server.
+
+        Args:
+            model_cls, visualization_elements, name, model_params, port: See ModularServer
+            renderEvery: Render every renderEvery steps, None to render at the page's FPS
+        """
+        self.renderEvery = renderEvery
+        self.lock = threading.Condition()
+        self.playing = False
+        # Steps taken since the last frame was rendered
+        self.pendingSteps = 0
+        super().__init__(
+            model_cls, [BackgroundControl()] + list(visualization_elements), name, model_params, port,
+        )
+        self.add_handlers(r".*", [(r"/ws", BackgroundSocketHandler)])
+        self.worker = threading.Thread(target=self.run, name="simulation", daemon=True)
+        self.worker.start()
+
+    def reset_model(self):
+        if not hasattr(self, "lock"):
+            super().reset_model()
+            return
+        self.pause()
+        with self.lock:
+            super().reset_model()
+            self.pendingSteps = 0
+
+    def play(self):
+        with self.lock:
+            self.playing = True
+            self.lock.notify_all()
+
+    def pause(self):
+        with self.lock:
+            self.playing = False
+
+    def run(self):
+        '''
+        Body of the worker thread, steps the model whenever it plays
+        '''
+        while True:
+            with self.lock:
+                while not self.can_step():
+                    self.lock.wait()
+                try:
+                    self.model.step()
+                except Exception:
+                    traceback.print_exc()
+                    self.model.running = False
+                self.pendingSteps += 1
+                self.lock.notify_all()
+            # Let the websocket handler get the lock between steps
+            time.sleep(0)
+
+    def can_step(self):
+        if not self.playing or not self.model.running:
+            return False
+        return self.renderEvery is None or self.pendingSteps < self.renderEvery
+
+    def frame_ready(self):
+        with self.lock:
+            if self.pendingSteps > 0 and self.renderEvery is not None:
+                return self.pendingSteps >= self.renderEvery or not self.model.running
+            return self.pendingSteps > 0
+
+    async def wait_for_frame(self):
+        '''
+        Wait until there is a new frame to render, or the model finished
+        '''
+        while not self.frame_ready():
+            with self.lock:
+                if not self.model.running:
+                    return
+            await asyncio.sleep(0.001)
+
+    def render_frame(self):
+        with self.lock:
+            state = self.render_model()
+            self.pendingSteps = 0
+            self.lock.notify_all()
+        return state
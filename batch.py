@@ -0,0 +1,123 @@
+# Made by Kiwi!
+
+import argparse
+import json
+import os
+import sys
+
+# The parameters of server.py's model_params, with the values the server starts with
+SERVER_DEFAULTS = {
+    "height": 50,
+    "width": 50,
+    "density": 0.8,
+    "trustingHumans": 0.4,
+    "untrustingHumans": 0.4,
+    "proportionLLMs": 0.05,
+    "maliciousLLMs": 0.5,
+    "radius": 1,
+    "inconvenienceThreshold": 1,
+    "resistance": 0.5,
+    "maxIterations": 100,
+}
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        description="Run the Simulation headlessly, without the visualization server",
+    )
+    parser.add_argument("--config", help="JSON file of Simulation parameters, the options below override it")
+    for name, value in SERVER_DEFAULTS.items():
+        parser.add_argument("--" + name, type=type(value), help="Default: %s" % value)
+    parser.add_argument("--seed", type=int, help="Seed of the run, or the base seed of the replicas")
+    parser.add_argument(
+        "--param", action="append", default=[], metavar="NAME=VALUE",
+        help="Any other Simulation parameter, the value is read as JSON, e.g. --param activation='\"dirty\"'",
+    )
+    parser.add_argument(
+        "--engine", default="agents", choices=["agents", "array", "tiled", "ensemble"],
+        help="ensemble steps all the replicas together in one process, and prints their statistics",
+    )
+    parser.add_argument("--replicas", type=int, default=1, help="Number of runs, in parallel when more than one")
+    parser.add_argument("--processes", type=int, help="Worker processes for the replicas, all cores by default")
+    parser.add_argument("--output-dir", default=".", help="Where the CSV files go, one directory per replica")
+    parser.add_argument("--output", help="Write the final metrics of every run to this JSON file")
+    parser.add_argument(
+        "--checkpoint", help="Continue from this checkpoint file, the parameters given change it (agents engine)",
+    )
+    parser.add_argument("--save-checkpoint", help="Save the finished run to this checkpoint file (a single run only)")
+    return parser.parse_args(argv)
+
+
+def simulation_params(args):
+    '''
+    Simulation parameters from the server defaults, the config file and the command line, in that order
+    A run from a checkpoint starts from the checkpoint's parameters instead of the server defaults
+    '''
+    params = {} if args.checkpoint else dict(SERVER_DEFAULTS)
+    if args.config:
+        with open(args.config) as config:
+            params.update(json.load(config))
+    for name in SERVER_DEFAULTS:
+        if getattr(args, name) is not None:
+            params[name] = getattr(args, name)
+    for assignment in args.param:
+        name, _, value = assignment.partition("=")
+        params[name] = json.loads(value)
+    return params
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    params = simulation_params(args)
+    if args.save_checkpoint and args.replicas != 1:
+        print("--save-checkpoint needs a single run", file=sys.stderr)
+        return 2
+
+    summary = None
+    if args.engine == "ensemble":
+        if args.checkpoint or args.save_checkpoint:
+            print("Checkpoints need the agents engine", file=sys.stderr)
+            return 2
+        from ensemble import EnsembleSimulation
+
+        model = EnsembleSimulation(replicas=args.replicas, seed=args.seed, outputDir=args.output_dir, **params)
+        while model.running:
+            model.step()
+        results = model.results(params)
+        summary = {
+            name: {
+                "mean": float(stats["mean"][-1]),
+                "variance": float(stats["variance"][-1]),
+                "quantiles": {q: float(values[-1]) for q, values in stats["quantiles"].items()},
+            }
+            for name, stats in model.summary().items()
+        }
+    elif args.replicas == 1:
+        from sweep import run_simulation
+
+        os.makedirs(args.output_dir, exist_ok=True)
+        results = [run_simulation(
+            dict(params, seed=args.seed, outputDir=args.output_dir), args.engine, args.checkpoint, args.save_checkpoint,
+        )]
+    else:
+        from sweep import sweep
+
+        results = list(sweep(
+            params, replicas=args.replicas, outputRoot=args.output_dir, engine=args.engine,
+            processes=args.processes, seed=args.seed, checkpoint=args.checkpoint,
+        ))
+
+    for result in results:
+        print(json.dumps({
+            name: result.get(name) for name in ("params", "iterations", "convergenceStep", "final", "error")
+        }))
+    if summary is not None:
+        print(json.dumps({"summary": summary}))
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(results, output, indent=1)
+    return 0 if all("error" not in result for result in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,165 @@
+# Made by Kiwi!
+
+import argparse
+import itertools
+import json
+import multiprocessing
+import platform
+import resource
+import sys
+import tempfile
+import time
+
+
+def run_case(case, steps):
+    '''
+    Time Simulation.__init__ and Simulation.step for one case, in the calling process
+    Up to `steps` steps are timed, fewer when the model stops first (every human happy, or converged)
+    '''
+    from model import build_simulation
+
+    params = {name: value for name, value in case.items() if name != "engine"}
+    with tempfile.TemporaryDirectory() as outputDir:
+        start = time.perf_counter()
+        model = build_simulation(case["engine"], outputDir=outputDir, seed=0, maxIterations=steps + 1, **params)
+        initSeconds = time.perf_counter() - start
+
+        stepsRun = 0
+        start = time.perf_counter()
+        while stepsRun < steps and model.running:
+            model.step()
+            stepsRun += 1
+        stepSeconds = (time.perf_counter() - start) / stepsRun if stepsRun else None
+
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":
+        peak //= 1024
+    return dict(
+        case,
+        numAgents=model.numAgents,
+        steps=stepsRun,
+        initSeconds=initSeconds,
+        stepSeconds=stepSeconds,
+        stepsPerSecond=1 / stepSeconds if stepSeconds else None,
+        agentStepMicroseconds=1e6 * stepSeconds / max(model.numAgents, 1) if stepsRun else None,
+        peakRSSKilobytes=peak,
+    )
+
+
+def case_worker(case, steps, results):
+    results.put(run_case(case, steps))
+
+
+def benchmark(cases, steps):
+    '''
+    Run every case in a fresh process, so peak RSS belongs to that case alone, and yield the results
+    '''
+    context = multiprocessing.get_context("spawn")
+    for case in cases:
+        results = context.Queue()
+        process = context.Process(target=case_worker, args=(case, steps, results))
+        process.start()
+        process.join()
+        if process.exitcode == 0:
+            yield results.get()
+        else:
+            yield dict(case, error="exit code " + str(process.exitcode))
+
+
+def cases_from_args(args):
+    names = ("engine", "width", "radius", "inconvenienceThreshold", "density", "proportionLLMs")
+    values = (args.engine, args.sizes, args.radius, args.threshold, args.density, args.llms)
+    cases = []
+    for combination in itertools.product(*values, args.space, args.movement, args.construction):
+        case = dict(zip(names, combination))
+        case["height"] = case["width"]
+        space, movement, construction = combination[-3:]
+        if space != "dense":
+            # Only the agent engine has the sparse and network spaces
+            if case["engine"] != "agents":
+                continue
+            case["space"] = space
+        if movement != "sequential":
+            # Only the dense agent engine has batched movement
+            if case["engine"] != "agents" or space != "dense":
+                continue
+            case["movement"] = movement
+        if construction != "sequential":
+            # Only the agent engine builds its world cell by cell
+            if case["engine"] != "agents":
+                continue
+            case["construction"] = construction
+        cases.append(case)
+    return cases
+
+
+def case_key(case):
+    return json.dumps({name: value for name, value in case.items() if name in (
+        "engine", "width", "height", "radius", "inconvenienceThreshold", "density", "proportionLLMs", "space",
+        "movement", "construction",
+    )}, sort_keys=True)
+
+
+def compare(results, baseline):
+    '''
+    Print the step time of every case against the same case in a baseline file
+    '''
+    previous = {case_key(case): case for case in baseline["results"] if case.get("stepSeconds")}
+    for case in results:
+        old = previous.get(case_key(case))
+        if old is None or not case.get("stepSeconds"):
+            continue
+        ratio = case["stepSeconds"] / old["stepSeconds"]
+        print("%-70s %8.4fs -> %8.4fs  x%.2f" % (case_key(case), old["stepSeconds"], case["stepSeconds"], ratio))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark Simulation.__init__ and Simulation.step")
+    parser.add_argument("--engine", nargs="+", default=["agents"], choices=["agents", "array", "tiled"])
+    parser.add_argument("--sizes", nargs="+", type=int, default=[20, 50, 100, 200, 500, 1000])
+    parser.add_argument("--radius", nargs="+", type=int, default=[1, 3, 5])
+    parser.add_argument("--threshold", nargs="+", type=int, default=[1, 3, 5])
+    parser.add_argument("--density", nargs="+", type=float, default=[0.1, 0.5, 0.8, 1.0])
+    parser.add_argument("--llms", nargs="+", type=float, default=[0.05])
+    parser.add_argument("--space", nargs="+", default=["dense"], choices=["dense", "sparse", "network"])
+    parser.add_argument("--movement", nargs="+", default=["sequential"], choices=["sequential", "batched"])
+    parser.add_argument("--construction", nargs="+", default=["sequential"], choices=["sequential", "bulk"])
+    parser.add_argument("--steps", type=int, default=5, help="Steps timed per case")
+    parser.add_argument("--output", default="benchmark.json", help="Where to save the results as JSON")
+    parser.add_argument("--compare", help="Results of an earlier run to compare against")
+    args = parser.parse_args(argv)
+
+    from sweep import code_version
+
+    results = []
+    for result in benchmark(cases_from_args(args), args.steps):
+        results.append(result)
+        if "error" in result:
+            print(case_key(result), result["error"])
+        elif not result["steps"]:
+            print("%-70s init %8.3fs  stopped before the first step" % (case_key(result), result["initSeconds"]))
+        else:
+            print("%-70s init %8.3fs  step %8.4fs  %8.1f steps/s  %7.2fus/agent-step  %8d KB  %d steps" % (
+                case_key(result), result["initSeconds"], result["stepSeconds"], result["stepsPerSecond"],
+                result["agentStepMicroseconds"], result["peakRSSKilobytes"], result["steps"],
+            ))
+
+    report = {
+        "codeVersion": code_version(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "steps": args.steps,
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=1)
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
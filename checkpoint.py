@@ -0,0 +1,323 @@
+# Made by Kiwi!
+
+import json
+import os
+import struct
+
+import numpy as np
+
+from convergence import ConvergenceMonitor
+from model import (
+    BENIGN, MALICIOUS, TYPE_CODES, DirtyRegionActivation, HumanAgent, LLMAgent, Simulation, generate_LLM_agent_type,
+)
+from movement import BatchedMovement
+from space import EmptyCellIndex, LLMProximityField, SparseLLMProximityField
+
+MAGIC = b"MISCKPT1"
+# Arrays start on a multiple of this many bytes, so they can be memory-mapped as they are
+ALIGNMENT = 64
+
+# Per-agent columns of a checkpoint, humans leave the LLM fields at 0 and the other way around
+AGENT_COLUMNS = (
+    ("unique_id", "<i8"), ("x", "<i4"), ("y", "<i4"), ("typeCode", "i1"),
+    ("information", "<f8"), ("confidence", "<f8"), ("misinformed", "?"), ("output", "i1"),
+    ("LLMThatFlippedCode", "i1"), ("flipCount", "<i4"), ("justFlipped", "?"), ("stepsSinceFlip", "<i4"),
+    ("numNeigborsFlipped", "<i4"), ("totalNumMoves", "<i4"), ("happy", "?"), ("lastMoveWasRandom", "?"),
+    ("numMaliciousLLMNeighbors", "<i4"), ("numBenignLLMNeighbors", "<i4"), ("numTrustingHumanNeighbors", "<i4"),
+    ("numUntrustingHumanNeighbors", "<i4"), ("numSemiTrustingHumanNeighbors", "<i4"),
+    ("LLMtrustCoefficient", "<f8"), ("HumanTrustCoefficient", "<f8"), ("rootLLMId", "<i8"), ("cascadeDepth", "<i4"),
+    ("flipped", "<i4"),
+)
+# Columns of the flip log, in FlipLog.columns order
+FLIP_LOG_COLUMNS = (
+    ("agentIds", "<i8"), ("steps", "<i8"), ("LLMTypes", "i1"), ("influencerIds", "<i8"), ("rootIds", "<i8"), ("depths", "<i8"),
+    ("flipCounts", "<i8"),
+)
+LLM_COLUMNS = ("flipped", "confidence", "output")
+
+# Model counters stored as they are
+COUNTERS = (
+    "iterations", "totalNumMoves", "totalMaliciousLLMs", "totalBenignLLMs", "totalTrustingHumans",
+    "totalUntrustingHumans", "totalSemiTrustingHumans", "numHumans", "numLLMs", "numAgents",
+    "totalMisinformedHumans", "maliciousLLMFlips", "benignLLMFlips", "totalFlips", "happy",
+    "convergenceStep", "running", "current_id", "_steps", "_time",
+)
+
+# Parameters that shaped the world when it was populated, a fork can't change them
+FIXED_PARAMETERS = ("height", "width", "density", "trustingHumans", "untrustingHumans", "space")
+
+
+def write_checkpoint(path, header, arrays):
+    '''
+    Write a header dict and named NumPy arrays to one binary file
+    The file is MAGIC, the length of the JSON header, the header, then every array, aligned
+    '''
+    layout = {}
+    offset = 0
+    for name, array in arrays.items():
+        layout[name] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": offset}
+        offset += -(-array.nbytes // ALIGNMENT) * ALIGNMENT
+    text = json.dumps(dict(header, arrays=layout)).encode()
+    start = -(-(len(MAGIC) + 8 + len(text)) // ALIGNMENT) * ALIGNMENT
+
+    # Write to a temporary file first, a half written checkpoint is never visible
+    temporary = path + ".%d.tmp" % os.getpid()
+    with open(temporary, "wb") as stored:
+        stored.write(MAGIC + struct.pack("<Q", len(text)) + text)
+        for name, array in arrays.items():
+            stored.seek(start + layout[name]["offset"])
+            stored.write(np.ascontiguousarray(array).tobytes())
+        stored.truncate(start + offset)
+    os.replace(temporary, path)
+
+
+def read_checkpoint(path, mmap=True):
+    '''
+    Read a file written by write_checkpoint, returns the header and the arrays
+    With mmap the arrays are read-only memory maps of the file, which only page in what is used
+    '''
+    with open(path, "rb") as stored:
+        if stored.read(len(MAGIC)) != MAGIC:
+            raise ValueError("Not a checkpoint file: " + str(path))
+        length, = struct.unpack("<Q", stored.read(8))
+        header = json.loads(stored.read(length))
+        start = -(-(len(MAGIC) + 8 + length) // ALIGNMENT) * ALIGNMENT
+        arrays = {}
+        for name, spec in header.pop("arrays").items():
+            shape = tuple(spec["shape"])
+            if mmap and np.prod(shape) > 0:
+                arrays[name] = np.memmap(path, dtype=spec["dtype"], mode="r", offset=start + spec["offset"], shape=shape)
+            else:
+                stored.seek(start + spec["offset"])
+                arrays[name] = np.fromfile(stored, dtype=spec["dtype"], count=int(np.prod(shape))).reshape(shape)
+    return header, arrays
+
+
+def save_checkpoint(model, path):
+    '''
+    Snapshot a Simulation to a binary file: its parameters, every agent and its position,
+    the random number generators, the scheduler, the flip log and the collected data
+    '''
+    if model.network is not None:
+        raise ValueError("Checkpoints of a network space are not supported")
+    agents = list(model.schedule.agents)
+    columns = {}
+    for name, dtype in AGENT_COLUMNS:
+        if name in ("x", "y"):
+            values = [agent.pos[0 if name == "x" else 1] for agent in agents]
+        else:
+            values = [getattr(agent, name, 0) for agent in agents]
+        columns["agent." + name] = np.array(values, dtype=dtype)
+
+    arrays = dict(columns)
+    for (name, dtype), column in zip(FLIP_LOG_COLUMNS, model.flipLog.columns):
+        arrays["flipLog." + name] = np.array(column, dtype=dtype)
+    if isinstance(model.emptyCells, EmptyCellIndex):
+        # The order of the empty cell list decides which cell a random move picks
+        arrays["emptyCells"] = np.array(model.emptyCells.cells, dtype="<i4").reshape(-1, 2)
+
+    schedule = {"steps": model.schedule.steps, "time": model.schedule.time}
+    if isinstance(model.schedule, DirtyRegionActivation):
+        schedule["lastActive"] = [[agentId, steps] for agentId, steps in model.schedule.lastActive.items()]
+        schedule["changedCells"] = sorted(model.changedCells)
+        schedule["restless"] = sorted(agent.unique_id for agent in model.restless)
+
+    header = {
+        "params": model.params,
+        "counters": {name: getattr(model, name) for name in COUNTERS},
+        "random": {
+            name: getattr(model, name).getstate()
+            for name in ("random", "populationRandom", "relocationRandom", "influenceRandom")
+        },
+        "schedule": schedule,
+        "flipLog": {
+            "capacity": model.flipLog.capacity, "ring": model.flipLog.ring,
+            "head": model.flipLog.head, "dropped": model.flipLog.dropped,
+        },
+        "modelVars": model.datacollector.series(),
+    }
+    if model.convergence is not None:
+        convergence = model.convergence
+        header["convergence"] = {
+            "misinformed": list(convergence.misinformed), "flips": list(convergence.flips),
+            "moves": list(convergence.moves), "lastFlips": convergence.lastFlips,
+            "lastMoves": convergence.lastMoves, "steadySteps": convergence.steadySteps,
+        }
+    if model.profile is not None:
+        header["profile"] = model.profile.summary()
+    write_checkpoint(path, header, arrays)
+
+
+def load_checkpoint(path, mmap=True, **changes):
+    '''
+    Rebuild a Simulation from a checkpoint, optionally with some parameters changed
+    Args:
+        path: File written by save_checkpoint
+        mmap: Memory-map the file instead of reading it, for large checkpoints
+        changes: Simulation parameters to change, e.g. resistance=0.8. The population is
+                 carried over, so the FIXED_PARAMETERS can't change, but a new maliciousLLMs
+                 draws the type of every LLM again. A new seed reseeds every random number
+                 generator, seed=None keeps them where the checkpoint left them
+    '''
+    header, arrays = read_checkpoint(path, mmap)
+    params = dict(header["params"])
+    for name, value in changes.items():
+        if name in FIXED_PARAMETERS and value != params[name]:
+            raise ValueError("A checkpoint can't change " + name)
+    reseed = changes.get("seed") is not None and changes["seed"] != params["seed"]
+    params.update({name: value for name, value in changes.items() if name != "seed" or reseed})
+
+    # An empty world with the same parameters, the agents come from the checkpoint
+    model = Simulation(**dict(params, density=0, trajectory=None))
+    model.density = params["density"]
+    model.params = params
+    restore_agents(model, arrays)
+    if model.batchedMovement is not None:
+        # It was set up on the empty world
+        model.batchedMovement = BatchedMovement(model)
+
+    for name, value in header["counters"].items():
+        setattr(model, name, value)
+    if "maxIterations" in changes:
+        model.running = model.iterations < model.maxIterations
+    restore_schedule(model, header["schedule"])
+    restore_flip_log(model, header["flipLog"], arrays)
+
+    if model.convergence is not None:
+        model.convergence = ConvergenceMonitor(
+            model.numHumans, params["convergenceWindow"], params["convergenceTolerance"], params["convergencePatience"],
+        )
+        stored = header.get("convergence")
+        if stored is not None and params["convergenceWindow"] == header["params"]["convergenceWindow"]:
+            model.convergence.misinformed.extend(stored["misinformed"])
+            model.convergence.flips.extend(stored["flips"])
+            model.convergence.moves.extend(stored["moves"])
+            model.convergence.steadySteps = stored["steadySteps"]
+        # Only flips and moves from here on count towards the next window
+        model.convergence.lastFlips = model.totalFlips
+        model.convergence.lastMoves = model.totalNumMoves
+    if model.profile is not None and "profile" in header:
+        profile = header["profile"]
+        for phase in model.profile.seconds:
+            model.profile.seconds[phase] = profile[phase + "Seconds"]
+            model.profile.calls[phase] = profile[phase + "Calls"]
+        model.profile.neighborLookups = profile["neighborLookups"]
+        model.profile.emptyCellsExamined = profile["emptyCellsExamined"]
+
+    # Series the checkpoint doesn't have, e.g. the profile after turning instrument on, start as zeros
+    model.datacollector.load(header["modelVars"], model)
+
+    if not reseed:
+        for name, state in header["random"].items():
+            getattr(model, name).setstate(tuple(tuple(part) if isinstance(part, list) else part for part in state))
+    if params["maliciousLLMs"] != header["params"]["maliciousLLMs"]:
+        redraw_LLMs(model)
+    # The trajectory file of the run that was saved is left alone, a new one is only
+    # recorded when it is asked for, from the step of the checkpoint on
+    params["trajectory"] = changes.get("trajectory")
+    if params["trajectory"] is not None:
+        model.record_trajectory(params["trajectory"], params.get("trajectoryStride", 1), params.get("trajectoryAgents"))
+    return model
+
+
+def redraw_LLMs(model):
+    '''
+    Draw the type of every LLM again with the model's maliciousLLMs, for a fork that changes it
+    '''
+    LLMs = [agent for agent in model.schedule.agents if isinstance(agent, LLMAgent)]
+    for agent in LLMs:
+        agent.typeCode = TYPE_CODES[generate_LLM_agent_type(model.maliciousLLMs, model.populationRandom)]
+        agent.output = 1 if agent.typeCode == BENIGN else -1
+        if model.trackChanges:
+            model.changedCells.add(agent.pos)
+    model.totalMaliciousLLMs = sum(agent.typeCode == MALICIOUS for agent in LLMs)
+    model.totalBenignLLMs = len(LLMs) - model.totalMaliciousLLMs
+    LLMField = SparseLLMProximityField if model.params["space"] == "sparse" else LLMProximityField
+    model.LLMField = LLMField(model.neighborhoods, LLMs)
+
+
+def restore_agents(model, arrays):
+    '''
+    Put the agents of a checkpoint back on the model's grid, in their scheduling order
+    '''
+    columns = {name: arrays["agent." + name].tolist() for name, _ in AGENT_COLUMNS}
+    humanColumns = [name for name, _ in AGENT_COLUMNS if name not in ("unique_id", "x", "y", "typeCode", "flipped")]
+    LLMs = []
+    for row, agentId in enumerate(columns["unique_id"]):
+        code = columns["typeCode"][row]
+        if code >= BENIGN:
+            agent = LLMAgent(agentId, model, code)
+            for name in LLM_COLUMNS:
+                setattr(agent, name, columns[name][row])
+            LLMs.append(agent)
+        else:
+            agent = HumanAgent(agentId, model, code)
+            for name in humanColumns:
+                setattr(agent, name, columns[name][row])
+        pos = (columns["x"][row], columns["y"][row])
+        model.grid.place_agent(agent, pos)
+        model.emptyCells.remove(pos)
+        model.schedule.add(agent)
+
+    if "emptyCells" in arrays and isinstance(model.emptyCells, EmptyCellIndex):
+        model.emptyCells.cells = [tuple(pos) for pos in arrays["emptyCells"].tolist()]
+        model.emptyCells.where = {pos: i for i, pos in enumerate(model.emptyCells.cells)}
+    LLMField = SparseLLMProximityField if model.params["space"] == "sparse" else LLMProximityField
+    model.LLMField = LLMField(model.neighborhoods, LLMs)
+
+
+def restore_schedule(model, schedule):
+    '''
+    Restore the scheduler, the checkpoint and the model may use different activations
+    '''
+    model.schedule.steps = schedule["steps"]
+    model.schedule.time = schedule["time"]
+    agents = {agent.unique_id: agent for agent in model.schedule.agents}
+    lastActive = {agentId: steps for agentId, steps in schedule.get("lastActive", [])}
+
+    if not isinstance(model.schedule, DirtyRegionActivation):
+        # Bring the humans that rested up to date, as DirtyRegionActivation.settle would
+        for agentId, steps in lastActive.items():
+            agent = agents[agentId]
+            if steps < schedule["steps"] and not agent.justFlipped:
+                agent.stepsSinceFlip += schedule["steps"] - steps
+        return
+    if "restless" not in schedule:
+        # The checkpoint was taken with random activation, so everyone starts out restless
+        model.restless = {agent for agent in agents.values() if isinstance(agent, HumanAgent)}
+        model.changedCells = set()
+        return
+    model.schedule.lastActive = lastActive
+    model.changedCells = {tuple(pos) for pos in schedule["changedCells"]}
+    model.restless = {agents[agentId] for agentId in schedule["restless"]}
+
+
+def restore_flip_log(model, stored, arrays):
+    '''
+    Restore the flip log as it was, or replay its entries into a log with a new capacity
+    '''
+    # Checkpoints saved before the log kept flip counts have no flipCounts column, it reads as zeros
+    size = len(arrays["flipLog.agentIds"])
+    columns = [
+        arrays["flipLog." + name].tolist() if "flipLog." + name in arrays else [0] * size
+        for name, _ in FLIP_LOG_COLUMNS
+    ]
+    log = model.flipLog
+    if (log.capacity, log.ring) == (stored["capacity"], stored["ring"]):
+        for column, values in zip(log.columns, columns):
+            column.extend(values)
+        log.head = stored["head"]
+        log.dropped = stored["dropped"]
+        return
+    head = stored["head"]
+    for i in list(range(head, len(columns[0]))) + list(range(head)):
+        log.append(*(values[i] for values in columns))
+    log.dropped += stored["dropped"]
+
+
+def fork_checkpoint(path, variants):
+    '''
+    One model per dict of parameter changes, all restored from the same checkpoint
+    e.g. fork_checkpoint("warm.ckpt", [{"resistance": r, "seed": i} for i, r in enumerate((0.2, 0.5, 0.8))])
+    '''
+    return [load_checkpoint(path, **changes) for changes in variants]
@@ -0,0 +1,11 @@
+# Made by Kiwi!
+
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def in_tmp_path(tmp_path, monkeypatch):
+    '''
+    Run every test in its own directory, the models write their CSV files to the working directory
+    '''
+    monkeypatch.chdir(tmp_path)
@@ -0,0 +1,59 @@
+# Made by Kiwi!
+
+from collections import deque
+
+
+class ConvergenceMonitor:
+    """
+    Detects when a run has settled into a steady state
+
+    Every step the monitor is fed the misinformed count and the running totals of flips
+    and moves. It compares the mean of the latest `window` steps with the mean of the
+    `window` steps before them, for the misinformed count, the flips per step and the
+    moves per step. When none of them moved by more than `tolerance` times the number of
+    humans for `patience` steps in a row, the run has converged.
+    """
+
+    def __init__(self, numHumans, window=20, tolerance=0.01, patience=5):
+        """
+        Create a convergence monitor.
+
+        Args:
+            numHumans: Number of humans in the run, the tolerance is relative to it
+            window: Number of steps in each of the two windows compared
+            tolerance: Largest change between the windows' means that still counts as steady, per human
+            patience: Number of steady steps in a row before the run counts as converged
+        """
+        self.window = window
+        self.threshold = tolerance * max(numHumans, 1)
+        self.patience = patience
+        self.misinformed = deque(maxlen=2 * window)
+        self.flips = deque(maxlen=2 * window)
+        self.moves = deque(maxlen=2 * window)
+        self.lastFlips = 0
+        self.lastMoves = 0
+        self.steadySteps = 0
+
+    def update(self, misinformed, totalFlips, totalMoves):
+        '''
+        Add one step to the series and tell whether the run has converged
+        '''
+        self.misinformed.append(misinformed)
+        self.flips.append(totalFlips - self.lastFlips)
+        self.moves.append(totalMoves - self.lastMoves)
+        self.lastFlips = totalFlips
+        self.lastMoves = totalMoves
+        if len(self.misinformed) < 2 * self.window:
+            return False
+
+        if all(self.window_change(series) <= self.threshold for series in (self.misinformed, self.flips, self.moves)):
+            self.steadySteps += 1
+        else:
+            self.steadySteps = 0
+        return self.steadySteps >= self.patience
+
+    def window_change(self, series):
+        values = list(series)
+        previous = sum(values[:self.window]) / self.window
+        latest = sum(values[self.window:]) / self.window
+        return abs(latest - previous)
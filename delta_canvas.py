@@ -0,0 +1,102 @@
+# Made by Kiwi!
+
+import base64
+import contextvars
+import os
+import weakref
+
+import mesa
+import numpy as np
+from mesa_viz_tornado.ModularVisualization import SocketHandler
+
+from model import EMPTY
+
+# The websocket connection the elements are rendering a frame for, None when it isn't known
+rendering_for = contextvars.ContextVar("rendering_for", default=None)
+
+
+def frame_codes(model):
+    '''
+    One byte per cell, indexed x * height + y: 0 for an empty cell, otherwise the agent's
+    type code times two, plus one when its output is 1 (drawn as the smaller circle)
+    '''
+    if getattr(model, "network", None) is not None:
+        raise ValueError("The grid canvas can't draw a network space")
+    if hasattr(model, "kind"):
+        # Array engine, the grid already is an array
+        codes = (model.kind.astype(np.uint8) << 1) | (model.output == 1)
+        codes[model.kind == EMPTY] = 0
+        return codes.reshape(-1)
+
+    codes = np.zeros(model.width * model.height, dtype=np.uint8)
+    height = model.height
+    for agent in model.schedule.agents:
+        x, y = agent.pos
+        codes[x * height + y] = (agent.typeCode << 1) | (agent.output == 1)
+    return codes
+
+
+def encode(array):
+    return base64.b64encode(array.tobytes()).decode("ascii")
+
+
+class DeltaCanvasGrid(mesa.visualization.VisualizationElement):
+    """
+    Canvas grid that only sends the cells that changed since the previous frame
+
+    A frame is the grid as one byte per cell (see frame_codes). The first frame of a model
+    is sent in full, after that only the indices (uint32) and codes (uint8) of the cells
+    whose agent type or output changed are sent, both base64 encoded. The grid size comes
+    from the model, so it follows the width and height parameters.
+
+    Every browser tab has its own websocket connection and its own last frame, so the
+    previous frame is kept per connection, see ClientSocketHandler. A frame rendered for a
+    connection that isn't known is always sent in full.
+    """
+
+    local_includes = ["DeltaCanvasModule.js"]
+    local_dir = os.path.dirname(os.path.abspath(__file__))
+
+    def __init__(self, canvas_width=800, canvas_height=800):
+        """
+        Create a delta canvas grid.
+
+        Args:
+            canvas_width, canvas_height: Size of the canvas in pixels
+        """
+        super().__init__()
+        self.js_code = "elements.push(new DeltaCanvasModule({}, {}));".format(canvas_width, canvas_height)
+        # Connection -> the model and the codes of the last frame sent to it
+        self.previous = weakref.WeakKeyDictionary()
+
+    def render(self, model):
+        codes = frame_codes(model)
+        frame = {"width": model.width, "height": model.height}
+        client = rendering_for.get()
+        previousModel, previous = self.previous.get(client, (None, None)) if client is not None else (None, None)
+        if model is not previousModel or len(previous) != len(codes):
+            # A new connection, or a new model after a reset, send everything
+            frame["full"] = True
+            frame["codes"] = encode(codes)
+        else:
+            changed = np.flatnonzero(codes != previous).astype("<u4")
+            frame["full"] = False
+            frame["indices"] = encode(changed)
+            frame["codes"] = encode(codes[changed])
+        if client is not None:
+            self.previous[client] = (model, codes)
+        return frame
+
+
+class ClientSocketHandler(SocketHandler):
+    '''
+    Websocket handler that tells the elements which connection they render for, so
+    DeltaCanvasGrid can send every connection the changes since its own last frame
+    '''
+
+    def on_message(self, message):
+        token = rendering_for.set(self)
+        try:
+            super().on_message(message)
+        finally:
+            rendering_for.reset(token)
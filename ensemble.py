@@ -0,0 +1,276 @@
+# Made by Kiwi!
+
+import os
+
+import numpy as np
+
+from array_model import AGENT_FIELDS, ArraySimulation, Tile, output_data_to_file2, output_data_to_file3
+from metrics import MODEL_REPORTERS, ColumnCollector, step_reporters
+from model import BENIGN, EMPTY, MALICIOUS, output_data_to_file1
+
+# Arrays with a leading replica axis
+STACKED_FIELDS = AGENT_FIELDS + (
+    "shouldMove", "trustingTarget", "untrustingTarget", "maliciousInRadius", "benignInRadius",
+    "LLMsInRadius", "flipsByLLMType",
+)
+# Counters with one entry per replica
+REPLICA_COUNTERS = (
+    "totalMaliciousLLMs", "totalBenignLLMs", "totalTrustingHumans", "totalUntrustingHumans",
+    "totalSemiTrustingHumans", "numLLMs", "numHumans", "numAgents", "totalMisinformedHumans",
+    "happy", "totalNumMoves", "totalFlips", "maliciousLLMFlips", "benignLLMFlips",
+)
+# Parameters shared by every replica
+SHARED_PARAMETERS = (
+    "height", "width", "informationingHumans", "untrustingHumans", "maxIterations", "proportionLLMs",
+    "maliciousLLMs", "radius", "InconvenienceThreshold", "density", "resistance", "offsets",
+)
+
+
+def replica_seeds(seed, replicas):
+    '''
+    Seed of every replica of an ensemble, derived from the ensemble's seed
+    '''
+    return [int(value) for value in np.random.SeedSequence(seed).generate_state(replicas)]
+
+
+class EnsembleSimulation(ArraySimulation):
+    """
+    Independent replicas of an ArraySimulation, stepped together
+
+    Every array gets a leading replica axis, so each phase of the step runs over all the
+    replicas at once and NumPy's per-call overhead is paid once per step instead of once per
+    replica. Neighborhoods wrap around each replica's own torus. Every replica draws from
+    its own random streams, so replica r runs exactly like ArraySimulation(seed=self.seeds[r])
+    with the same parameters.
+
+    The model reporters collect one value per replica, see summary. A replica that finished
+    (maxIterations, every human happy, or converged) is frozen while the others go on, so
+    it keeps reporting its final values until the last replica finished.
+    """
+
+    def __init__(self, replicas=30, seeds=None, seed=None, outputDir=None, stepMetrics=False, **params):
+        """
+        Create a new ensemble.
+
+        Args:
+            replicas: Number of replicas, ignored when seeds is given
+            seeds: Seed of every replica, derived from seed when None
+            seed: Seed of the ensemble, drawn when None
+            outputDir: Write the model.csv, LLM.csv and Human.csv of every replica under this
+                       directory once the run finished, see write_outputs. None writes nothing
+            stepMetrics: See Simulation
+            params: The same as ArraySimulation
+        """
+        if seeds is None:
+            if seed is None:
+                seed = int(np.random.SeedSequence().generate_state(1)[0])
+            seeds = replica_seeds(seed, replicas)
+        self.seed = seed
+        self.seeds = list(seeds)
+        self.replicas = len(self.seeds)
+        self.outputDir = outputDir
+
+        # Build every replica as an ArraySimulation and stack its arrays, so each starts
+        # exactly where the standalone run with its seed does
+        self.relocationRandom = []
+        self.influenceRandom = []
+        self.monitors = []
+        for replica, replicaSeed in enumerate(self.seeds):
+            model = ArraySimulation(seed=replicaSeed, **params)
+            if replica == 0:
+                for name in SHARED_PARAMETERS:
+                    setattr(self, name, getattr(model, name))
+                for name in STACKED_FIELDS:
+                    array = getattr(model, name)
+                    setattr(self, name, np.zeros((self.replicas,) + array.shape, dtype=array.dtype))
+                for name in REPLICA_COUNTERS:
+                    setattr(self, name, np.zeros(self.replicas, dtype=np.int64))
+            for name in STACKED_FIELDS:
+                getattr(self, name)[replica] = getattr(model, name)
+            for name in REPLICA_COUNTERS:
+                getattr(self, name)[replica] = getattr(model, name)
+            self.relocationRandom.append(model.relocationRandom)
+            self.influenceRandom.append(model.influenceRandom)
+            self.monitors.append(model.convergence)
+
+        self.area = self.width * self.height
+        self.agentFields = [getattr(self, name) for name in AGENT_FIELDS]
+        # The replica axis comes first, so the whole stack is one tile of `replicas` rows
+        self.wholeGrid = Tile(self.replicas, self.height)
+        self.running = True
+        self.iterations = 0
+        # Replicas that still step, and the step each replica finished or converged at
+        self.live = np.ones(self.replicas, dtype=bool)
+        self.finalStep = np.zeros(self.replicas, dtype=np.int64)
+        self.convergenceSteps = [None] * self.replicas
+
+        model_reporters = dict(MODEL_REPORTERS)
+        if stepMetrics:
+            model_reporters.update(step_reporters())
+        self.datacollector = ColumnCollector(model_reporters, (self.maxIterations or 0) + 1)
+        self.datacollector.collect(self)
+
+    def stepping(self, kind):
+        return super().stepping(kind) & self.live[:, None, None]
+
+    def replica_counts(self, cells):
+        return np.bincount(cells // self.area, minlength=self.replicas)
+
+    def replica_bounds(self, cells):
+        '''
+        Where every replica's cells start and stop in cells, which must be sorted
+        '''
+        bounds = np.searchsorted(cells, np.arange(self.replicas + 1) * self.area)
+        return [(replica, start, stop) for replica, (start, stop) in enumerate(zip(bounds[:-1], bounds[1:])) if stop > start]
+
+    def random_rows(self, rng, cells, shape):
+        # Every replica draws its rows from its own stream, in the order a standalone run would
+        parts = [rng[replica].random((stop - start,) + shape[1:]) for replica, start, stop in self.replica_bounds(cells)]
+        return np.concatenate(parts) if parts else np.zeros(shape)
+
+    def random_order(self, rng, cells):
+        parts = [start + rng[replica].permutation(stop - start) for replica, start, stop in self.replica_bounds(cells)]
+        return np.concatenate(parts) if parts else np.zeros(0, dtype=np.int64)
+
+    def move_randomly(self, src, empties):
+        emptyBounds = {replica: (start, stop) for replica, start, stop in self.replica_bounds(empties)}
+        moved = []
+        for replica, start, stop in self.replica_bounds(src):
+            if replica not in emptyBounds:
+                continue
+            rng = self.relocationRandom[replica]
+            replicaEmpties = empties[slice(*emptyBounds[replica])]
+            count = min(stop - start, len(replicaEmpties))
+            moved.append((
+                rng.permutation(src[start:stop])[:count], rng.choice(replicaEmpties, size=count, replace=False),
+            ))
+        if moved:
+            src = np.concatenate([replicaSrc for replicaSrc, _ in moved])
+            dst = np.concatenate([replicaDst for _, replicaDst in moved])
+            self.move(src, dst)
+            self.shouldMove.reshape(-1)[dst] = True
+            self.shouldMove.reshape(-1)[src] = False
+
+    def count_influence(self, effects):
+        self.totalFlips += effects["flips"]
+        np.add.at(self.flipped.reshape(-1), effects["flippedLLMs"], 1)
+        np.add.at(self.numNeigborsFlipped.reshape(-1), effects["flippedHumans"], 1)
+        np.add.at(self.flipsByLLMType, (effects["creditTypeCells"] // self.area, effects["creditTypes"]), 1)
+
+    def count_humans(self):
+        kind = self.kind.reshape(self.replicas, -1)
+        humans = (kind > EMPTY) & (kind < BENIGN)
+        self.totalMisinformedHumans = np.count_nonzero(humans & (self.output.reshape(self.replicas, -1) < 0), axis=1)
+        self.happy = np.count_nonzero(humans & self.isHappy.reshape(self.replicas, -1), axis=1)
+
+    def step(self):
+        """
+        Run one step of every replica that still runs.
+        """
+        self.iterations += 1
+
+        self.relocate()
+        self.influence()
+        self.update_confidence()
+
+        self.count_humans()
+        self.maliciousLLMFlips = self.flipsByLLMType[:, MALICIOUS].copy()
+        self.benignLLMFlips = self.flipsByLLMType[:, BENIGN].copy()
+
+        self.datacollector.collect(self)
+        for replica in np.flatnonzero(self.live):
+            monitor = self.monitors[replica]
+            if monitor is not None and monitor.update(
+                int(self.totalMisinformedHumans[replica]), int(self.totalFlips[replica]), int(self.totalNumMoves[replica]),
+            ):
+                self.convergenceSteps[replica] = self.iterations
+            if (
+                self.iterations == self.maxIterations or self.happy[replica] == self.numHumans[replica]
+                or self.convergenceSteps[replica] is not None
+            ):
+                self.live[replica] = False
+                self.finalStep[replica] = self.iterations
+        self.running = bool(self.live.any())
+        if not self.running and self.outputDir is not None:
+            self.write_outputs(self.outputDir)
+
+    def summary(self, quantiles=(0.05, 0.5, 0.95)):
+        '''
+        Per-step statistics of every model reporter across the replicas
+        Returns {reporter: {"mean": ..., "variance": ..., "quantiles": {q: ...}}}, each an array with
+        one value per collect. The variance is the sample variance (ddof=1)
+        '''
+        summary = {}
+        for name, values in self.datacollector.model_vars.items():
+            values = values.astype(np.float64)
+            summary[name] = {
+                "mean": values.mean(axis=1),
+                "variance": values.var(axis=1, ddof=1) if self.replicas > 1 else np.zeros(len(values)),
+                "quantiles": {q: np.quantile(values, q, axis=1) for q in quantiles},
+            }
+        return summary
+
+    def results(self, params=None):
+        '''
+        The result of every replica, in the layout of sweep.run_simulation
+        '''
+        results = []
+        model_vars = self.datacollector.model_vars
+        for index, seed in enumerate(self.seeds):
+            steps = (self.iterations if self.live[index] else int(self.finalStep[index])) + 1
+            series = {name: values[:steps, index].tolist() for name, values in model_vars.items()}
+            results.append({
+                "params": dict(params or {}, seed=seed),
+                "iterations": steps - 1,
+                "convergenceStep": self.convergenceSteps[index],
+                "totalNumMoves": int(self.totalNumMoves[index]),
+                "final": {name: values[-1] for name, values in series.items()},
+                "series": series,
+            })
+        return results
+
+    def replica(self, index):
+        '''
+        One replica as an ArraySimulation whose arrays are views into the ensemble, to inspect
+        it or write its CSV files
+        '''
+        view = ArraySimulation.__new__(ArraySimulation)
+        for name in SHARED_PARAMETERS:
+            setattr(view, name, getattr(self, name))
+        for name in STACKED_FIELDS:
+            setattr(view, name, getattr(self, name)[index])
+        for name in REPLICA_COUNTERS:
+            setattr(view, name, int(getattr(self, name)[index]))
+        view.agentFields = [getattr(view, name) for name in AGENT_FIELDS]
+        view.wholeGrid = Tile(self.width, self.height)
+        view.seed = self.seeds[index]
+        view.relocationRandom = self.relocationRandom[index]
+        view.influenceRandom = self.influenceRandom[index]
+        view.convergence = self.monitors[index]
+        view.convergenceStep = self.convergenceSteps[index]
+        view.running = bool(self.live[index])
+        view.iterations = self.iterations if view.running else int(self.finalStep[index])
+        view.outputDir = None
+        return view
+
+    def write_outputs(self, directory):
+        '''
+        Write the model.csv, LLM.csv and Human.csv of every replica, each to directory/replica-NNN
+        '''
+        for index in range(self.replicas):
+            view = self.replica(index)
+            view.outputDir = os.path.join(directory, "replica-%03d" % index)
+            os.makedirs(view.outputDir, exist_ok=True)
+            output_data_to_file1(view)
+            output_data_to_file2(view)
+            output_data_to_file3(view)
+
+
+def run_ensemble(replicas=30, quantiles=(0.05, 0.5, 0.95), **params):
+    '''
+    Run an EnsembleSimulation to completion and return its summary and the model
+    '''
+    model = EnsembleSimulation(replicas=replicas, **params)
+    while model.running:
+        model.step()
+    return model.summary(quantiles), model
@@ -0,0 +1,36 @@
+# Made by Kiwi!
+
+import importlib.machinery
+import importlib.util
+import os
+import sys
+import types
+
+
+class DeferredModule(types.ModuleType):
+    """
+    Stand-in for a module that is only imported the first time one of its attributes is used
+    """
+
+    def __getattr__(self, name):
+        # Only called for attributes the stand-in doesn't have, i.e. the module's contents
+        del sys.modules[self.__name__]
+        module = importlib.import_module(self.__name__)
+        self.__dict__.update(module.__dict__)
+        return getattr(module, name)
+
+
+def defer_visualization_import():
+    '''
+    Keep `import mesa` from loading mesa.visualization (and with it Tornado and the rest of the
+    web server stack) until something actually uses it. Call this before the first import of mesa
+    '''
+    if "mesa" in sys.modules or "mesa.visualization" in sys.modules:
+        return
+    spec = importlib.util.find_spec("mesa")
+    if spec is None or not spec.submodule_search_locations:
+        return
+    module = DeferredModule("mesa.visualization")
+    module.__spec__ = importlib.machinery.ModuleSpec("mesa.visualization", None, is_package=True)
+    module.__path__ = [os.path.join(location, "visualization") for location in spec.submodule_search_locations]
+    sys.modules["mesa.visualization"] = module
@@ -0,0 +1,164 @@
+# Made by Kiwi!
+
+from array import array
+
+import numpy as np
+
+
+class FlipLog:
+    """
+    Shared log of the flips that were traced back to an LLM, one entry per flip history record
+
+    Entries are stored as typed columns (agent id, step, LLM type code, the agent's flip count,
+    and the cascade edge: influencer id, root LLM id, depth) instead of a list of dicts on every agent. The log can
+    be capped: once `capacity` entries are stored, new entries are either dropped or, in ring
+    mode, overwrite the oldest ones. Uncapped, it is an append-only edge list of every flip
+    cascade, see CascadeGraph.
+    """
+
+    def __init__(self, capacity=None, ring=False):
+        """
+        Create an empty flip log.
+
+        Args:
+            capacity: Maximum number of entries kept, None for no limit
+            ring: Overwrite the oldest entries once the log is full, instead of dropping new ones
+        """
+        if ring and capacity is None:
+            raise ValueError("A ring buffer flip log needs a capacity")
+        self.capacity = capacity
+        self.ring = ring
+        self.agentIds = array('q')
+        self.steps = array('l')
+        self.LLMTypes = array('b')
+        # The agent whose output flipped agentId: the LLM itself, or a human it reached earlier
+        self.influencerIds = array('q')
+        # The LLM the cascade started from, and how many hops from it agentId is
+        self.rootIds = array('q')
+        self.depths = array('l')
+        # The flipCount of agentId with this flip
+        self.flipCounts = array('l')
+        self.columns = (
+            self.agentIds, self.steps, self.LLMTypes, self.influencerIds, self.rootIds, self.depths, self.flipCounts,
+        )
+        # Index of the oldest entry once a ring buffer has wrapped around
+        self.head = 0
+        # Number of entries that were dropped or overwritten
+        self.dropped = 0
+
+    def __len__(self):
+        return len(self.agentIds)
+
+    def append(self, agentId, step, LLMType, influencerId=-1, rootId=-1, depth=0, flipCount=0):
+        '''
+        Record that agentId was flipped for the flipCount-th time at step by influencerId, in
+        the cascade of the LLM rootId of type code LLMType, depth hops away from it
+        '''
+        entry = (agentId, step, LLMType, influencerId, rootId, depth, flipCount)
+        if self.capacity is None or len(self.agentIds) < self.capacity:
+            for column, value in zip(self.columns, entry):
+                column.append(value)
+            return
+        self.dropped += 1
+        if self.ring:
+            for column, value in zip(self.columns, entry):
+                column[self.head] = value
+            self.head = (self.head + 1) % self.capacity
+
+    def entries(self, agentId=None):
+        '''
+        The (agent id, step, LLM type code, flip count) entries from oldest to newest, optionally of one agent only
+        '''
+        order = list(range(self.head, len(self.agentIds))) + list(range(self.head))
+        return [
+            (self.agentIds[i], self.steps[i], self.LLMTypes[i], self.flipCounts[i]) for i in order
+            if agentId is None or self.agentIds[i] == agentId
+        ]
+
+    def edges(self):
+        '''
+        The entries from oldest to newest as NumPy columns, see CascadeGraph
+        '''
+        order = np.r_[self.head:len(self.agentIds), 0:self.head]
+        names = ("agentIds", "steps", "LLMTypes", "influencerIds", "rootIds", "depths", "flipCounts")
+        return {name: np.frombuffer(column, dtype=column.typecode)[order] for name, column in zip(names, self.columns)}
+
+
+class CascadeGraph:
+    """
+    The flip cascades of a FlipLog as a graph in compressed sparse row (CSR) form
+
+    Node i is the agent nodeIds[i]. The edges from node i, to the agents it flipped, are
+    edges[indptr[i]:indptr[i + 1]], sorted by step, with targets[...] the node each one
+    flipped and steps, rootIds and depths the edge's columns of the log. A capped FlipLog
+    only holds part of the cascades, and so does its graph.
+    """
+
+    def __init__(self, log):
+        """
+        Build the graph of a FlipLog.
+
+        Args:
+            log: The FlipLog
+        """
+        edges = log.edges()
+        order = np.lexsort((edges["steps"], edges["influencerIds"]))
+        influencers = edges["influencerIds"][order]
+        self.nodeIds, nodes = np.unique(np.concatenate([influencers, edges["agentIds"][order]]), return_inverse=True)
+        sources, self.targets = nodes[:len(order)], nodes[len(order):]
+        self.indptr = np.zeros(len(self.nodeIds) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(sources, minlength=len(self.nodeIds)), out=self.indptr[1:])
+        self.steps = edges["steps"][order]
+        self.rootIds = edges["rootIds"][order]
+        self.depths = edges["depths"][order]
+        self.LLMTypes = edges["LLMTypes"][order]
+
+    def node(self, agentId):
+        '''
+        Node index of an agent, or -1 when it's in no cascade
+        '''
+        index = np.searchsorted(self.nodeIds, agentId)
+        return int(index) if index < len(self.nodeIds) and self.nodeIds[index] == agentId else -1
+
+    def flipped_by(self, agentId):
+        '''
+        Agent ids an agent flipped, and the steps, as views in step order
+        '''
+        node = self.node(agentId)
+        if node < 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=self.steps.dtype)
+        start, stop = self.indptr[node], self.indptr[node + 1]
+        return self.nodeIds[self.targets[start:stop]], self.steps[start:stop]
+
+    def depth_distribution(self, rootId=None):
+        '''
+        Number of cascade flips at every depth (index 0 is unused), of one LLM or of all of them
+        '''
+        depths = self.depths if rootId is None else self.depths[self.rootIds == rootId]
+        return np.bincount(depths, minlength=1)
+
+    def LLM_stats(self):
+        '''
+        Per root LLM id: the flips its cascades caused, the distinct humans they reached, their
+        maximum and mean depth, and the step of the first flip and the mean step of the flips
+        (the time to flip, counted from the start of the run)
+        '''
+        if len(self.rootIds) == 0:
+            return {}
+        roots, index, flips = np.unique(self.rootIds, return_inverse=True, return_counts=True)
+        targets = self.nodeIds[self.targets]
+        reached = np.unique(np.stack([self.rootIds, targets]), axis=1)
+        reach = np.bincount(np.searchsorted(roots, reached[0]), minlength=len(roots))
+        maxDepth = np.zeros(len(roots), dtype=np.int64)
+        np.maximum.at(maxDepth, index, self.depths)
+        firstStep = np.full(len(roots), np.iinfo(np.int64).max)
+        np.minimum.at(firstStep, index, self.steps)
+        meanDepth = np.bincount(index, weights=self.depths) / flips
+        meanStep = np.bincount(index, weights=self.steps) / flips
+        return {
+            int(root): {
+                "flips": int(flips[i]), "reach": int(reach[i]), "maxDepth": int(maxDepth[i]),
+                "meanDepth": float(meanDepth[i]), "firstFlipStep": int(firstStep[i]), "meanTimeToFlip": float(meanStep[i]),
+            }
+            for i, root in enumerate(roots)
+        }
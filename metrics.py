@@ -0,0 +1,157 @@
+# Made by Kiwi!
+
+from operator import attrgetter
+
+import numpy as np
+
+# Reporters of every Simulation engine, DataCollector name -> model attribute
+MODEL_REPORTERS = {
+    "maliciousLLMs": "totalMaliciousLLMs",
+    "benignLLMs": "totalBenignLLMs",
+    "trustingHumans": "totalTrustingHumans",
+    "untrustingHumans": "totalUntrustingHumans",
+    "semiTrustingHumans": "totalSemiTrustingHumans",
+    "totalMisinformedHumans": "totalMisinformedHumans",
+    "numAgents": "numAgents",
+}
+
+
+class StepChange:
+    """
+    Reporter of how much a model attribute changed since the previous collect,
+    e.g. StepChange("totalFlips") reports the flips per step
+    """
+
+    def __init__(self, attribute):
+        self.get = attrgetter(attribute)
+        self.last = 0
+
+    def __call__(self, model):
+        value = self.get(model)
+        change = value - self.last
+        # Counters kept as arrays are updated in place, keep a copy
+        self.last = value.copy() if isinstance(value, np.ndarray) else value
+        return change
+
+
+def step_reporters():
+    '''
+    The optional per-step reporters, flips and moves of every step
+    '''
+    return {"flipsPerStep": StepChange("totalFlips"), "movesPerStep": StepChange("totalNumMoves")}
+
+
+class ColumnCollector:
+    """
+    Drop-in replacement for the model reporters of mesa.DataCollector, stored as NumPy columns
+
+    Every reporter gets a column preallocated for the number of collects the run can take,
+    typed and shaped after the first value it reports, and collect writes one value into each
+    in place. A value the column's type can't hold, e.g. a float after ints, widens the column
+    instead of being truncated. A reporter may report an array, e.g. one value per replica of
+    an ensemble, its column then gets one row per collect.
+    String reporters are resolved to attribute getters once, not on every collect.
+    model_vars maps every reporter to a view of the values collected so far, so the
+    columns are read without copying them. A run longer than the capacity still works,
+    the columns double in size when they fill up.
+    """
+
+    def __init__(self, model_reporters, capacity=1):
+        """
+        Create a collector with empty columns.
+
+        Args:
+            model_reporters: Maps a reporter name to a model attribute name or a function of the model
+            capacity: Number of collects to allocate for, e.g. maxIterations + 1
+        """
+        self.model_reporters = dict(model_reporters)
+        self.getters = {
+            name: attrgetter(reporter) if isinstance(reporter, str) else reporter
+            for name, reporter in self.model_reporters.items()
+        }
+        self.capacity = max(capacity, 1)
+        self.columns = {}
+        self.collected = 0
+
+    def __len__(self):
+        return self.collected
+
+    def collect(self, model):
+        '''
+        Add the current value of every reporter
+        '''
+        if self.collected == self.capacity:
+            self.grow(2 * self.capacity)
+        row = self.collected
+        columns = self.columns
+        for name, getter in self.getters.items():
+            value = getter(model)
+            if name not in columns:
+                value = np.asarray(value)
+                columns[name] = np.zeros((self.capacity,) + value.shape, dtype=value.dtype)
+            self.column_for(name, value)[row] = value
+        self.collected += 1
+
+    def column_for(self, name, value):
+        '''
+        The column of a reporter, widened first when its type can't hold value
+        '''
+        column = self.columns[name]
+        dtype = np.result_type(column.dtype, value)
+        if dtype != column.dtype:
+            column = self.columns[name] = column.astype(dtype)
+        return column
+
+    def grow(self, capacity):
+        for name, column in self.columns.items():
+            grown = np.zeros((capacity,) + column.shape[1:], dtype=column.dtype)
+            grown[:self.collected] = column[:self.collected]
+            self.columns[name] = grown
+        self.capacity = capacity
+
+    @property
+    def model_vars(self):
+        '''
+        Reporter name -> NumPy view of its values so far, one per collect
+        '''
+        return {name: column[:self.collected] for name, column in self.columns.items()}
+
+    def series(self):
+        '''
+        Reporter name -> list of its values so far, e.g. to store them as JSON
+        '''
+        return {name: values.tolist() for name, values in self.model_vars.items()}
+
+    def get_model_vars_dataframe(self):
+        '''
+        The values so far as a pandas DataFrame, one row per collect
+        A reporter that reports arrays gets one column per element, e.g. "totalMisinformedHumans[3]"
+        for replica 3 of an ensemble
+        '''
+        import pandas as pd
+
+        columns = {}
+        for name, values in self.model_vars.items():
+            if values.ndim == 1:
+                columns[name] = values
+                continue
+            for index, column in enumerate(values.reshape(len(values), -1).T):
+                columns["%s[%d]" % (name, index)] = column
+        return pd.DataFrame(columns)
+
+    def load(self, series, model):
+        '''
+        Replace the collected values with series, as returned by series(), e.g. from a checkpoint
+        Reporters the series don't have are filled with zeros
+        '''
+        collected = len(next(iter(series.values())))
+        if collected > self.capacity:
+            self.grow(collected)
+        self.collected = collected
+        for name in self.columns:
+            values = np.asarray(series.get(name, 0))
+            self.column_for(name, values)[:collected] = values
+        # The next step change is counted from the model as it is now
+        for getter in self.getters.values():
+            if isinstance(getter, StepChange):
+                getter.last = getter.get(model)
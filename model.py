@@ -1,24 +1,81 @@
 # Made by Kiwi! 
 
-import mesa
+import contextlib
+import gc
+import numpy as np
+import os
 import random
-
-class HumanAgent(mesa.Agent):
+import time
+
+from headless import defer_visualization_import
+
+# Mesa's package imports its web server stack, which the model doesn't need
+defer_visualization_import()
+from mesa.agent import Agent
+from mesa.model import Model
+from mesa.space import SingleGrid
+from mesa.time import RandomActivation
+
+from convergence import ConvergenceMonitor
+from history import CascadeGraph, FlipLog
+from metrics import MODEL_REPORTERS, ColumnCollector, step_reporters
+from network import build_network
+from profiling import PhaseProfile, profile_reporters
+from trajectory import TrajectoryRecorder
+from space import (
+    EmptyCellIndex, LLMProximityField, NeighborhoodIndex,
+    SparseEmptyCellIndex, SparseGrid, SparseLLMProximityField, place_agents,
+)
+
+# Integer codes for the agent types, shared by the agent model and the array engine
+EMPTY = 0
+TRUSTING = 1
+UNTRUSTING = 2
+SEMI_TRUSTING = 3
+BENIGN = 4
+MALICIOUS = 5
+
+TYPE_NAMES = {
+    TRUSTING: 'trusting',
+    UNTRUSTING: 'untrusting',
+    SEMI_TRUSTING: 'semi-trusting',
+    BENIGN: 'benign',
+    MALICIOUS: 'malicious',
+}
+TYPE_CODES = {name: code for code, name in TYPE_NAMES.items()}
+
+# Columns of LLM.csv, the cascade columns come from CascadeGraph.LLM_stats
+CASCADE_COLUMNS = ("flips", "reach", "maxDepth", "meanDepth", "firstFlipStep", "meanTimeToFlip")
+LLM_CSV_HEADER = "LLM id, Type of LLM, Flipped, Cascade flips, Reach, Max depth, Mean depth, First flip step, Mean time to flip\n"
+NO_CASCADE = {"flips": 0, "reach": 0, "maxDepth": 0, "meanDepth": 0, "firstFlipStep": "", "meanTimeToFlip": ""}
+
+class HumanAgent(Agent):
     """
     Class Representing a Human Agent in a society
     """
 
-    def __init__(self, unique_id, model, agent_type):
+    # Slots keep the per-agent fields out of an instance dict, which matters on large worlds
+    __slots__ = (
+        'typeCode', 'information', 'confidence', 'misinformed', 'output', 'LLMThatFlippedCode',
+        'flipCount', 'justFlipped', 'stepsSinceFlip', 'numNeigborsFlipped', 'totalNumMoves', 'happy',
+        'lastMoveWasRandom', 'numMaliciousLLMNeighbors', 'numBenignLLMNeighbors',
+        'numTrustingHumanNeighbors', 'numUntrustingHumanNeighbors', 'numSemiTrustingHumanNeighbors',
+        'LLMtrustCoefficient', 'HumanTrustCoefficient', 'rootLLMId', 'cascadeDepth',
+    )
+
+    def __init__(self, unique_id, model, agent_type, misinformed=None, LLMtrustCoefficient=None):
         """
         Create a new human agent.
 
         Args:
            unique_id: Unique identifier for the agent.
            x, y: Agent initial location.
-           agent_type: Indicator for the agent's type (trusting, semi-trusting, untrusting)
+           agent_type: Indicator for the agent's type (trusting, semi-trusting, untrusting), a name or a type code
+           misinformed, LLMtrustCoefficient: Initial values drawn in bulk by Simulation.populate_bulk,
+                                             drawn from the model's population stream when None
         """
         super().__init__(unique_id, model)
-        self.type = agent_type
+        self.typeCode = TYPE_CODES.get(agent_type, agent_type)
 
         # Metrics
 
@@ -34,14 +91,20 @@ class HumanAgent(mesa.Agent):
         # but the proportion who are influenced into sharing false material because they think it is 
         # true might be around 10%.
         # https://crestresearch.ac.uk/resources/disinformation-on-social-media/
-        randn = random.random()
-        if randn < 0.1:
+        rng = model.populationRandom
+        if misinformed is None:
+            misinformed = rng.random() < 0.1
+        if misinformed:
             self.output = -1
             self.misinformed = True
         else:
             self.output = 1
-        self.LLMThatFlipped = None
-        self.flipHistory = []
+        # Type code of the LLM the latest flip traces back to, EMPTY if none
+        # The flips themselves are recorded in the model's flipLog
+        self.LLMThatFlippedCode = EMPTY
+        # unique_id of that LLM, -1 if none, and how many flips away from it this agent is
+        self.rootLLMId = -1
+        self.cascadeDepth = 0
         self.flipCount = 0
         self.justFlipped = False
         self.stepsSinceFlip = 0
@@ -66,117 +129,49 @@ class HumanAgent(mesa.Agent):
         # 0 is uncaring, 1 is satisfied, -1 is unsatisfied
         # This tells us how much a humanagent trusts LLMs. Humans are trusted to be confidence * .5  
         # LLMs are trusted to be confidence * trustCoefficient
-        if agent_type == 'trusting':
+        if LLMtrustCoefficient is not None:
+            self.LLMtrustCoefficient = LLMtrustCoefficient
+        elif self.typeCode == TRUSTING:
             # Generate a random trust value between 0.67 and 1
-            self.LLMtrustCoefficient = random.uniform(0.67, 1)
-        elif agent_type == 'semi-trusting':
+            self.LLMtrustCoefficient = rng.uniform(0.67, 1)
+        elif self.typeCode == SEMI_TRUSTING:
             # Generate a random trust value between 0.34 and 0.66
-            self.LLMtrustCoefficient = random.uniform(0.34, 0.66)
-        elif agent_type == 'untrusting':
+            self.LLMtrustCoefficient = rng.uniform(0.34, 0.66)
+        elif self.typeCode == UNTRUSTING:
             # Generate a random trust value between 0.01 and 0.33
-            self.LLMtrustCoefficient = random.uniform(0.01, 0.33)
+            self.LLMtrustCoefficient = rng.uniform(0.01, 0.33)
         # neighbors = self.model.grid.get_neighbors(self.pos, moore=True, include_center=False, radius=self.model.radius)
 
-    def step(self):
-        shouldMove = False
-        LLMInNeighorhood = False
-        # Get the neighbors of the agent, radius is the neighborhood to be considered
-        # Change radius to different values to see how it affects the model
-        neighbors = self.model.grid.get_neighbors(self.pos, moore=True, include_center=False, radius=self.model.radius)
-        # If the agent is trusting, they will up their trust coefficient if they have a human or LLM neighbor
-        numLLMNeighbors = 0
-        numHumanNeighbors = 0
-        for neighbor in neighbors:
-            if isinstance(neighbor, LLMAgent):
-                numLLMNeighbors += 1
-            else:
-                numHumanNeighbors += 1
+    @property
+    def type(self):
+        return TYPE_NAMES[self.typeCode]
 
-        # proportionLLMs=0.05,
-        # maliciousLLMs=0.5,
-        if (numLLMNeighbors + numHumanNeighbors != 0) and numLLMNeighbors / (numLLMNeighbors + numHumanNeighbors) > ((self.model.maliciousLLMs / 10) + self.model.proportionLLMs):
-            LLMInNeighorhood = True
+    @property
+    def LLMThatFlipped(self):
+        return TYPE_NAMES.get(self.LLMThatFlippedCode)
 
-        if self.type == 'trusting':
-            if not LLMInNeighorhood:
-                shouldMove = True
-                self.happy = False
-        elif self.type == 'untrusting':
-            if LLMInNeighorhood:
-                shouldMove = True
-                self.happy = False
-        
-        if shouldMove:
-            # Trusting Agents will move to a space around an LLM agent. If no spaces are available, they will move to a random space
-            moved = False
-            # If the agent has moved more than 10 times and the last move was not random, move to a random empty space
-            # This simulates a human agent leaving the area
-            if self.totalNumMoves > 10 and not self.lastMoveWasRandom:
-                # Move to a random empty space
-                self.model.grid.move_to_empty(self)
-                self.lastMoveWasRandom = True
-            
-            self.lastMoveWasRandom = False
-            if self.type == 'trusting':
-                # Move to a space around an LLM agent close to them
-                for i in range(1, self.model.InconvenienceThreshold):
-                    # Get the neighbors of the agent
-                    radiusNeighborhood = self.model.grid.get_neighborhood(self.pos, moore=True, include_center=False, radius=i)
-                    # Iterate through all empty spaces around the agent
-                    # If an LLM exists in the neighborhood of that empty space, move to that space
-                    # Otherwise, stay
-                    emptySpaces = []
-                    for cell in radiusNeighborhood:
-                        if self.model.grid.is_cell_empty(cell) is True:
-                            emptySpaces.append(cell)
-                        
-                    for space in emptySpaces:
-                        neighbors = self.model.grid.get_neighbors(space, moore=True, include_center=False, radius=self.model.radius)
-                        for neighbor in neighbors:
-                            if isinstance(neighbor, LLMAgent):
-                                self.model.grid.move_agent(self, space)
-                                self.model.totalNumMoves += 1
-                                self.totalNumMoves += 1
-                                moved = True
-                                self.happy = True
-                            if moved:
-                                break
-                        if moved:
-                            break
-                    if moved:
-                        break 
-            elif self.type == 'untrusting':
-                # Move away from an LLM agent close to them
-                for i in range(1, self.model.InconvenienceThreshold):
-                    if moved:
-                        break
-                    # Get the neighbors of the agent
-                    radiusNeighborhood = self.model.grid.get_neighborhood(self.pos, moore=True, include_center=False, radius=i)
-                    # Iterate through all empty spaces around the agent
-                    # If an LLM exists in the neighborhood of that empty space, move to that space
-                    # Otherwise, stay
-                    emptySpaces = []
-                    for cell in radiusNeighborhood:
-                        if self.model.grid.is_cell_empty(cell) is True:
-                            emptySpaces.append(cell)
-                    
-                    for space in emptySpaces:
-                        neighbors = self.model.grid.get_neighbors(space, moore=True, include_center=False, radius=self.model.radius)
-                        for neighbor in neighbors:
-                            if isinstance(neighbor, LLMAgent):
-                                continue 
-                            else:
-                                self.model.grid.move_agent(self, space)
-                                self.model.totalNumMoves += 1
-                                self.totalNumMoves += 1
-                                moved = True
-                                self.happy = True
-                            if moved:
-                                break
-                        if moved:
-                            break
-                    if moved:
-                        break
+    @property
+    def flipHistory(self):
+        '''
+        This agent's entries of the model's flip log
+        '''
+        return [
+            {'LLMThatFlipped:': TYPE_NAMES[LLMType], 'flipCount:': flipCount}
+            for _, _, LLMType, flipCount in self.model.flipLog.entries(self.unique_id)
+        ]
+
+    def step(self):
+        oldPos = self.pos
+        oldOutput = self.output
+        oldConfidence = self.confidence
+
+        # Phase timing, only when the model is instrumented
+        profile = self.model.profile
+        # In the batched movement mode the model already moved everyone this step
+        if self.model.batchedMovement is None:
+            self.relocate(profile)
+        if profile is not None:
+            phaseStart = time.perf_counter()
 
         # We will get the moore neighborhood
         # Humans will be trusted to be output * confidence * .5 
@@ -185,8 +180,14 @@ class HumanAgent(mesa.Agent):
         # LLMs will be trusted to be output * confidence * trustCoefficient
         # Output is 1 if informed, -1 if misinformed
         # self.information is the average trust of the agent towards its neighbors
-        neighbors = self.model.grid.get_neighbors(self.pos, moore=True, include_center=False, radius=self.model.radius)
-        set_informed_or_not(self, neighbors)
+        # The same neighborhood is used for the confidence math below, the agent doesn't move in between
+        neighbors = self.model.neighborhoods.neighbors(self.pos)
+        set_informed_or_not(self, list(neighbors))
+
+        if profile is not None:
+            now = time.perf_counter()
+            profile.add('influence', now - phaseStart)
+            phaseStart = now
 
         # TODO: Maybe have this variable based on confidence
         if self.information > self.model.resistance * 3:
@@ -194,6 +195,7 @@ class HumanAgent(mesa.Agent):
         elif self.information < -self.model.resistance * 3:
             self.information = -self.model.resistance
 
+        wasMisinformed = self.misinformed
         if self.information > 0:
             self.output = 1
             self.misinformed = False
@@ -203,6 +205,13 @@ class HumanAgent(mesa.Agent):
         else:
             self.output = 0
             self.misinformed = False
+        if self.misinformed != wasMisinformed:
+            self.model.totalMisinformedHumans += 1 if self.misinformed else -1
+
+        if profile is not None:
+            now = time.perf_counter()
+            profile.add('clamp', now - phaseStart)
+            phaseStart = now
 
         # Confidence Math
 
@@ -216,8 +225,6 @@ class HumanAgent(mesa.Agent):
         # Check the neighbors of the agent
         # If more than .75 are the same type, increment confidence by .1
         # Otherwise, decrement confidence by .1
-        neighbors = self.model.grid.get_neighbors(self.pos, moore=True, include_center=False, radius=self.model.radius)
-
         numSameType = 0
         for neighbor in neighbors:
             if neighbor.output == self.output:
@@ -242,18 +249,160 @@ class HumanAgent(mesa.Agent):
         self.numUntrustingHumanNeighbors = 0
         self.numSemiTrustingHumanNeighbors = 0
         for neighbor in neighbors:
-            if isinstance(neighbor, LLMAgent):
-                if neighbor.type == 'malicious':
-                    self.numMaliciousLLMNeighbors += 1
-                else:
-                    self.numBenignLLMNeighbors += 1
+            neighborType = neighbor.typeCode
+            if neighborType == MALICIOUS:
+                self.numMaliciousLLMNeighbors += 1
+            elif neighborType == BENIGN:
+                self.numBenignLLMNeighbors += 1
+            elif neighborType == TRUSTING:
+                self.numTrustingHumanNeighbors += 1
+            elif neighborType == UNTRUSTING:
+                self.numUntrustingHumanNeighbors += 1
             else:
-                if neighbor.type == 'trusting':
-                    self.numTrustingHumanNeighbors += 1
-                elif neighbor.type == 'untrusting':
-                    self.numUntrustingHumanNeighbors += 1
-                else:
-                    self.numSemiTrustingHumanNeighbors += 1
+                self.numSemiTrustingHumanNeighbors += 1
+
+        if profile is not None:
+            profile.add('confidence', time.perf_counter() - phaseStart)
+            profile.neighborLookups += 1
+
+        # Tell the model what the neighbors can see changed, for the dirty region scheduler
+        if not self.model.trackChanges:
+            return
+        if self.pos != oldPos:
+            self.model.changedCells.add(oldPos)
+            self.model.changedCells.add(self.pos)
+        elif self.output != oldOutput or self.confidence != oldConfidence:
+            self.model.changedCells.add(self.pos)
+        elif self.happy:
+            # Nothing changed, the agent rests until something around it does
+            return
+        # Unhappy agents keep looking for a place, and agents that changed may change again
+        self.model.restless.add(self)
+
+    def relocate(self, profile=None):
+        '''
+        Neighborhood LLM census and relocation, the first half of step in the sequential movement mode
+        '''
+        if profile is not None:
+            phaseStart = time.perf_counter()
+        neighborLookups = 1
+        emptyCellsExamined = 0
+
+        shouldMove = False
+        LLMInNeighorhood = False
+        # Get the neighbors of the agent, radius is the neighborhood to be considered
+        # Change radius to different values to see how it affects the model
+        neighbors = self.model.neighborhoods.neighbors(self.pos)
+        # If the agent is trusting, they will up their trust coefficient if they have a human or LLM neighbor
+        # LLMs never move, so their count comes from the proximity field
+        numLLMNeighbors = self.model.LLMField.count(self.pos)
+        numHumanNeighbors = len(neighbors) - numLLMNeighbors
+
+        # proportionLLMs=0.05,
+        # maliciousLLMs=0.5,
+        if (numLLMNeighbors + numHumanNeighbors != 0) and numLLMNeighbors / (numLLMNeighbors + numHumanNeighbors) > ((self.model.maliciousLLMs / 10) + self.model.proportionLLMs):
+            LLMInNeighorhood = True
+
+        if self.typeCode == TRUSTING:
+            if not LLMInNeighorhood:
+                shouldMove = True
+        elif self.typeCode == UNTRUSTING:
+            if LLMInNeighorhood:
+                shouldMove = True
+
+        if profile is not None:
+            now = time.perf_counter()
+            profile.add('census', now - phaseStart)
+            phaseStart = now
+        
+        moved = False
+        if shouldMove:
+            # Trusting Agents will move to a space around an LLM agent. If no spaces are available, they will move to a random space
+            # If the agent has moved more than 10 times and the last move was not random, move to a random empty space
+            # This simulates a human agent leaving the area
+            if self.totalNumMoves > 10 and not self.lastMoveWasRandom:
+                # Move to a random empty space
+                self.model.move_to_empty(self)
+                self.lastMoveWasRandom = True
+            
+            self.lastMoveWasRandom = False
+            if self.model.network is not None:
+                # On a network moving is following someone else instead, see rewire
+                moved, nodesExamined = rewire(self)
+                emptyCellsExamined += nodesExamined
+                if moved:
+                    self.model.totalNumMoves += 1
+                    self.totalNumMoves += 1
+            elif self.typeCode == TRUSTING:
+                # Move to a space around an LLM agent close to them
+                for i in range(1, self.model.InconvenienceThreshold):
+                    # Iterate through all empty spaces around the agent
+                    # If an LLM exists in the neighborhood of that empty space, move to that space
+                    # Otherwise, stay
+                    emptySpaces = self.model.emptyCells.within(self.pos, i)
+                    emptyCellsExamined += len(emptySpaces)
+                    for space in emptySpaces:
+                        if self.model.LLMField.count(space) > 0:
+                            self.model.move_agent(self, space)
+                            self.model.totalNumMoves += 1
+                            self.totalNumMoves += 1
+                            moved = True
+                            break
+                    if moved:
+                        break 
+            elif self.typeCode == UNTRUSTING:
+                # Move away from an LLM agent close to them
+                for i in range(1, self.model.InconvenienceThreshold):
+                    if moved:
+                        break
+                    # Iterate through all empty spaces around the agent
+                    # If a human exists in the neighborhood of that empty space, move to that space
+                    # Otherwise, stay
+                    emptySpaces = self.model.emptyCells.within(self.pos, i)
+                    emptyCellsExamined += len(emptySpaces)
+                    for space in emptySpaces:
+                        neighborLookups += 1
+                        if self.model.neighborhoods.num_neighbors(space) > self.model.LLMField.count(space):
+                            self.model.move_agent(self, space)
+                            self.model.totalNumMoves += 1
+                            self.totalNumMoves += 1
+                            moved = True
+                            break
+                    if moved:
+                        break
+
+        # Agents are happy where they are, or once they found a better place
+        # The model keeps a live count of happy humans
+        happy = moved or not shouldMove
+        if happy != self.happy:
+            self.happy = happy
+            self.model.happy += 1 if happy else -1
+
+        if profile is not None:
+            profile.add('relocation', time.perf_counter() - phaseStart)
+            profile.neighborLookups += neighborLookups
+            profile.emptyCellsExamined += emptyCellsExamined
+
+def rewire(agent):
+    '''
+    Relocation on a network: a trusting human unfollows one of the humans it follows for the
+    nearest LLM it doesn't follow yet, an untrusting human one of the LLMs for the nearest
+    human, searched breadth first up to InconvenienceThreshold follows away
+    Returns whether the agent found one, and the number of nodes it examined
+    '''
+    model = agent.model
+    network = model.network
+    wantLLM = agent.typeCode == TRUSTING
+    slots = np.flatnonzero(network.isLLM[network.neighbor_nodes(agent.pos)] != wantLLM)
+    if len(slots) == 0:
+        return False, 0
+    nodesExamined = 0
+    for node in network.within(agent.pos, model.InconvenienceThreshold):
+        nodesExamined += 1
+        if network.isLLM[node] == wantLLM:
+            network.follow(agent.pos, int(slots[model.relocationRandom.randrange(len(slots))]), node)
+            return True, nodesExamined
+    return False, nodesExamined
 
 def set_informed_or_not(self, neighbors):
         # Humans will be trusted to be output * confidence * .5 
@@ -265,13 +414,13 @@ def set_informed_or_not(self, neighbors):
         oldInformation = self.information
         self.information = 0
         # Pick three random neighbors
-        random.shuffle(neighbors)
+        self.model.influenceRandom.shuffle(neighbors)
         influencers = []
         i = 0
         for neighbor in neighbors:   
             if i > 3:
                 break
-            if isinstance(neighbor, LLMAgent):
+            if neighbor.typeCode >= BENIGN:
                 self.information += neighbor.output * (neighbor.confidence + self.LLMtrustCoefficient)
             else:
                 self.information += neighbor.output * (neighbor.confidence + self.HumanTrustCoefficient)
@@ -282,25 +431,47 @@ def set_informed_or_not(self, neighbors):
         if (self.information > 0 and oldInformation < 0) or (self.information < 0 and oldInformation > 0):
             self.justFlipped = True
             self.flipCount += 1
+            self.model.totalFlips += 1
             # Loop through the influencers and increment their numNeigborsFlipped count
             for influencer in influencers:
-                if isinstance(influencer, LLMAgent):
+                if influencer.typeCode >= BENIGN:
                     influencer.flipped += 1
 
-                    self.LLMThatFlipped = influencer.type
-                    self.flipHistory.append({'LLMThatFlipped:': self.LLMThatFlipped, 'flipCount:': self.flipCount}) 
+                    self.LLMThatFlippedCode = influencer.typeCode
+                    self.rootLLMId = influencer.unique_id
+                    self.cascadeDepth = 1
+                    record_LLM_flip(self, influencer)
                 else: # Human Influencer
                     influencer.numNeigborsFlipped += 1
 
-                    if influencer.LLMThatFlipped != None:
-                        self.LLMThatFlipped = influencer.LLMThatFlipped
-                        self.flipHistory.append({'LLMThatFlipped:': influencer.LLMThatFlipped, 'flipCount:': self.flipCount}) 
+                    if influencer.LLMThatFlippedCode != EMPTY:
+                        self.LLMThatFlippedCode = influencer.LLMThatFlippedCode
+                        self.rootLLMId = influencer.rootLLMId
+                        self.cascadeDepth = influencer.cascadeDepth + 1
+                        record_LLM_flip(self, influencer)
+
+def record_LLM_flip(agent, influencer):
+    '''
+    Record a flip of agent by influencer that traces back to an LLM, as an edge of its cascade
+    '''
+    model = agent.model
+    LLMType = agent.LLMThatFlippedCode
+    model.flipLog.append(
+        agent.unique_id, model.iterations, LLMType, influencer.unique_id, agent.rootLLMId, agent.cascadeDepth,
+        agent.flipCount,
+    )
+    if LLMType == MALICIOUS:
+        model.maliciousLLMFlips += 1
+    else:
+        model.benignLLMFlips += 1
 
-class LLMAgent(mesa.Agent):
+class LLMAgent(Agent):
     """
     Class Representing an LLM Agent in a society
     """
 
+    __slots__ = ('typeCode', 'flipped', 'confidence', 'output')
+
     def __init__(self, unique_id, model, agent_type):
         """
         Create a new LLM agent.
@@ -308,23 +479,88 @@ class LLMAgent(mesa.Agent):
         Args:
            unique_id: Unique identifier for the agent.
            x, y: Agent initial location.
-           agent_type: Indicator for the agent's type, whether it is a malicious or benign LLM agent
+           agent_type: Indicator for the agent's type, whether it is a malicious or benign LLM agent, a name or a type code
         """
         super().__init__(unique_id, model)
-        self.type = agent_type
+        self.typeCode = TYPE_CODES.get(agent_type, agent_type)
         self.flipped = 0
         self.confidence = 1
         # Metrics
 
-        if self.type == 'benign':
+        if self.typeCode == BENIGN:
             self.output = 1
-        elif self.type == 'malicious':
+        elif self.typeCode == MALICIOUS:
             self.output = -1
 
+    @property
+    def type(self):
+        return TYPE_NAMES[self.typeCode]
+
     def step(self):
         pass
 
-class Simulation(mesa.Model):
+class DirtyRegionActivation(RandomActivation):
+    """
+    Activation that only steps the humans with something to react to, in random order
+
+    A human is activated when a cell in its neighborhood changed occupancy, output or
+    confidence during the previous step, or when it is restless: unhappy, or changed
+    itself during its last step. Everyone else is at rest and keeps its state. LLMs are
+    never activated, their step does nothing.
+
+    This is an approximation of RandomActivation: an agent at rest does not redraw the
+    neighbors it listens to, so it can't be flipped by the luck of the draw alone.
+    """
+
+    def __init__(self, model, agents=None):
+        super().__init__(model, agents)
+        # unique_id -> number of steps the agent is up to date with
+        self.lastActive = {}
+
+    def step(self):
+        model = self.model
+        changedCells = model.changedCells
+        active = model.restless
+        model.changedCells = set()
+        model.restless = set()
+
+        neighborhoods = model.neighborhoods
+        for pos in changedCells:
+            agent = neighborhoods.occupant(pos)
+            if agent is not None:
+                active.add(agent)
+            active.update(neighborhoods.neighbors(pos))
+
+        active = sorted(
+            (agent for agent in active if agent.typeCode < BENIGN and agent.pos is not None),
+            key=lambda agent: agent.unique_id,
+        )
+        model.random.shuffle(active)
+        for agent in active:
+            self.catch_up(agent)
+            agent.step()
+            self.lastActive[agent.unique_id] = self.steps + 1
+        self.steps += 1
+        self.time += 1
+
+    def catch_up(self, agent):
+        '''
+        Count the steps the agent rested through in its stepsSinceFlip
+        '''
+        skipped = self.steps - self.lastActive.get(agent.unique_id, self.steps)
+        if skipped > 0 and not agent.justFlipped:
+            agent.stepsSinceFlip += skipped
+        self.lastActive[agent.unique_id] = self.steps
+
+    def settle(self):
+        '''
+        Bring stepsSinceFlip of every resting human up to date, the model does after its last step
+        '''
+        for agent in self.agents:
+            if agent.typeCode < BENIGN:
+                self.catch_up(agent)
+
+class Simulation(Model):
     """
     Simulation Model for a community with Human Agents and LLM Agents
     """
@@ -343,6 +579,26 @@ class Simulation(mesa.Model):
         density=0.8,
         maxIterations=100,
         seed=None,
+        outputDir=".",
+        flipHistoryLimit=None,
+        flipHistoryRing=False,
+        activation='random',
+        convergenceWindow=None,
+        convergenceTolerance=0.01,
+        convergencePatience=5,
+        instrument=False,
+        stepMetrics=False,
+        space='dense',
+        trajectory=None,
+        trajectoryStride=1,
+        trajectoryAgents=None,
+        movement='sequential',
+        construction='sequential',
+        network='small-world',
+        networkNodes=None,
+        networkDegree=6,
+        networkRewiring=0.1,
+        networkDirected=False,
     ):
         """
         Create a new Simulation model.
@@ -359,10 +615,57 @@ class Simulation(mesa.Model):
             radius: How far the agent will obtain information from
             inconvenienceThreshold: The higher the threshold, the farther the agent will look to move
             density: Density of the community
-            seed: Seed for random number generation
+            seed: Seed for random number generation, every random draw of the run derives from it.
+                  A seed is drawn when it is None, and kept in self.seed so the run can be replayed
+            outputDir: Directory the CSV files are written to
+            flipHistoryLimit: Maximum number of flip history entries kept, None for no limit
+            flipHistoryRing: Keep the latest entries once the limit is reached, instead of the first ones
+            activation: 'random' steps every agent each step, 'dirty' only the humans whose
+                        neighborhood changed or who are restless (see DirtyRegionActivation)
+            convergenceWindow: Stop the run once it reaches a steady state, judged over windows of
+                               this many steps (see ConvergenceMonitor). None runs to maxIterations
+            convergenceTolerance, convergencePatience: See ConvergenceMonitor
+            instrument: Time every phase of HumanAgent.step and count neighbor lookups and empty
+                        cells examined, in self.profile and in the DataCollector (see PhaseProfile)
+            stepMetrics: Also collect the flips and moves of every step, as flipsPerStep and movesPerStep
+            space: 'dense' for a SingleGrid, 'sparse' for a SparseGrid that only stores the occupied
+                   cells. A sparse world has exactly density x cells agents on randomly drawn cells,
+                   instead of drawing every cell, so large worlds at low density build in
+                   time and memory proportional to the population. 'network' for a social network
+                   with one agent on every node, where the neighborhood of a human is the nodes it
+                   follows and radius is unused (see NetworkSpace). Humans relocate by rewiring
+                   their follows, see rewire. A network needs random activation
+            trajectory: Record the position, output, confidence and information of the agents
+                        every step to this memory-mapped .npy file (see TrajectoryRecorder)
+            trajectoryStride: Record every trajectoryStride-th step
+            trajectoryAgents: unique_ids of the agents to record, None for every agent
+            movement: 'sequential' moves every human within its own step, 'batched' moves all of
+                      them at the start of the step, from intents judged on the same grid
+                      (see BatchedMovement). Batched movement needs a dense space and random activation
+            construction: 'sequential' draws the world cell by cell, 'bulk' draws it in vectorized
+                          batches and builds it in one pass (see populate_bulk), which is much faster
+                          for large worlds. Both draw from the seed, but not the same world
+            network: The network of the 'network' space, 'small-world' (Watts-Strogatz),
+                     'scale-free' (Barabasi-Albert) or the path of an edge list file (see read_edge_list)
+            networkNodes: Number of nodes of a generated network, density x width x height when None
+            networkDegree: Average number of neighbors of a node in a generated network
+            networkRewiring: Probability that a link of the small-world network is rewired at random
+            networkDirected: Read the lines of an edge list file as "source follows target" instead
+                             of as mutual links
         """
+        # The arguments the model was built with, checkpoint.py rebuilds the model from them
+        params = {name: value for name, value in locals().items() if name not in ('self', '__class__')}
 
+        if seed is None:
+            seed = random.SystemRandom().randrange(2 ** 32)
         super().__init__(seed=seed)
+        self.seed = seed
+        self.params = dict(params, seed=seed)
+        # The scheduler draws from self.random, every other phase has its own stream
+        self.random.seed(seed)
+        self.populationRandom = random_stream(seed, "population")
+        self.relocationRandom = random_stream(seed, "relocation")
+        self.influenceRandom = random_stream(seed, "influence")
         self.height = height
         self.width = width
 
@@ -391,34 +694,119 @@ class Simulation(mesa.Model):
         self.numLLMs = 0
         self.numAgents = 0
         self.totalMisinformedHumans = 0
+        self.maliciousLLMFlips = 0
+        self.benignLLMFlips = 0
+        self.totalFlips = 0
+        self.flipLog = FlipLog(flipHistoryLimit, flipHistoryRing)
         self.resistance = resistance
-
-        self.schedule = mesa.time.RandomActivation(self)
-        self.grid = mesa.space.SingleGrid(width, height, torus=True)
+        self.outputDir = outputDir
+
+        if activation not in ('random', 'dirty'):
+            raise ValueError("Unknown activation: " + str(activation))
+        if construction not in ('sequential', 'bulk'):
+            raise ValueError("Unknown construction: " + str(construction))
+        # Cells whose occupant changed in a way its neighbors can see, and humans that
+        # need to step again, reported by the humans as they step. Only the dirty region
+        # scheduler reads them, so they are only kept for it
+        self.trackChanges = activation == 'dirty'
+        self.changedCells = set()
+        self.restless = set()
+        if space == 'dense':
+            self.grid = SingleGrid(width, height, torus=True)
+            self.emptyCells = EmptyCellIndex(width, height)
+        elif space == 'sparse':
+            self.grid = SparseGrid(width, height)
+            self.emptyCells = SparseEmptyCellIndex(width, height)
+        elif space == 'network':
+            if activation != 'random':
+                raise ValueError("A network space needs random activation")
+            if networkNodes is None:
+                networkNodes = round(density * width * height)
+            rng = np.random.default_rng(random_stream(seed, "network").getrandbits(64))
+            self.grid = build_network(network, networkNodes, networkDegree, networkRewiring, networkDirected, rng)
+            # Every node has an agent, nothing is ever empty
+            self.emptyCells = None
+        else:
+            raise ValueError("Unknown space: " + str(space))
+        self.network = self.grid if space == 'network' else None
+        if movement not in ('sequential', 'batched'):
+            raise ValueError("Unknown movement: " + str(movement))
+        if movement == 'batched' and (space != 'dense' or activation != 'random'):
+            raise ValueError("Batched movement needs a dense space and random activation")
+        # A network is its own neighborhood index
+        self.neighborhoods = self.grid if space == 'network' else NeighborhoodIndex(self.grid, radius)
 
         self.happy = 0
-        self.datacollector = mesa.DataCollector(
-            model_reporters = {
-                                "maliciousLLMs": "totalMaliciousLLMs",
-                                "benignLLMs": "totalBenignLLMs",
-                                "trustingHumans": "totalTrustingHumans",
-                                "untrustingHumans": "totalUntrustingHumans",
-                                "semiTrustingHumans": "totalSemiTrustingHumans",
-                                "totalMisinformedHumans": "totalMisinformedHumans",
-                                "numAgents": "numAgents",
-                            },  
-        )
+        model_reporters = dict(MODEL_REPORTERS)
+        self.profile = None
+        if instrument:
+            self.profile = PhaseProfile()
+            model_reporters.update(profile_reporters())
+        if stepMetrics:
+            model_reporters.update(step_reporters())
+        # One collect before the first step and one after every step
+        self.datacollector = ColumnCollector(model_reporters, (maxIterations or 0) + 1)
 
         # Set up agents
-        # We use a grid iterator that returns the coordinates of a cell as well as its contents. (coord_iter)
-        for _, pos in self.grid.coord_iter():
-            # Create a new agent
-            # Generate a random value
-            val = self.random.random()
+        with collection_paused(construction == 'bulk'):
+            if construction == 'bulk':
+                agents = self.populate_bulk(space)
+            else:
+                agents = self.populate(space)
+            if activation == 'random':
+                self.schedule = RandomActivation(self, agents)
+            else:
+                self.schedule = DirtyRegionActivation(self, agents)
+
+            # Number of LLMs within radius of every cell, used by the humans to pick where to move
+            LLMs = [agent for agent in agents if isinstance(agent, LLMAgent)]
+            if space == 'network':
+                # The network counts the LLMs every node follows, and keeps the counts as it's rewired
+                self.grid.link_agents(LLMs)
+                self.LLMField = self.grid
+            else:
+                LLMField = SparseLLMProximityField if space == 'sparse' else LLMProximityField
+                self.LLMField = LLMField(self.neighborhoods, LLMs)
+        self.batchedMovement = None
+        if movement == 'batched':
+            from movement import BatchedMovement
+            self.batchedMovement = BatchedMovement(self)
+
+        self.datacollector.collect(self)
+
+        self.trajectory = None
+        if trajectory is not None:
+            self.record_trajectory(trajectory, trajectoryStride, trajectoryAgents)
+
+        self.convergence = None
+        self.convergenceStep = None
+        if convergenceWindow is not None:
+            self.convergence = ConvergenceMonitor(
+                self.numHumans, convergenceWindow, convergenceTolerance, convergencePatience
+            )
+
+    def record_trajectory(self, path, stride=1, agentIds=None):
+        '''
+        Start recording the trajectories of the agents from the current step to maxIterations
+        '''
+        agents = self.schedule.agents
+        if agentIds is not None:
+            wanted = set(agentIds)
+            agents = [agent for agent in agents if agent.unique_id in wanted]
+        self.trajectory = TrajectoryRecorder(path, agents, self.iterations, self.maxIterations, stride)
+        self.trajectory.record(self.iterations)
+
+    def populate(self, space):
+        '''
+        Draw an agent for every cell of population_draws and place it, one cell at a time
+        Returns the agents in the order they were created
+        '''
+        agents = []
+        for pos, val in self.population_draws(space):
             # Population size checker
             if val < self.density:
                 if val < self.proportionLLMs:
-                    agentType = generate_LLM_agent_type(self.maliciousLLMs)
+                    agentType = generate_LLM_agent_type(self.maliciousLLMs, self.populationRandom)
                     self.numLLMs += 1
                     self.numAgents += 1
                     if agentType == 'malicious':
@@ -428,7 +816,7 @@ class Simulation(mesa.Model):
 
                     agent = LLMAgent(self.next_id(), self, agentType)
                 else: 
-                    agentType = generate_human_agent_type(self.informationingHumans, self.untrustingHumans)
+                    agentType = generate_human_agent_type(self.informationingHumans, self.untrustingHumans, self.populationRandom)
                     self.numHumans += 1
                     self.numAgents += 1
                     if agentType == 'trusting':
@@ -438,11 +826,142 @@ class Simulation(mesa.Model):
                     else:
                         self.totalSemiTrustingHumans += 1
                     agent = HumanAgent(self.next_id(), self, agentType)
+                    # Humans start out happy, and all of them step at least once
+                    self.happy += 1
+                    if self.trackChanges:
+                        self.restless.add(agent)
+                    if agent.misinformed:
+                        self.totalMisinformedHumans += 1
 
                 self.grid.place_agent(agent, pos)
-                self.schedule.add(agent)
+                if self.emptyCells is not None:
+                    self.emptyCells.remove(pos)
+                agents.append(agent)
+        return agents
+
+    def populate_bulk(self, space):
+        '''
+        Draw the same distribution of agents as populate, but every draw of a kind at once from a
+        NumPy generator seeded from populationRandom, then create and place the agents in one pass
+        Returns the agents in the order they were created
+        '''
+        rng = np.random.default_rng(self.populationRandom.getrandbits(64))
+        numCells = self.width * self.height
+        if space == 'dense':
+            # Every cell gets a value, and an agent when it's below the density
+            val = rng.random(numCells)
+            cells = np.flatnonzero(val < self.density)
+            val = val[cells]
+        elif space == 'network':
+            cells = np.arange(self.grid.numNodes)
+            val = rng.random(len(cells)) * self.density
+        else:
+            cells = distinct_cells(rng, numCells, round(self.density * numCells))
+            val = rng.random(len(cells)) * self.density
+        count = len(cells)
+
+        # generate_LLM_agent_type and generate_human_agent_type
+        isLLM = val < self.proportionLLMs
+        malicious = (rng.random(count) < self.maliciousLLMs) & (self.maliciousLLMs != 0)
+        curr = rng.random(count)
+        humanCodes = np.where(
+            curr < self.informationingHumans, TRUSTING,
+            np.where(curr < self.informationingHumans + self.untrustingHumans, UNTRUSTING, SEMI_TRUSTING),
+        )
+        codes = np.where(isLLM, np.where(malicious, MALICIOUS, BENIGN), humanCodes)
 
-        self.datacollector.collect(self)
+        # HumanAgent.__init__: around 10% start out misinformed, and the trust in LLMs depends on the type
+        misinformed = rng.random(count) < 0.1
+        low = np.select([codes == TRUSTING, codes == SEMI_TRUSTING], [0.67, 0.34], 0.01)
+        high = np.select([codes == TRUSTING, codes == SEMI_TRUSTING], [1, 0.66], 0.33)
+        trust = low + (high - low) * rng.random(count)
+
+        if space == 'network':
+            positions = cells.tolist()
+        else:
+            xs, ys = np.divmod(cells, self.height)
+            positions = list(zip(xs.tolist(), ys.tolist()))
+        agents = []
+        humans = []
+        for unique_id, code, agentMisinformed, agentTrust in zip(
+            range(self.current_id + 1, self.current_id + count + 1), codes.tolist(), misinformed.tolist(), trust.tolist(),
+        ):
+            if code >= BENIGN:
+                agent = LLMAgent(unique_id, self, code)
+            else:
+                agent = HumanAgent(unique_id, self, code, agentMisinformed, agentTrust)
+                humans.append(agent)
+            agents.append(agent)
+        self.current_id += count
+        if space == 'network':
+            self.grid.place_agents(agents, positions)
+        else:
+            place_agents(self.grid, agents, positions)
+            self.emptyCells.reset(positions)
+
+        counts = np.bincount(codes, minlength=MALICIOUS + 1)
+        self.totalMaliciousLLMs = int(counts[MALICIOUS])
+        self.totalBenignLLMs = int(counts[BENIGN])
+        self.totalTrustingHumans = int(counts[TRUSTING])
+        self.totalUntrustingHumans = int(counts[UNTRUSTING])
+        self.totalSemiTrustingHumans = int(counts[SEMI_TRUSTING])
+        self.numLLMs = self.totalMaliciousLLMs + self.totalBenignLLMs
+        self.numHumans = len(humans)
+        self.numAgents = count
+        self.totalMisinformedHumans = int(np.count_nonzero(misinformed & ~isLLM))
+        # Humans start out happy, and all of them step at least once
+        self.happy = len(humans)
+        if self.trackChanges:
+            self.restless.update(humans)
+        return agents
+
+    def population_draws(self, space):
+        '''
+        The cells that may get an agent, in grid order, each with the random value that decides
+        whether it gets one and of which kind
+        '''
+        if space == 'dense':
+            # We use a grid iterator that returns the coordinates of a cell as well as its contents. (coord_iter)
+            for _, pos in self.grid.coord_iter():
+                # Generate a random value
+                yield pos, self.populationRandom.random()
+            return
+        if space == 'network':
+            # Every node gets an agent, the value below the density only decides of which kind
+            for node in range(self.grid.numNodes):
+                yield node, self.populationRandom.random() * self.density
+            return
+
+        # Sparse worlds draw the occupied cells directly, and a value below the density for each
+        numCells = self.width * self.height
+        numAgents = round(self.density * numCells)
+        cells = set()
+        while len(cells) < numAgents:
+            cells.add(self.populationRandom.randrange(numCells))
+        for cell in sorted(cells):
+            yield divmod(cell, self.height), self.populationRandom.random() * self.density
+
+    def move_agent(self, agent, pos):
+        '''
+        Move an agent on the grid, keeping the neighborhood cache and empty cell index up to date
+        '''
+        self.neighborhoods.invalidate(agent.pos)
+        self.emptyCells.add(agent.pos)
+        self.grid.move_agent(agent, pos)
+        self.emptyCells.remove(pos)
+        self.neighborhoods.invalidate(pos)
+
+    def move_to_empty(self, agent):
+        '''
+        Move an agent to a uniformly random empty cell, on a full grid the agent stays
+        On a network the agent follows random nodes instead
+        '''
+        if self.network is not None:
+            self.network.follow_randomly(agent.pos, self.relocationRandom)
+            return
+        if len(self.emptyCells) == 0:
+            return
+        self.move_agent(agent, self.emptyCells.sample(self.relocationRandom))
 
     def step(self):
         """
@@ -451,58 +970,106 @@ class Simulation(mesa.Model):
         if self.iterations == 0:
             output_data_to_file1(self)
 
-        self.totalMisinformedHumans = 0
-
         self.iterations += 1
 
+        if self.batchedMovement is not None:
+            self.batchedMovement.step()
+        # The humans keep totalMisinformedHumans, happy and the flip counts up to date as they step
         self.schedule.step()
 
-        # Get the number of agents
-        
-
-        # Iterate over all agents and calculate the number of happy agents
-
-        for agent in self.schedule.agents:
-            if isinstance(agent, HumanAgent):
-                if agent.misinformed == True:
-                    self.totalMisinformedHumans += 1
-
         self.datacollector.collect(self)
+        if check_convergence(self):
+            self.convergenceStep = self.iterations
         #if self.happy == self.schedule.get_agent_count():
-        if self.iterations == self.maxIterations or self.happy == self.numHumans:
+        finished = self.iterations == self.maxIterations or self.happy == self.numHumans or self.convergenceStep is not None
+        if finished and isinstance(self.schedule, DirtyRegionActivation):
+            # The humans at rest still count the steps since their last flip in the final state
+            self.schedule.settle()
+        if self.trajectory is not None:
+            self.trajectory.record(self.iterations)
+        if finished:
+            output_data_to_file1(self)
             output_data_to_file2(self)
             output_data_to_file3(self)
             self.running = False
+            if self.trajectory is not None:
+                self.trajectory.close()
+
+@contextlib.contextmanager
+def collection_paused(pause=True):
+    '''
+    Turn the cyclic garbage collector off for a block that builds objects which all stay alive,
+    its passes over the growing heap would only cost time
+    '''
+    collecting = pause and gc.isenabled()
+    if collecting:
+        gc.disable()
+    try:
+        yield
+    finally:
+        if collecting:
+            gc.enable()
+
+def distinct_cells(rng, numCells, count):
+    '''
+    count distinct cells drawn uniformly from range(numCells), sorted
+    Drawn by rejection, in time and memory proportional to count instead of numCells:
+    every round draws enough cells that about the missing number of them are new
+    '''
+    cells = np.zeros(0, dtype=np.int64)
+    while len(cells) < count:
+        missing = count - len(cells)
+        draws = rng.integers(0, numCells, size=missing * numCells // (numCells - len(cells)) + 1)
+        new = np.setdiff1d(draws, cells)
+        if len(new) > missing:
+            new = rng.choice(new, size=missing, replace=False)
+        cells = np.union1d(cells, new)
+    return cells
+
+def check_convergence(model):
+    '''
+    Feed the latest step to the model's convergence monitor, and tell whether the run just converged
+    '''
+    if model.convergence is None:
+        return False
+    return model.convergence.update(model.totalMisinformedHumans, model.totalFlips, model.totalNumMoves)
 
 def output_data_to_file1(model):
     '''
     Output the data to the CSV file
     '''
-    f1 = open("model.csv", "w")
+    f1 = open(os.path.join(model.outputDir, "model.csv"), "w")
 
-    f1.write("Iterations, numAgents, numTrustingHumans, numUntrustingHumans, numSemiTrustingHumans, numBenignLLMs, numMalicious, radius, inconvenienceThreshold, resistance\n")
+    f1.write("Iterations, numAgents, numTrustingHumans, numUntrustingHumans, numSemiTrustingHumans, numBenignLLMs, numMalicious, radius, inconvenienceThreshold, resistance, convergenceStep\n")
     f1.write(str(model.maxIterations) + "," + str(model.numAgents) + "," 
              + str(model.totalTrustingHumans) + "," + str(model.totalUntrustingHumans) + "," 
              + str(model.totalSemiTrustingHumans) + "," + str(model.totalBenignLLMs) + "," 
              + str(model.totalMaliciousLLMs) + "," + str(model.radius) + "," 
-             + str(model.InconvenienceThreshold) + "," + str(model.resistance) + "\n")
+             + str(model.InconvenienceThreshold) + "," + str(model.resistance) + ","
+             + str(model.convergenceStep) + "\n")
+    f1.close()
 
 # f2.write("Type of LLM, Flipped\n")
 def output_data_to_file2(model):
     '''
     Output the data to the CSV file
     '''
-    f2 = open("LLM.csv", "w")
-    f2.write("Type of LLM, Flipped\n")
+    f2 = open(os.path.join(model.outputDir, "LLM.csv"), "w")
+    f2.write(LLM_CSV_HEADER)
+    # Reach, depth and time to flip of every LLM's cascades, from the flip log
+    stats = CascadeGraph(model.flipLog).LLM_stats()
     for agent in model.schedule.agents:
         if isinstance(agent, LLMAgent):
-            f2.write(str(agent.type) + "," + str(agent.flipped) + "\n")
+            cascade = stats.get(agent.unique_id, NO_CASCADE)
+            f2.write(str(agent.unique_id) + "," + str(agent.type) + "," + str(agent.flipped) + ","
+                     + ",".join(str(cascade[name]) for name in CASCADE_COLUMNS) + "\n")
+    f2.close()
 
 def output_data_to_file3(model):
     '''
     Output the data to the CSV file
     '''
-    f3 = open("Human.csv", "w")
+    f3 = open(os.path.join(model.outputDir, "Human.csv"), "w")
     # self.confidence
     # self.LLMThatFlipped
     # self.misinformed
@@ -518,16 +1085,24 @@ def output_data_to_file3(model):
             f3.write(str(agent.type) + "," + str(agent.confidence) + "," + str(agent.LLMThatFlipped) + "," 
                      + str(agent.misinformed) + "," + str(agent.flipCount) + "," + str(agent.numNeigborsFlipped) + "," 
                      + str(agent.totalNumMoves) + "," + str(agent.lastMoveWasRandom) + "," + str(agent.LLMtrustCoefficient) + "\n")
-            
+    f3.close()
+
+
+def random_stream(seed, phase):
+    '''
+    Random number generator for one phase of a run, derived from the run's seed
+    '''
+    return random.Random("%s/%s" % (seed, phase))
 
-def generate_LLM_agent_type(malicious):
+def generate_LLM_agent_type(malicious, rng=random):
     '''
     Generate the LLM agent type based on the environment
     Args:
         malicious: Percentage of malicious LLM agents in the community
+        rng: Random number generator to draw from
     All other LLMs are benign
     '''
-    curr = random.random()
+    curr = rng.random()
     
     if malicious == 0:
         return 'benign'
@@ -536,18 +1111,37 @@ def generate_LLM_agent_type(malicious):
     else:
         return 'benign'
 
-def generate_human_agent_type(trusting, untrusting):
+def generate_human_agent_type(trusting, untrusting, rng=random):
     '''
     Generate the human agent type based on the society
     Args:
         trusting: Percentage of trusting humans in the community
         untrusting: Percentage of untrusting humans in the community
+        rng: Random number generator to draw from
     '''
-    curr = random.random()
+    curr = rng.random()
     
     if curr < trusting:
         return 'trusting'
     elif curr < trusting + untrusting:
         return 'untrusting'
     else:
-        return 'semi-trusting'
\ No newline at end of file
+        return 'semi-trusting'
+
+def build_simulation(engine='agents', **params):
+    '''
+    Build a simulation using the requested engine
+    Args:
+        engine: 'agents' for the Mesa agent model, 'array' for the NumPy array engine, 'tiled'
+                for the array engine stepped in parallel processes (it also takes tiles=)
+        params: Simulation parameters, the same for every engine
+    '''
+    if engine == 'agents':
+        return Simulation(**params)
+    elif engine == 'array':
+        from array_model import ArraySimulation
+        return ArraySimulation(**params)
+    elif engine == 'tiled':
+        from tiled_model import TiledSimulation
+        return TiledSimulation(**params)
+    raise ValueError("Unknown engine: " + str(engine))
@@ -0,0 +1,155 @@
+# Made by Kiwi!
+
+import time
+
+import numpy as np
+
+from array_model import CHUNK_CELLS, window_sum
+from model import BENIGN, TRUSTING, UNTRUSTING
+from space import moore_offsets
+
+
+def search_order(radius, width, height):
+    '''
+    Offsets within radius on a width x height torus, in the order HumanAgent.relocate tries
+    them: nearest ring first, and within a ring in the order of EmptyCellIndex.within
+    '''
+    ranked = []
+    for dx, dy in moore_offsets(radius, width, height):
+        dx, dy = dx % width, dy % height
+        # The smallest radius of within() that reaches the cell, and its place in that scan
+        ring = max(min(dx, width - dx), min(dy, height - dy))
+        ranked.append(((ring, (dx + ring) % width, (dy + ring) % height), (dx, dy)))
+    ranked.sort()
+    return np.array([offset for _, offset in ranked], dtype=np.int64).reshape(-1, 2)
+
+
+class BatchedMovement:
+    """
+    Relocation of all the humans at once, at the start of every step of Simulation(movement='batched')
+
+    In the sequential mode every human runs the census and moves within its own
+    HumanAgent.step, so the humans later in the activation order see a grid the earlier
+    ones already changed. Here the relocation runs in two phases before the schedule steps
+    the humans, who then only listen to their neighbors and update their confidence:
+
+    1. Intents: the census of every human and the cells every trusting or untrusting human
+       would move to are judged in bulk, on the grid as it is at the start of the step.
+       Every unhappy human ranks the suitable empty cells within InconvenienceThreshold - 1
+       in the order its sequential search tries them, so a human no one competes with gets
+       the cell the sequential mode would give it on the same grid.
+    2. Resolution: one pass over the unhappy humans in a random priority order drawn from
+       relocationRandom, every one gets the first cell of its ranking that no human before
+       it got. A human whose every cell was taken stays where it is, unhappy.
+
+    So unlike the sequential mode, a move doesn't change who else is unhappy or which cells
+    suit them, and a cell vacated during the step only becomes a destination the next step.
+    The humans that moved more than 10 times leave for a random empty cell, in priority
+    order, before the destinations are judged. Runs are reproducible from the seed, but
+    don't match the sequential mode's.
+    """
+
+    def __init__(self, model):
+        """
+        Set up the batched movement of a dense Simulation, once its agents are on the grid.
+
+        Args:
+            model: The Simulation
+        """
+        self.model = model
+        width, height = model.width, model.height
+        # In unique_id order, the scheduler's own order is shuffled every step
+        self.humans = sorted(
+            (agent for agent in model.schedule.agents if agent.typeCode < BENIGN), key=lambda agent: agent.unique_id,
+        )
+        self.codes = np.array([agent.typeCode for agent in self.humans], dtype=np.int8)
+        # LLMs never move, their cells and counts are set once
+        self.LLMs = np.zeros((width, height), dtype=bool)
+        for agent in model.schedule.agents:
+            if agent.typeCode >= BENIGN:
+                self.LLMs[agent.pos] = True
+        self.LLMsInRadius = window_sum(self.LLMs, model.radius)
+        self.offsets = search_order(model.InconvenienceThreshold - 1, width, height)
+
+    def step(self):
+        '''
+        Move the humans for this step, and update who is happy
+        '''
+        model = self.model
+        profile = model.profile
+        if profile is not None:
+            phaseStart = time.perf_counter()
+        height = model.height
+        humans = self.humans
+
+        positions = np.array([agent.pos for agent in humans], dtype=np.int64).reshape(-1, 2)
+        occupied = self.LLMs.copy()
+        occupied[positions[:, 0], positions[:, 1]] = True
+        numNeighbors = window_sum(occupied, model.radius)[positions[:, 0], positions[:, 1]]
+        numLLMNeighbors = self.LLMsInRadius[positions[:, 0], positions[:, 1]]
+        threshold = (model.maliciousLLMs / 10) + model.proportionLLMs
+        with np.errstate(divide='ignore', invalid='ignore'):
+            LLMInNeighorhood = (numNeighbors > 0) & (numLLMNeighbors / np.maximum(numNeighbors, 1) > threshold)
+        shouldMove = ((self.codes == TRUSTING) & ~LLMInNeighorhood) | ((self.codes == UNTRUSTING) & LLMInNeighorhood)
+
+        order = np.flatnonzero(shouldMove).tolist()
+        model.relocationRandom.shuffle(order)
+        order = np.array(order, dtype=np.int64)
+
+        if profile is not None:
+            now = time.perf_counter()
+            profile.add('census', now - phaseStart)
+            phaseStart = now
+
+        # Agents that moved a lot leave the area for a random empty space
+        for index in order.tolist():
+            agent = humans[index]
+            if agent.totalNumMoves > 10 and not agent.lastMoveWasRandom:
+                oldPos = agent.pos
+                model.move_to_empty(agent)
+                occupied[oldPos] = False
+                occupied[agent.pos] = True
+                positions[index] = agent.pos
+            # A random move doesn't end the search, as in HumanAgent.relocate
+            agent.lastMoveWasRandom = False
+
+        moved = np.zeros(len(humans), dtype=bool)
+        if len(order) and len(self.offsets):
+            empty = ~occupied
+            targets = {
+                TRUSTING: (empty & (self.LLMsInRadius > 0)).reshape(-1),
+                UNTRUSTING: (empty & (window_sum(occupied & ~self.LLMs, model.radius) > 0)).reshape(-1),
+            }
+            taken = set()
+            chunk = max(1, CHUNK_CELLS // len(self.offsets))
+            for start in range(0, len(order), chunk):
+                movers = order[start:start + chunk]
+                xs, ys = positions[movers, 0], positions[movers, 1]
+                cells = (
+                    ((xs[:, None] + self.offsets[None, :, 0]) % model.width) * height
+                    + (ys[:, None] + self.offsets[None, :, 1]) % height
+                )
+                suitable = np.where(
+                    (self.codes[movers] == TRUSTING)[:, None], targets[TRUSTING][cells], targets[UNTRUSTING][cells],
+                )
+                if profile is not None:
+                    profile.emptyCellsExamined += int(np.count_nonzero(empty.reshape(-1)[cells]))
+                for index, ranking in zip(movers.tolist(), (row[keep] for row, keep in zip(cells, suitable))):
+                    for cell in ranking.tolist():
+                        if cell not in taken:
+                            taken.add(cell)
+                            agent = humans[index]
+                            model.move_agent(agent, divmod(cell, height))
+                            model.totalNumMoves += 1
+                            agent.totalNumMoves += 1
+                            moved[index] = True
+                            break
+
+        # Agents are happy where they are, or once they found a better place
+        for agent, happy in zip(humans, (moved | ~shouldMove).tolist()):
+            if happy != agent.happy:
+                agent.happy = happy
+                model.happy += 1 if happy else -1
+
+        if profile is not None:
+            profile.add('relocation', time.perf_counter() - phaseStart)
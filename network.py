@@ -0,0 +1,220 @@
+# Made by Kiwi!
+
+import numpy as np
+
+# Generated graphs Simulation(space='network', network=...) can build, any other value is an edge list file
+NETWORKS = ('small-world', 'scale-free')
+
+
+def csr_from_edges(sources, targets, nodes, directed=False):
+    '''
+    Compressed sparse row adjacency of the edges sources[i] -> targets[i] on nodes 0..nodes-1
+    Self loops and repeated edges are dropped, and an undirected edge is stored both ways
+    Returns indptr and indices, the neighbors of node i are indices[indptr[i]:indptr[i + 1]]
+    '''
+    sources = np.asarray(sources, dtype=np.int64)
+    targets = np.asarray(targets, dtype=np.int64)
+    if not directed:
+        sources, targets = np.concatenate([sources, targets]), np.concatenate([targets, sources])
+    keep = sources != targets
+    # Sorting the edges as one key orders them by source, then target
+    sources, targets = np.divmod(np.unique(sources[keep] * nodes + targets[keep]), nodes)
+    indptr = np.zeros(nodes + 1, dtype=np.int64)
+    np.cumsum(np.bincount(sources, minlength=nodes), out=indptr[1:])
+    return indptr, targets.astype(np.int32 if nodes < 2 ** 31 else np.int64)
+
+
+def small_world_edges(nodes, degree, rewiring, rng):
+    '''
+    Edges of a Watts-Strogatz small-world graph: a ring where every node is linked to its degree
+    nearest nodes, with every link rewired to a uniformly random node with probability rewiring
+    Links that come out as self loops or repeats are dropped instead of drawn again
+    '''
+    half = max(degree // 2, 1)
+    sources = np.repeat(np.arange(nodes), half)
+    targets = (sources + np.tile(np.arange(1, half + 1), nodes)) % nodes
+    rewired = rng.random(len(sources)) < rewiring
+    targets[rewired] = rng.integers(0, nodes, np.count_nonzero(rewired))
+    return sources, targets
+
+
+def scale_free_edges(nodes, degree, rng):
+    '''
+    Edges of a Barabasi-Albert scale-free graph: every node links to degree / 2 earlier nodes,
+    picked with probability proportional to their degree
+    Drawn like Batagelj and Brandes do, without a loop over the nodes: a uniformly random
+    endpoint of the edges so far is a node picked proportionally to its degree. Repeated
+    links are dropped instead of drawn again.
+    '''
+    links = max(degree // 2, 1)
+    sources = np.repeat(np.arange(1, nodes), links)
+    count = len(sources)
+    # Edge e may link to any endpoint of the edges before the first edge of its source
+    firstEdge = (sources - 1) * links
+    draws = (rng.random(count) * 2 * firstEdge).astype(np.int64)
+    targets = np.zeros(count, dtype=np.int64)
+    # The edges of node 1 can only go to node 0, an even endpoint is the source of edge draw // 2
+    resolved = firstEdge == 0
+    even = ~resolved & (draws % 2 == 0)
+    targets[even] = sources[draws[even] // 2]
+    resolved |= even
+    # An odd endpoint is the target of an earlier edge, follow the chain until it ends at a known one
+    pointer = np.where(resolved, np.arange(count), draws // 2)
+    pending = np.flatnonzero(~resolved)
+    while len(pending):
+        done = resolved[pointer[pending]]
+        targets[pending[done]] = targets[pointer[pending[done]]]
+        resolved[pending[done]] = True
+        pending = pending[~done]
+        pointer[pending] = pointer[pointer[pending]]
+    return sources, targets
+
+
+def read_edge_list(path):
+    '''
+    Edges of a whitespace separated edge list file, one "source target" pair per line, with
+    lines starting with # or % ignored
+    Node ids are renumbered to 0..nodes-1 in ascending order
+    Returns the sources, the targets and the number of nodes
+    '''
+    edges = np.loadtxt(path, dtype=np.int64, comments=("#", "%"), usecols=(0, 1), ndmin=2)
+    ids, edges = np.unique(edges, return_inverse=True)
+    edges = edges.reshape(-1, 2)
+    return edges[:, 0], edges[:, 1], len(ids)
+
+
+def build_network(network, nodes, degree, rewiring, directed, rng):
+    '''
+    NetworkSpace of a generated graph (see NETWORKS) with `nodes` nodes, or of an edge list file
+    '''
+    if network == 'small-world':
+        sources, targets = small_world_edges(nodes, degree, rewiring, rng)
+    elif network == 'scale-free':
+        sources, targets = scale_free_edges(nodes, degree, rng)
+    else:
+        sources, targets, nodes = read_edge_list(network)
+        return NetworkSpace(*csr_from_edges(sources, targets, nodes, directed))
+    return NetworkSpace(*csr_from_edges(sources, targets, nodes))
+
+
+class NetworkSpace:
+    """
+    Social network the agents live on, one agent per node, in compressed sparse row (CSR) form
+
+    Node i follows the nodes indices[indptr[i]:indptr[i + 1]] and listens to their agents, that
+    is its neighborhood. neighborAgents holds the agent of every entry of indices, so neighbors()
+    is a zero-copy slice and the adjacency is two arrays whatever the size of the network. An
+    undirected edge is two follows, one each way.
+
+    It has the parts of the grid and NeighborhoodIndex interfaces the Simulation uses, with
+    node numbers as positions, and counts the LLMs every node follows like LLMProximityField.
+    Humans relocate by rewiring (see model.rewire): a follow is replaced in place, so every
+    node keeps its number of follows and the arrays never grow.
+    """
+
+    def __init__(self, indptr, indices):
+        """
+        Create a network without agents.
+
+        Args:
+            indptr, indices: The CSR adjacency, see csr_from_edges
+        """
+        self.indptr = indptr
+        self.indices = indices
+        self.numNodes = len(indptr) - 1
+        self.agents = [None] * self.numNodes
+        # Filled by link_agents once every node has its agent
+        self.neighborAgents = None
+        self.isLLM = np.zeros(self.numNodes, dtype=bool)
+        self.LLMCounts = np.zeros(self.numNodes, dtype=np.int64)
+
+    def is_cell_empty(self, node):
+        return self.agents[node] is None
+
+    def place_agent(self, agent, node):
+        if self.agents[node] is not None:
+            raise Exception("Cell not empty")
+        self.agents[node] = agent
+        agent.pos = node
+
+    def place_agents(self, agents, nodes):
+        '''
+        Place every agent on its node in one pass, the nodes must be distinct and empty
+        '''
+        for agent, node in zip(agents, nodes):
+            self.agents[node] = agent
+            agent.pos = node
+
+    def link_agents(self, LLMs):
+        '''
+        Fill neighborAgents and the LLM counts, once every node has its agent
+        '''
+        agents = np.empty(self.numNodes, dtype=object)
+        agents[:] = self.agents
+        self.neighborAgents = agents[self.indices]
+        self.isLLM[:] = False
+        self.isLLM[[agent.pos for agent in LLMs]] = True
+        rows = np.repeat(np.arange(self.numNodes), np.diff(self.indptr))
+        self.LLMCounts = np.bincount(rows, weights=self.isLLM[self.indices], minlength=self.numNodes).astype(np.int64)
+
+    def neighbor_nodes(self, node):
+        '''
+        Nodes that node follows, a view into indices
+        '''
+        return self.indices[self.indptr[node]:self.indptr[node + 1]]
+
+    def neighbors(self, node):
+        '''
+        Agents that node follows, a view into neighborAgents that must not be modified
+        '''
+        return self.neighborAgents[self.indptr[node]:self.indptr[node + 1]]
+
+    def occupant(self, node):
+        return self.agents[node]
+
+    def invalidate(self, node):
+        '''
+        Nothing is cached, rewiring updates the arrays in place
+        '''
+
+    def count(self, node):
+        '''
+        Number of LLM agents node follows
+        '''
+        return int(self.LLMCounts[node])
+
+    def follow(self, node, slot, other):
+        '''
+        Make node follow other instead of the node at position slot of its row
+        '''
+        entry = self.indptr[node] + slot
+        self.LLMCounts[node] += int(self.isLLM[other]) - int(self.isLLM[self.indices[entry]])
+        self.indices[entry] = other
+        self.neighborAgents[entry] = self.agents[other]
+
+    def follow_randomly(self, node, rng):
+        '''
+        Replace every follow of node with a distinct uniformly random other node
+        '''
+        follows = self.indptr[node + 1] - self.indptr[node]
+        for slot, other in enumerate(rng.sample(range(self.numNodes - 1), follows)):
+            self.follow(node, slot, other + (other >= node))
+
+    def within(self, node, hops):
+        '''
+        Nodes 2 to hops follows away from node that it doesn't follow yet, nearest first, in
+        breadth first order. The search stops where the caller stops iterating
+        '''
+        indptr, indices = self.indptr, self.indices
+        frontier = self.neighbor_nodes(node).tolist()
+        seen = set(frontier)
+        seen.add(node)
+        for _ in range(2, hops + 1):
+            nextFrontier = []
+            for current in frontier:
+                for other in indices[indptr[current]:indptr[current + 1]].tolist():
+                    if other not in seen:
+                        seen.add(other)
+                        nextFrontier.append(other)
+                        yield other
+            frontier = nextFrontier
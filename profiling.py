@@ -0,0 +1,51 @@
+# Made by Kiwi!
+
+# The phases of HumanAgent.step, in the order they run
+PHASES = ('census', 'relocation', 'influence', 'clamp', 'confidence')
+
+
+class PhaseProfile:
+    """
+    Wall time and call counts of every phase of HumanAgent.step, summed over the run
+
+    A model only has a profile when it was built with instrument=True. The humans check
+    for it once per step, so leaving the instrumentation in costs next to nothing when
+    it's turned off.
+    """
+
+    def __init__(self):
+        self.seconds = dict.fromkeys(PHASES, 0.0)
+        self.calls = dict.fromkeys(PHASES, 0)
+        # Neighbor lists fetched from the NeighborhoodIndex
+        self.neighborLookups = 0
+        # Empty cells the relocation search looked at
+        self.emptyCellsExamined = 0
+
+    def add(self, phase, seconds):
+        self.seconds[phase] += seconds
+        self.calls[phase] += 1
+
+    def summary(self):
+        '''
+        The profile as a flat dict, e.g. {'censusSeconds': ..., 'censusCalls': ..., 'neighborLookups': ...}
+        '''
+        summary = {}
+        for phase in PHASES:
+            summary[phase + 'Seconds'] = self.seconds[phase]
+            summary[phase + 'Calls'] = self.calls[phase]
+        summary['neighborLookups'] = self.neighborLookups
+        summary['emptyCellsExamined'] = self.emptyCellsExamined
+        return summary
+
+
+def profile_reporters():
+    '''
+    DataCollector model reporters for every entry of PhaseProfile.summary()
+    '''
+    reporters = {}
+    for phase in PHASES:
+        reporters[phase + 'Seconds'] = lambda model, phase=phase: model.profile.seconds[phase]
+        reporters[phase + 'Calls'] = lambda model, phase=phase: model.profile.calls[phase]
+    reporters['neighborLookups'] = lambda model: model.profile.neighborLookups
+    reporters['emptyCellsExamined'] = lambda model: model.profile.emptyCellsExamined
+    return reporters
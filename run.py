@@ -1,3 +1,11 @@
-from server import server
+import argparse
 
-server.launch(port=4545, open_browser=False)
\ No newline at end of file
+from server import make_server
+
+parser = argparse.ArgumentParser(description="Launch the visualization server")
+parser.add_argument("--lockstep", action="store_true", help="Render every step, instead of stepping the model in the background")
+parser.add_argument("--render-every", type=int, default=None, help="Render every N steps instead of at the page's FPS")
+args = parser.parse_args()
+
+server = make_server(background=not args.lockstep, renderEvery=args.render_every)
+server.launch(port=4545, open_browser=False)
@@ -1,6 +1,8 @@
 # Made by Kiwi! 
 
 import mesa
+from background_server import BackgroundServer, StepChart
+from delta_canvas import ClientSocketHandler, DeltaCanvasGrid
 from model import Simulation
 
 def get_misinformed_agents(model):
@@ -39,39 +41,6 @@ def get_num_semi_trusting(model):
     """
     return f"Number of Semi-Trusting Humans: {model.totalSemiTrustingHumans}"
 
-def schelling_draw(agent):
-    """
-    Portrayal Method for canvas
-    """
-    if agent is None:
-        return
-    portrayal = {"Shape": "circle", "r": 1, "Filled": "true", "Layer": 0}
-
-    if agent.type == 'trusting':
-        portrayal["Color"] = "#0000FF"  # Dark Blue
-    elif agent.type == 'semi-trusting':
-        portrayal["Color"] = "#808080"  # Gray
-    elif agent.type == 'untrusting':
-        portrayal["Color"] = "#FF0000"  # Dark Red
-
-    elif agent.type == 'benign':
-        portrayal["Color"] = "#00FF00" # Dark Green
-    elif agent.type == 'malicious':
-        portrayal["Color"] = "#000000" # Black
-    
-    if agent.output == 1: 
-        portrayal["r"] = 0.5
-
-    return portrayal
-
-canvas_element = mesa.visualization.CanvasGrid(
-    portrayal_method=schelling_draw,
-    grid_width=50,
-    grid_height=50,
-    canvas_width=800,
-    canvas_height=800,
-)
-
 model_params = {
     "height": 50,
     "width": 50,
@@ -104,12 +73,20 @@ model_params = {
     ),
 }
 
-misinformed_chart = mesa.visualization.ChartModule([{"Label": "totalMisinformedHumans", "Color": "Black"}])
 
-server = mesa.visualization.ModularServer(
-    model_cls=Simulation,
+def make_server(background=True, renderEvery=None):
+    """
+    Build the visualization server.
+
+    Args:
+        background: Step the model in a background thread and only render the frames the
+                    browser asks for, see background_server.py. Otherwise every step is rendered
+        renderEvery: With background, render every renderEvery steps instead of at the page's FPS
+    """
+    # Sends the steps that weren't rendered too, so the chart keeps every point
+    misinformed_chart = StepChart([{"Label": "totalMisinformedHumans", "Color": "Black"}])
     visualization_elements = [
-        canvas_element,
+        DeltaCanvasGrid(canvas_width=800, canvas_height=800),
         get_misinformed_agents,
         misinformed_chart,
         get_num_malicious,
@@ -117,7 +94,20 @@ server = mesa.visualization.ModularServer(
         get_num_trusting,
         get_num_untrusting,
         get_num_semi_trusting
-        ],
-    name="Communities with Malicious Agents",
-    model_params=model_params,
-)
\ No newline at end of file
+    ]
+    if not background:
+        server = mesa.visualization.ModularServer(
+            model_cls=Simulation,
+            visualization_elements=visualization_elements,
+            name="Communities with Malicious Agents",
+            model_params=model_params,
+        )
+        server.add_handlers(r".*", [(r"/ws", ClientSocketHandler)])
+        return server
+    return BackgroundServer(
+        model_cls=Simulation,
+        visualization_elements=visualization_elements,
+        name="Communities with Malicious Agents",
+        model_params=model_params,
+        renderEvery=renderEvery,
+    )
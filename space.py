@@ -0,0 +1,405 @@
+# Made by Kiwi!
+
+import itertools
+
+import numpy as np
+
+# Largest radius the server's slider allows, offset tables up to this radius are built up front
+MAX_RADIUS = 5
+
+
+def moore_offsets(radius, width, height):
+    '''
+    Offsets of the Moore neighborhood on a width x height torus
+    Offsets that wrap onto the same cell are only listed once, and the center is excluded,
+    which matches SingleGrid.get_neighbors(moore=True, include_center=False)
+    '''
+    seen = set()
+    offsets = []
+    for dx in range(-radius, radius + 1):
+        for dy in range(-radius, radius + 1):
+            key = (dx % width, dy % height)
+            if key == (0, 0) or key in seen:
+                continue
+            seen.add(key)
+            offsets.append((dx, dy))
+    return offsets
+
+
+class SparseGrid:
+    """
+    Torus grid that only stores its occupied cells, in a dict from position to agent
+
+    It has the parts of SingleGrid's interface the Simulation uses (place_agent,
+    move_agent, remove_agent, is_cell_empty), but its memory and construction time grow
+    with the number of agents instead of the area, for large worlds at low density.
+    """
+
+    def __init__(self, width, height):
+        """
+        Create an empty sparse grid.
+
+        Args:
+            width, height: Size of the space.
+        """
+        self.width = width
+        self.height = height
+        self.torus = True
+        self.num_cells = width * height
+        self.agents = {}
+
+    def is_cell_empty(self, pos):
+        return pos not in self.agents
+
+    def place_agent(self, agent, pos):
+        if pos in self.agents:
+            raise Exception("Cell not empty")
+        self.agents[pos] = agent
+        agent.pos = pos
+
+    def remove_agent(self, agent):
+        del self.agents[agent.pos]
+        agent.pos = None
+
+    def move_agent(self, agent, pos):
+        pos = (pos[0] % self.width, pos[1] % self.height)
+        if pos in self.agents:
+            raise Exception("Cell not empty")
+        del self.agents[agent.pos]
+        self.agents[pos] = agent
+        agent.pos = pos
+
+
+def place_agents(grid, agents, positions):
+    '''
+    Place every agent at its position on a SingleGrid or a SparseGrid in one pass, like
+    place_agent for each of them. The positions must be distinct and empty
+    '''
+    if isinstance(grid, SparseGrid):
+        for agent, pos in zip(agents, positions):
+            grid.agents[pos] = agent
+            agent.pos = pos
+        return
+    cells = grid._grid
+    for agent, pos in zip(agents, positions):
+        cells[pos[0]][pos[1]] = agent
+        agent.pos = pos
+    if positions:
+        xs, ys = zip(*positions)
+        grid._empty_mask[list(xs), list(ys)] = False
+    if grid._empties_built:
+        grid._empties.difference_update(positions)
+
+
+class NeighborhoodIndex:
+    """
+    Precomputed Moore neighborhoods of a torus grid, with the latest neighbor lookup kept
+
+    A human looks its neighbors up for the census and again for the influence and confidence
+    phases of its step, so the latest lookup is kept and the second one is free when the human
+    didn't move in between. Any move through Simulation.move_agent (or invalidate()) drops it,
+    so the kept list is never stale, and memory stays at one neighborhood whatever the grid size.
+    """
+
+    def __init__(self, grid, radius):
+        """
+        Create a neighborhood index.
+
+        Args:
+            grid: The SingleGrid or SparseGrid the agents live on
+            radius: Radius of the neighborhoods returned by neighbors()
+        """
+        self.grid = grid
+        self.sparse = isinstance(grid, SparseGrid)
+        self.width = grid.width
+        self.height = grid.height
+        self.radius = radius
+        self.offsets = {
+            r: moore_offsets(r, self.width, self.height) for r in range(1, max(MAX_RADIUS, radius) + 1)
+        }
+        # The latest neighbors() lookup, and the cell it was for
+        self.lastPos = None
+        self.lastNeighbors = None
+
+    def neighborhood(self, pos, radius):
+        '''
+        Positions within radius of pos, like SingleGrid.get_neighborhood(pos, moore=True, radius=radius)
+        '''
+        if radius not in self.offsets:
+            self.offsets[radius] = moore_offsets(radius, self.width, self.height)
+        x, y = pos
+        width, height = self.width, self.height
+        return [((x + dx) % width, (y + dy) % height) for dx, dy in self.offsets[radius]]
+
+    def neighbors(self, pos):
+        '''
+        Agents within self.radius of pos, like SingleGrid.get_neighbors(pos, moore=True, radius=radius)
+        The list is kept for the next lookup and must not be modified
+        '''
+        if pos == self.lastPos:
+            return self.lastNeighbors
+        if self.sparse:
+            agents = self.grid.agents
+            neighbors = [agents[cell] for cell in self.neighborhood(pos, self.radius) if cell in agents]
+        else:
+            cells = self.grid._grid
+            neighbors = [
+                agent for agent in (cells[x][y] for x, y in self.neighborhood(pos, self.radius))
+                if agent is not None
+            ]
+        self.lastPos = pos
+        self.lastNeighbors = neighbors
+        return neighbors
+
+    def num_neighbors(self, pos):
+        '''
+        Number of agents within self.radius of pos, without keeping the lookup
+        e.g. for the empty cells a relocating human probes
+        '''
+        if self.sparse:
+            agents = self.grid.agents
+            return sum(1 for cell in self.neighborhood(pos, self.radius) if cell in agents)
+        cells = self.grid._grid
+        return sum(1 for x, y in self.neighborhood(pos, self.radius) if cells[x][y] is not None)
+
+    def occupant(self, pos):
+        '''
+        The agent at pos, None when the cell is empty
+        '''
+        if self.sparse:
+            return self.grid.agents.get(pos)
+        return self.grid._grid[pos[0]][pos[1]]
+
+    def invalidate(self, pos):
+        '''
+        Forget the latest lookup, an agent entered or left pos
+        '''
+        self.lastPos = None
+        self.lastNeighbors = None
+
+
+class LLMProximityField:
+    """
+    Number of LLM agents within radius of every cell of a torus grid
+
+    LLMs never move, so the field is built once after the grid is populated and every
+    query afterwards is a single lookup.
+    """
+
+    def __init__(self, neighborhoods, agents):
+        """
+        Create an LLM proximity field.
+
+        Args:
+            neighborhoods: NeighborhoodIndex of the grid, its radius is used for the field
+            agents: The LLM agents on the grid
+        """
+        width, height = neighborhoods.width, neighborhoods.height
+        self.total = [[0] * height for _ in range(width)]
+        for agent in agents:
+            self.add(neighborhoods, agent)
+
+    def add(self, neighborhoods, agent):
+        '''
+        Count an LLM agent in the field of every cell around it
+        '''
+        for x, y in neighborhoods.neighborhood(agent.pos, neighborhoods.radius):
+            self.total[x][y] += 1
+
+    def count(self, pos):
+        '''
+        Number of LLM agents within radius of pos
+        '''
+        return self.total[pos[0]][pos[1]]
+
+
+class SparseLLMProximityField(LLMProximityField):
+    """
+    LLMProximityField that only stores the cells within radius of an LLM, for a SparseGrid
+    """
+
+    def __init__(self, neighborhoods, agents):
+        self.total = {}
+        for agent in agents:
+            self.add(neighborhoods, agent)
+
+    def add(self, neighborhoods, agent):
+        for pos in neighborhoods.neighborhood(agent.pos, neighborhoods.radius):
+            self.total[pos] = self.total.get(pos, 0) + 1
+
+    def count(self, pos):
+        return self.total.get(pos, 0)
+
+
+class EmptyCellIndex:
+    """
+    Index of the empty cells of a torus grid
+
+    The empty cells are kept in a list with a position lookup, so adding, removing and
+    drawing a uniformly random empty cell are all O(1). Occupancy is also kept as one
+    bitmap per column, which lets a square of the grid be scanned for empty cells a
+    column at a time instead of a cell at a time.
+    """
+
+    def __init__(self, width, height):
+        """
+        Create an index where every cell is empty.
+
+        Args:
+            width, height: Size of the space.
+        """
+        self.width = width
+        self.height = height
+        self.cells = list(itertools.product(range(width), range(height)))
+        self.where = dict(zip(self.cells, range(len(self.cells))))
+        # Bit y of column x is set when (x, y) is occupied. The bitmap is stored twice
+        # (bits 0..height-1 and height..2*height-1) so a window that wraps can be read with one shift
+        self.columns = [0] * width
+
+    def __len__(self):
+        return len(self.cells)
+
+    def is_empty(self, pos):
+        return pos in self.where
+
+    def add(self, pos):
+        '''
+        Mark a cell as empty
+        '''
+        if pos in self.where:
+            return
+        self.where[pos] = len(self.cells)
+        self.cells.append(pos)
+        x, y = pos
+        self.columns[x] &= ~((1 << y) | (1 << (y + self.height)))
+
+    def remove(self, pos):
+        '''
+        Mark a cell as occupied
+        '''
+        i = self.where.pop(pos, None)
+        if i is None:
+            return
+        last = self.cells.pop()
+        if i < len(self.cells):
+            self.cells[i] = last
+            self.where[last] = i
+        x, y = pos
+        self.columns[x] |= (1 << y) | (1 << (y + self.height))
+
+    def reset(self, positions):
+        '''
+        Mark the cells in positions as occupied and every other cell as empty, e.g. once a world is populated
+        '''
+        occupied = np.zeros((self.width, self.height), dtype=bool)
+        if positions:
+            xs, ys = zip(*positions)
+            occupied[list(xs), list(ys)] = True
+        xs, ys = np.nonzero(~occupied)
+        self.cells = list(zip(xs.tolist(), ys.tolist()))
+        self.where = dict(zip(self.cells, range(len(self.cells))))
+        # Bit y of the packed column is (x, y), doubled like in remove
+        self.columns = [
+            bits | (bits << self.height)
+            for bits in (int.from_bytes(column.tobytes(), 'little') for column in np.packbits(occupied, axis=1, bitorder='little'))
+        ]
+
+    def sample(self, rng):
+        '''
+        A uniformly random empty cell
+        '''
+        if not self.cells:
+            raise Exception("ERROR: No empty cells")
+        return self.cells[rng.randrange(len(self.cells))]
+
+    def within(self, pos, radius):
+        '''
+        Empty cells within radius of pos, in the same order as NeighborhoodIndex.neighborhood
+        '''
+        width, height = self.width, self.height
+        x, y = pos
+        spanX = min(2 * radius + 1, width)
+        spanY = min(2 * radius + 1, height)
+        startY = (y - radius) % height
+        window = (1 << spanY) - 1
+        empties = []
+        for dx in range(spanX):
+            col = (x - radius + dx) % width
+            free = ~(self.columns[col] >> startY) & window
+            while free:
+                low = free & -free
+                row = (startY + low.bit_length() - 1) % height
+                if col != x or row != y:
+                    empties.append((col, row))
+                free ^= low
+        return empties
+
+
+class SparseEmptyCellIndex:
+    """
+    EmptyCellIndex of a SparseGrid, stores the occupied cells instead of the empty ones
+
+    A random empty cell is drawn by rejection, which takes 1 / (1 - density) draws on
+    average, so it is meant for low densities.
+    """
+
+    def __init__(self, width, height):
+        """
+        Create an index where every cell is empty.
+
+        Args:
+            width, height: Size of the space.
+        """
+        self.width = width
+        self.height = height
+        self.occupied = set()
+
+    def __len__(self):
+        return self.width * self.height - len(self.occupied)
+
+    def is_empty(self, pos):
+        return pos not in self.occupied
+
+    def add(self, pos):
+        '''
+        Mark a cell as empty
+        '''
+        self.occupied.discard(pos)
+
+    def remove(self, pos):
+        '''
+        Mark a cell as occupied
+        '''
+        self.occupied.add(pos)
+
+    def reset(self, positions):
+        self.occupied = set(positions)
+
+    def sample(self, rng):
+        '''
+        A uniformly random empty cell
+        '''
+        if len(self) == 0:
+            raise Exception("ERROR: No empty cells")
+        while True:
+            pos = (rng.randrange(self.width), rng.randrange(self.height))
+            if pos not in self.occupied:
+                return pos
+
+    def within(self, pos, radius):
+        '''
+        Empty cells within radius of pos, in the same order as EmptyCellIndex.within
+        '''
+        width, height = self.width, self.height
+        x, y = pos
+        spanX = min(2 * radius + 1, width)
+        spanY = min(2 * radius + 1, height)
+        occupied = self.occupied
+        empties = []
+        for dx in range(spanX):
+            col = (x - radius + dx) % width
+            for dy in range(spanY):
+                row = (y - radius + dy) % height
+                if (col, row) not in occupied and (col != x or row != y):
+                    empties.append((col, row))
+        return empties
@@ -0,0 +1,252 @@
+# Made by Kiwi!
+
+import hashlib
+import itertools
+import json
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, as_completed, wait
+from concurrent.futures.process import BrokenProcessPool
+
+# How often a run is retried after its worker process died before it is reported as failed
+MAX_RETRIES = 2
+# The modules whose code decides the result of a run, see code_version
+SIMULATION_MODULES = (
+    "model", "space", "array_model", "movement", "network", "tiled_model",
+    "convergence", "metrics", "history", "checkpoint",
+)
+
+
+def parameter_grid(grid):
+    '''
+    Expand a parameter grid into a list of Simulation parameter dicts
+    Args:
+        grid: Maps a Simulation parameter (the names in server.py's model_params) to a
+              single value or a list of values to sweep over
+    '''
+    names = list(grid)
+    values = [grid[name] if isinstance(grid[name], (list, tuple)) else [grid[name]] for name in names]
+    return [dict(zip(names, combination)) for combination in itertools.product(*values)]
+
+
+def run_seed(seed, params, replica):
+    '''
+    Seed of one replica of one parameter combination
+    It only depends on the combination, so the same cell of two different sweeps gets the same seed
+    '''
+    text = json.dumps([seed, params, replica], sort_keys=True)
+    return int(hashlib.sha256(text.encode()).hexdigest()[:8], 16)
+
+
+def code_version():
+    '''
+    Hash of the simulation source files, stored results are only reused by the same code
+    Only the modules in SIMULATION_MODULES count, editing a test or the benchmark keeps the cache
+    '''
+    digest = hashlib.sha256()
+    directory = os.path.dirname(os.path.abspath(__file__))
+    for name in SIMULATION_MODULES:
+        digest.update(name.encode())
+        with open(os.path.join(directory, name + ".py"), "rb") as source:
+            digest.update(source.read())
+    return digest.hexdigest()[:16]
+
+
+def file_digest(path):
+    '''
+    Hash of a file's contents, e.g. of the checkpoint runs start from
+    '''
+    digest = hashlib.sha256()
+    with open(path, "rb") as stored:
+        for block in iter(lambda: stored.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()[:16]
+
+
+class ResultCache:
+    """
+    Content-addressed store of finished runs
+
+    A run is stored under the hash of its parameters, seed, engine and code version, so a
+    seeded run that was computed before is returned from disk instead of being simulated again.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.version = code_version()
+        os.makedirs(directory, exist_ok=True)
+
+    def key(self, params, engine, checkpoint=None):
+        params = {name: value for name, value in params.items() if name != "outputDir"}
+        start = None if checkpoint is None else file_digest(checkpoint)
+        text = json.dumps([params, engine, self.version] + ([start] if start else []), sort_keys=True)
+        return hashlib.sha256(text.encode()).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, key + ".json")
+
+    def get(self, key):
+        try:
+            with open(self.path(key)) as stored:
+                return json.load(stored)
+        except (OSError, ValueError):
+            return None
+
+    def put(self, key, result):
+        # Write to a temporary file first, a half written entry is never visible
+        temporary = self.path(key) + ".%d.tmp" % os.getpid()
+        with open(temporary, "w") as stored:
+            json.dump(result, stored)
+        os.replace(temporary, self.path(key))
+
+
+def run_simulation(params, engine="agents", checkpoint=None, saveCheckpoint=None):
+    '''
+    Run one Simulation to completion and return its metrics
+    This is the worker function of the sweep, it runs in its own process
+    Args:
+        params: Simulation parameters
+        engine: See model.build_simulation
+        checkpoint: Continue from this checkpoint instead of a new world, with params as the
+                    changes (see checkpoint.load_checkpoint). Agents engine only
+        saveCheckpoint: Save the finished model to this file
+    '''
+    from model import build_simulation
+
+    os.makedirs(params["outputDir"], exist_ok=True)
+    if checkpoint is not None or saveCheckpoint is not None:
+        if engine != "agents":
+            raise ValueError("Checkpoints need the agents engine")
+    if checkpoint is not None:
+        from checkpoint import load_checkpoint
+
+        model = load_checkpoint(checkpoint, **params)
+    else:
+        model = build_simulation(engine, **params)
+    while model.running:
+        model.step()
+    if saveCheckpoint is not None:
+        from checkpoint import save_checkpoint
+
+        save_checkpoint(model, saveCheckpoint)
+
+    series = model.datacollector.series()
+    return {
+        "params": params,
+        "iterations": model.iterations,
+        "convergenceStep": model.convergenceStep,
+        "totalNumMoves": model.totalNumMoves,
+        "final": {name: values[-1] for name, values in series.items()},
+        "series": series,
+    }
+
+
+def sweep(grid, replicas=1, outputRoot="sweep", engine="agents", processes=None, seed=None, cache=None, checkpoint=None):
+    '''
+    Run every combination of a parameter grid, in parallel, and yield each result as it finishes
+    Args:
+        grid: Parameter grid, see parameter_grid
+        replicas: Number of runs of every combination
+        outputRoot: Every run writes its CSV files to its own directory under outputRoot,
+                    and every finished result is appended to outputRoot/results.jsonl
+        engine: 'agents', 'array' or 'tiled', see model.build_simulation
+        processes: Number of worker processes, all cores by default
+        seed: Base seed, every run gets its own seed derived from it. None for unseeded runs
+        cache: Directory of a ResultCache. Seeded runs found there are yielded straight away
+               with "cached" set, without simulating them or writing their CSV files again
+        checkpoint: Fork every run from this checkpoint, the grid only holds the parameters
+                    to change. With a seed every replica reseeds, so the forks diverge
+
+    When a worker process dies, the runs its pool had not finished are run again, each in a
+    single-worker pool of its own, so only the run that kills its worker is charged for it. That
+    run is reported with an "error" entry once it has been retried MAX_RETRIES times. Results
+    that already finished are kept in results.jsonl either way.
+    '''
+    os.makedirs(outputRoot, exist_ok=True)
+    runs = {}
+    for index, params in enumerate(parameter_grid(grid)):
+        for replica in range(replicas):
+            runId = len(runs)
+            runs[runId] = dict(
+                params,
+                seed=None if seed is None else run_seed(seed, params, replica),
+                outputDir=os.path.join(outputRoot, "run-%05d-%03d" % (index, replica)),
+            )
+
+    if cache is not None and not isinstance(cache, ResultCache):
+        cache = ResultCache(cache)
+    keys = {}
+    pending = []
+    with open(os.path.join(outputRoot, "results.jsonl"), "a") as results:
+        for runId, params in runs.items():
+            if cache is None or params["seed"] is None:
+                pending.append(runId)
+                continue
+            keys[runId] = cache.key(params, engine, checkpoint)
+            result = cache.get(keys[runId])
+            if result is None:
+                pending.append(runId)
+                continue
+            result.update(run=runId, cached=True)
+            results.write(json.dumps(result) + "\n")
+            results.flush()
+            yield result
+
+        # Every run goes to one shared pool first. A worker that dies breaks the whole pool and
+        # fails every run that had not finished, without telling which one killed it
+        broken = []
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            futures = {pool.submit(run_simulation, runs[runId], engine, checkpoint): runId for runId in pending}
+            for future in as_completed(futures):
+                runId = futures[future]
+                result = run_result(future, runs[runId])
+                if result is None:
+                    broken.append(runId)
+                    continue
+                yield record_result(results, runId, result, cache, keys)
+
+        # So those runs go again in single-worker pools of their own, where a dead worker is the
+        # run's own doing and only counts against its retries
+        queue = sorted(broken)
+        attempts = {runId: 0 for runId in queue}
+        running = {}
+        while queue or running:
+            while queue and len(running) < (processes or os.cpu_count() or 1):
+                runId = queue.pop(0)
+                pool = ProcessPoolExecutor(max_workers=1)
+                running[pool.submit(run_simulation, runs[runId], engine, checkpoint)] = (runId, pool)
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                runId, pool = running.pop(future)
+                pool.shutdown()
+                result = run_result(future, runs[runId])
+                if result is None:
+                    attempts[runId] += 1
+                    if attempts[runId] <= MAX_RETRIES:
+                        queue.append(runId)
+                        continue
+                    result = {"params": runs[runId], "error": "worker process died"}
+                yield record_result(results, runId, result, cache, keys)
+
+
+def run_result(future, params):
+    '''
+    Result of a finished run, an "error" result when it raised, or None when its worker process died
+    '''
+    try:
+        return future.result()
+    except BrokenProcessPool:
+        return None
+    except Exception as error:
+        return {"params": params, "error": repr(error)}
+
+
+def record_result(results, runId, result, cache, keys):
+    '''
+    Append a finished run to results.jsonl, and store it in the cache when it succeeded
+    '''
+    if "error" not in result and runId in keys:
+        cache.put(keys[runId], result)
+    result["run"] = runId
+    results.write(json.dumps(result) + "\n")
+    results.flush()
+    return result
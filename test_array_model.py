@@ -0,0 +1,52 @@
+# Made by Kiwi!
+
+import numpy as np
+
+from array_model import ArraySimulation
+from model import BENIGN, EMPTY, MALICIOUS, TRUSTING, UNTRUSTING, Simulation
+
+PARAMS = dict(width=40, height=40, radius=2, inconvenienceThreshold=3, maxIterations=30)
+
+
+def run(model):
+    while model.running:
+        model.step()
+    return model
+
+
+def test_counters_match_the_arrays():
+    model = ArraySimulation(seed=2, **PARAMS)
+    numAgents = model.numAgents
+    run(model)
+
+    kind = model.kind
+    humans = (kind > EMPTY) & (kind < BENIGN)
+    assert np.count_nonzero(kind != EMPTY) == numAgents == model.numAgents
+    assert model.numHumans == np.count_nonzero(humans)
+    assert model.totalMaliciousLLMs == np.count_nonzero(kind == MALICIOUS)
+    assert model.totalTrustingHumans == np.count_nonzero(kind == TRUSTING)
+    assert model.totalUntrustingHumans == np.count_nonzero(kind == UNTRUSTING)
+    assert model.totalMisinformedHumans == np.count_nonzero(humans & (model.output < 0))
+    assert model.happy == np.count_nonzero(humans & model.isHappy)
+    assert model.totalNumMoves == model.totalNumMovesPerAgent.sum()
+    assert len(model.datacollector) == model.iterations + 1
+
+
+def test_array_engine_tracks_the_agent_engine():
+    agents = [run(Simulation(seed=seed, **PARAMS)) for seed in range(3)]
+    arrays = [run(ArraySimulation(seed=seed, **PARAMS)) for seed in range(3)]
+
+    def mean(models, statistic):
+        return np.mean([statistic(model) for model in models])
+
+    # The same population is drawn, from other random streams
+    assert abs(mean(arrays, lambda m: m.numAgents) / mean(agents, lambda m: m.numAgents) - 1) < 0.05
+    assert abs(mean(arrays, lambda m: m.numLLMs / m.numAgents) - mean(agents, lambda m: m.numLLMs / m.numAgents)) < 0.02
+    # Misinformation stays as rare
+    misinformed = lambda m: m.totalMisinformedHumans / m.numHumans
+    assert abs(mean(arrays, misinformed) - mean(agents, misinformed)) < 0.05
+    # Relocation is judged on the grid at the start of each step, see ArraySimulation,
+    # so it moves less and leaves fewer humans happy, but most of them still settle
+    happy = lambda m: m.happy / m.numHumans
+    assert 0 < mean(arrays, lambda m: m.totalNumMoves) < mean(agents, lambda m: m.totalNumMoves)
+    assert 0.6 < mean(arrays, happy) <= mean(agents, happy)
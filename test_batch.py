@@ -0,0 +1,18 @@
+# Made by Kiwi!
+
+import os
+import subprocess
+import sys
+
+REPO = os.path.dirname(os.path.abspath(__file__))
+
+
+def test_batch_does_not_import_the_visualization_stack():
+    script = (
+        "import sys\n"
+        "import batch, model\n"
+        "print(sorted(name for name in ('tornado', 'mesa_viz_tornado') if name in sys.modules))\n"
+    )
+    environment = dict(os.environ, PYTHONPATH=REPO)
+    output = subprocess.run([sys.executable, "-c", script], env=environment, capture_output=True, text=True, check=True).stdout
+    assert output.split() == ["[]"]
@@ -0,0 +1,29 @@
+# Made by Kiwi!
+
+import json
+
+import pytest
+
+from benchmark import main, run_case
+
+
+@pytest.mark.parametrize("engine", ["agents", "array", "tiled"])
+def test_a_run_that_stops_early_is_timed_over_its_steps(engine):
+    # At this density every human is happy after the first step
+    case = dict(engine=engine, width=20, height=20, radius=1, inconvenienceThreshold=1, density=0.05, proportionLLMs=0.05)
+    result = run_case(case, 10)
+    assert "error" not in result
+    assert 1 <= result["steps"] < 10
+    assert result["stepSeconds"] > 0
+
+
+def test_benchmark_report_and_compare(tmp_path, capsys):
+    arguments = ["--sizes", "10", "--radius", "1", "--threshold", "1", "2", "--density", "0.05", "0.8", "--steps", "3"]
+    main(arguments + ["--output", str(tmp_path / "old.json")])
+    main(arguments + ["--output", str(tmp_path / "new.json"), "--compare", str(tmp_path / "old.json")])
+    with open(tmp_path / "new.json") as stored:
+        results = json.load(stored)["results"]
+    assert len(results) == 4
+    assert all("error" not in result and 1 <= result["steps"] <= 3 for result in results)
+    # Every case of the second run is compared against the first
+    assert capsys.readouterr().out.count(" -> ") == 4
@@ -0,0 +1,42 @@
+# Made by Kiwi!
+
+import pytest
+
+from checkpoint import load_checkpoint, save_checkpoint
+from model import Simulation
+
+
+def agent_states(model):
+    '''
+    The state of every agent of a Simulation, in scheduling order
+    '''
+    return [
+        (agent.unique_id, agent.pos, agent.output, agent.confidence, getattr(agent, "stepsSinceFlip", None))
+        for agent in model.schedule.agents
+    ]
+
+
+@pytest.mark.parametrize("params", [
+    dict(),
+    dict(activation="dirty"),
+    dict(movement="batched", density=0.9, inconvenienceThreshold=5),
+    dict(space="sparse", density=0.3),
+])
+def test_checkpoint_continues_like_an_uninterrupted_run(tmp_path, params):
+    params = dict(width=30, height=30, seed=3, maxIterations=15, **params)
+    uninterrupted = Simulation(**params)
+    while uninterrupted.running:
+        uninterrupted.step()
+
+    model = Simulation(**params)
+    for _ in range(5):
+        model.step()
+    save_checkpoint(model, str(tmp_path / "run.ckpt"))
+    restored = load_checkpoint(str(tmp_path / "run.ckpt"))
+    while restored.running:
+        restored.step()
+
+    assert agent_states(restored) == agent_states(uninterrupted)
+    assert restored.datacollector.series() == uninterrupted.datacollector.series()
+    assert restored.totalNumMoves == uninterrupted.totalNumMoves
+    assert restored.flipLog.entries() == uninterrupted.flipLog.entries()
@@ -0,0 +1,50 @@
+# Made by Kiwi!
+
+import pytest
+
+from convergence import ConvergenceMonitor
+from model import build_simulation
+
+
+def test_steady_series_converges_after_the_windows_and_patience():
+    monitor = ConvergenceMonitor(100, window=4, tolerance=0.01, patience=3)
+    converged = [monitor.update(30, 0, 0) for _ in range(12)]
+    # The step that fills both windows (the 8th) is the first steady one of 3 in a row
+    assert converged.index(True) + 1 == 2 * 4 + 3 - 1
+
+
+def test_change_resets_the_patience():
+    monitor = ConvergenceMonitor(100, window=2, tolerance=0.01, patience=3)
+    for _ in range(5):
+        assert not monitor.update(30, 0, 0)
+    # 10 moves in one step is more than 1% of 100 humans
+    assert not monitor.update(30, 0, 10)
+    steps = 0
+    while not monitor.update(30, 0, 10):
+        steps += 1
+    assert steps > 2
+
+
+def test_trend_never_converges():
+    monitor = ConvergenceMonitor(100, window=3, tolerance=0.01, patience=2)
+    assert not any(monitor.update(misinformed, 0, 0) for misinformed in range(0, 200, 2))
+
+
+@pytest.mark.parametrize("engine", ["agents", "array"])
+def test_convergence_stops_the_run(engine):
+    params = dict(width=30, height=30, seed=3, maxIterations=300)
+    full = build_simulation(engine, **params)
+    while full.running:
+        full.step()
+    stopped = build_simulation(engine, convergenceWindow=5, convergenceTolerance=0.02, **params)
+    while stopped.running:
+        stopped.step()
+
+    assert full.iterations == 300 and full.convergenceStep is None
+    assert stopped.convergenceStep == stopped.iterations < 50
+    # The monitor only watches, the run is the same up to where it stopped
+    collected = stopped.iterations + 1
+    for name, values in stopped.datacollector.model_vars.items():
+        assert values.tolist() == full.datacollector.model_vars[name][:collected].tolist()
+    with open("model.csv") as output:
+        assert output.read().rstrip().split(",")[-1].strip() == str(stopped.convergenceStep)
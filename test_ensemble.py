@@ -0,0 +1,35 @@
+# Made by Kiwi!
+
+import numpy as np
+import pytest
+
+from array_model import AGENT_FIELDS, ArraySimulation
+from ensemble import EnsembleSimulation
+
+
+def array_states(model):
+    '''
+    The agent fields and counters of an ArraySimulation
+    '''
+    fields = [np.array(getattr(model, name)).tolist() for name in AGENT_FIELDS]
+    return fields, int(model.totalNumMoves), int(model.totalFlips), int(model.iterations), model.convergenceStep
+
+
+@pytest.mark.parametrize("params", [
+    dict(width=30, height=25, maxIterations=40, inconvenienceThreshold=3),
+    dict(width=20, height=20, maxIterations=200, radius=2, inconvenienceThreshold=4, convergenceWindow=5, convergenceTolerance=0.05),
+    dict(width=20, height=20, maxIterations=50, density=0.3),
+])
+def test_ensemble_replicas_run_like_standalone_models(params):
+    ensemble = EnsembleSimulation(replicas=4, seed=11, **params)
+    while ensemble.running:
+        ensemble.step()
+
+    for replica, seed in enumerate(ensemble.seeds):
+        model = ArraySimulation(seed=seed, **params)
+        while model.running:
+            model.step()
+        assert array_states(ensemble.replica(replica)) == array_states(model)
+        collected = model.datacollector.model_vars["totalMisinformedHumans"]
+        stacked = ensemble.datacollector.model_vars["totalMisinformedHumans"][:len(collected), replica]
+        assert collected.tolist() == stacked.tolist()
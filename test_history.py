@@ -0,0 +1,110 @@
+# Made by Kiwi!
+
+import pytest
+
+from history import CascadeGraph, FlipLog
+from model import Simulation
+
+
+def fill(log, count):
+    for i in range(count):
+        log.append(100 + i, i, 4, flipCount=i + 1)
+
+
+def test_uncapped_log_keeps_every_entry():
+    log = FlipLog()
+    fill(log, 7)
+    assert log.entries() == [(100 + i, i, 4, i + 1) for i in range(7)]
+    assert log.entries(103) == [(103, 3, 4, 4)]
+    assert log.dropped == 0
+
+
+def test_capped_log_keeps_the_first_entries():
+    log = FlipLog(capacity=4)
+    fill(log, 7)
+    assert [entry[1] for entry in log.entries()] == [0, 1, 2, 3]
+    assert log.dropped == 3
+
+
+def test_ring_log_keeps_the_latest_entries_oldest_first():
+    log = FlipLog(capacity=4, ring=True)
+    fill(log, 7)
+    assert [entry[1] for entry in log.entries()] == [3, 4, 5, 6]
+    assert list(log.edges()["steps"]) == [3, 4, 5, 6]
+    assert log.dropped == 3
+
+
+def test_ring_log_needs_a_capacity():
+    with pytest.raises(ValueError):
+        FlipLog(ring=True)
+
+
+@pytest.mark.parametrize("ring", [False, True])
+def test_model_flip_history_is_capped(ring):
+    params = dict(width=30, height=30, seed=5, maxIterations=40)
+    full = Simulation(**params)
+    capped = Simulation(flipHistoryLimit=50, flipHistoryRing=ring, **params)
+    for model in (full, capped):
+        while model.running:
+            model.step()
+
+    entries = full.flipLog.entries()
+    assert len(entries) > 50
+    assert capped.flipLog.entries() == (entries[-50:] if ring else entries[:50])
+    assert capped.flipLog.dropped == len(entries) - 50
+    for agent in full.schedule.agents:
+        if hasattr(agent, "flipHistory"):
+            assert [record["flipCount:"] for record in agent.flipHistory] == [
+                flipCount for agentId, _, _, flipCount in entries if agentId == agent.unique_id
+            ]
+
+
+def cascade_run():
+    model = Simulation(width=30, height=30, seed=4, maxIterations=40, radius=2)
+    while model.running:
+        model.step()
+    return model
+
+
+def test_cascade_queries_match_the_raw_edges():
+    model = cascade_run()
+    edges = model.flipLog.edges()
+    rows = list(zip(*(edges[name].tolist() for name in ("agentIds", "steps", "influencerIds", "rootIds", "depths"))))
+    assert rows
+    graph = CascadeGraph(model.flipLog)
+
+    for influencer in set(row[2] for row in rows):
+        flipped = sorted((step, agentId) for agentId, step, influencerId, _, _ in rows if influencerId == influencer)
+        agentIds, steps = graph.flipped_by(influencer)
+        assert sorted(zip(steps.tolist(), agentIds.tolist())) == flipped
+        assert steps.tolist() == sorted(steps.tolist())
+    agentIds, steps = graph.flipped_by(-5)
+    assert len(agentIds) == len(steps) == 0
+
+    stats = graph.LLM_stats()
+    assert set(stats) == set(row[3] for row in rows)
+    for rootId, stat in stats.items():
+        cascade = [row for row in rows if row[3] == rootId]
+        assert stat["flips"] == len(cascade)
+        assert stat["reach"] == len(set(row[0] for row in cascade))
+        assert stat["maxDepth"] == max(row[4] for row in cascade)
+        assert stat["meanDepth"] == pytest.approx(sum(row[4] for row in cascade) / len(cascade))
+        assert stat["firstFlipStep"] == min(row[1] for row in cascade)
+        assert stat["meanTimeToFlip"] == pytest.approx(sum(row[1] for row in cascade) / len(cascade))
+
+        depths = graph.depth_distribution(rootId).tolist()
+        assert depths == [sum(row[4] == depth for row in cascade) for depth in range(len(depths))]
+    depths = graph.depth_distribution().tolist()
+    assert depths == [sum(row[4] == depth for row in rows) for depth in range(len(depths))]
+    assert sum(depths) == len(rows)
+
+
+def test_LLM_flips_are_roots_of_their_cascades():
+    model = cascade_run()
+    LLMs = {agent.unique_id: agent for agent in model.schedule.agents if not hasattr(agent, "flipHistory")}
+    stats = CascadeGraph(model.flipLog).LLM_stats()
+    assert set(stats) <= set(LLMs)
+    edges = model.flipLog.edges()
+    direct = edges["depths"] == 1
+    assert (edges["influencerIds"][direct] == edges["rootIds"][direct]).all()
+    assert set(edges["influencerIds"][~direct].tolist()).isdisjoint(LLMs)
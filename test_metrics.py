@@ -0,0 +1,64 @@
+# Made by Kiwi!
+
+import numpy as np
+
+from ensemble import EnsembleSimulation
+from metrics import ColumnCollector, StepChange
+
+
+class Counters:
+    def __init__(self):
+        self.count = 0
+        self.share = 0
+        self.perReplica = np.zeros(3, dtype=np.int64)
+
+
+def test_columns_widen_instead_of_truncating():
+    model = Counters()
+    collector = ColumnCollector({"count": "count", "share": "share", "change": StepChange("count")}, capacity=2)
+    collector.collect(model)
+    model.count, model.share = 3, 0.25
+    collector.collect(model)
+    # Past the capacity, with a value the int column can't hold
+    model.count, model.share = 2 ** 40, 0.75
+    collector.collect(model)
+
+    values = collector.model_vars
+    assert values["count"].tolist() == [0, 3, 2 ** 40]
+    assert values["share"].tolist() == [0, 0.25, 0.75]
+    assert values["share"].dtype == np.float64
+    assert values["change"].tolist() == [0, 3, 2 ** 40 - 3]
+    assert len(collector) == 3
+
+
+def test_load_widens_columns():
+    model = Counters()
+    collector = ColumnCollector({"share": "share"}, capacity=4)
+    collector.collect(model)
+    collector.load({"share": [0, 0.5, 1.5]}, model)
+    assert collector.model_vars["share"].tolist() == [0, 0.5, 1.5]
+
+
+def test_array_reporters_get_one_dataframe_column_per_element():
+    model = Counters()
+    collector = ColumnCollector({"count": "count", "perReplica": "perReplica"}, capacity=3)
+    for step in range(3):
+        model.count = step
+        model.perReplica += np.arange(3)
+        collector.collect(model)
+
+    frame = collector.get_model_vars_dataframe()
+    assert list(frame.columns) == ["count", "perReplica[0]", "perReplica[1]", "perReplica[2]"]
+    assert frame["perReplica[2]"].tolist() == [2, 4, 6]
+    assert frame["count"].tolist() == [0, 1, 2]
+
+
+def test_ensemble_dataframe():
+    model = EnsembleSimulation(replicas=3, seed=1, width=15, height=15, maxIterations=5)
+    while model.running:
+        model.step()
+    frame = model.datacollector.get_model_vars_dataframe()
+    assert len(frame) == len(model.datacollector)
+    misinformed = model.datacollector.model_vars["totalMisinformedHumans"]
+    for replica in range(3):
+        assert frame["totalMisinformedHumans[%d]" % replica].tolist() == misinformed[:, replica].tolist()
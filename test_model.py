@@ -0,0 +1,83 @@
+# Made by Kiwi!
+
+import numpy as np
+import pytest
+
+from model import BENIGN, MALICIOUS, SEMI_TRUSTING, TRUSTING, UNTRUSTING, Simulation, distinct_cells
+
+
+@pytest.mark.parametrize("params", [
+    dict(),
+    dict(activation="dirty"),
+    dict(movement="batched", inconvenienceThreshold=4),
+    dict(space="sparse", density=0.3),
+    dict(space="network", networkNodes=300),
+    dict(construction="bulk", radius=2, inconvenienceThreshold=3),
+])
+def test_live_counters_match_a_rescan(params):
+    model = Simulation(**dict(dict(width=30, height=30, seed=6, maxIterations=100), **params))
+    for _ in range(12):
+        if not model.running:
+            break
+        model.step()
+
+    agents = model.schedule.agents
+    humans = [agent for agent in agents if agent.typeCode < BENIGN]
+    assert model.numAgents == len(agents)
+    assert model.numHumans == len(humans)
+    assert model.happy == sum(agent.happy for agent in humans)
+    assert model.totalMisinformedHumans == sum(agent.misinformed for agent in humans)
+    assert model.totalFlips == sum(agent.flipCount for agent in humans)
+    counts = {code: sum(agent.typeCode == code for agent in agents) for code in (TRUSTING, UNTRUSTING, SEMI_TRUSTING, BENIGN, MALICIOUS)}
+    assert (
+        model.totalTrustingHumans, model.totalUntrustingHumans, model.totalSemiTrustingHumans,
+        model.totalBenignLLMs, model.totalMaliciousLLMs,
+    ) == tuple(counts.values())
+
+
+@pytest.mark.parametrize("numCells, count", [(1, 1), (10, 0), (10, 10), (1000, 3), (1000, 999), (10 ** 12, 5000)])
+def test_distinct_cells(numCells, count):
+    cells = distinct_cells(np.random.default_rng(4), numCells, count)
+    assert len(cells) == count
+    assert (np.diff(cells) > 0).all()
+    assert count == 0 or (0 <= cells[0] and cells[-1] < numCells)
+
+
+def test_distinct_cells_are_uniform():
+    rng = np.random.default_rng(9)
+    hits = np.zeros(50, dtype=np.int64)
+    for _ in range(2000):
+        hits[distinct_cells(rng, 50, 10)] += 1
+    # Every cell is drawn with probability 10 / 50
+    expected = 2000 * 10 / 50
+    assert np.abs(hits - expected).max() < 5 * np.sqrt(expected)
+
+
+@pytest.mark.parametrize("params", [
+    dict(),
+    dict(space="sparse", density=0.05, width=200, height=200),
+    dict(space="network", networkNodes=500),
+    dict(maliciousLLMs=0, proportionLLMs=0.2),
+])
+def test_bulk_population_counts(params):
+    params = dict(dict(width=60, height=60, seed=12), **params)
+    model = Simulation(construction="bulk", **params)
+    agents = model.schedule.agents
+    humans = [agent for agent in agents if agent.typeCode < BENIGN]
+    assert len(set(agent.pos for agent in agents)) == len(agents) == model.numAgents
+    assert [agent.unique_id for agent in agents] == sorted(agent.unique_id for agent in agents)
+    assert model.numHumans == len(humans) == model.happy
+    assert model.totalMisinformedHumans == sum(agent.misinformed for agent in humans)
+    codes = [agent.typeCode for agent in agents]
+    assert model.totalMaliciousLLMs == codes.count(MALICIOUS)
+    assert model.totalBenignLLMs == codes.count(BENIGN)
+    assert model.totalTrustingHumans == codes.count(TRUSTING)
+    if model.emptyCells is not None:
+        assert len(model.emptyCells) == model.width * model.height - len(agents)
+        assert not any(model.emptyCells.is_empty(agent.pos) for agent in agents)
+
+    # The same distribution as the cell by cell construction, from other draws
+    sequential = Simulation(construction="sequential", **params)
+    for counter in ("numAgents", "numLLMs", "totalMaliciousLLMs", "totalTrustingHumans", "totalMisinformedHumans"):
+        expected = getattr(sequential, counter)
+        assert abs(getattr(model, counter) - expected) <= 5 * np.sqrt(max(expected, 1)) + 1
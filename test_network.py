@@ -0,0 +1,101 @@
+# Made by Kiwi!
+
+import numpy as np
+import pytest
+
+from model import BENIGN, TRUSTING, UNTRUSTING, Simulation, rewire
+from network import NetworkSpace, csr_from_edges, scale_free_edges, small_world_edges
+
+
+def rows(indptr, indices):
+    return [indices[indptr[node]:indptr[node + 1]].tolist() for node in range(len(indptr) - 1)]
+
+
+def check_network(model):
+    '''
+    Every follow points at the agent on its node, and the LLM counts match the follows
+    '''
+    network = model.network
+    assert all(network.agents[node].pos == node for node in range(network.numNodes))
+    assert [agent.pos for agent in network.neighborAgents] == network.indices.tolist()
+    for node, follows in enumerate(rows(network.indptr, network.indices)):
+        assert node not in follows
+        assert len(set(follows)) == len(follows)
+        assert network.count(node) == sum(network.agents[other].typeCode >= BENIGN for other in follows)
+    assert network.isLLM.tolist() == [agent.typeCode >= BENIGN for agent in network.agents]
+
+
+def test_csr_drops_loops_and_repeats():
+    indptr, indices = csr_from_edges([0, 1, 1, 2, 3], [1, 2, 2, 2, 0], 4)
+    assert rows(indptr, indices) == [[1, 3], [0, 2], [1], [0]]
+    indptr, indices = csr_from_edges([0, 1, 1, 2, 3], [1, 2, 2, 2, 0], 4, directed=True)
+    assert rows(indptr, indices) == [[1], [2], [], [0]]
+
+
+def test_small_world_without_rewiring_is_a_ring_lattice():
+    sources, targets = small_world_edges(10, 4, 0.0, np.random.default_rng(1))
+    follows = rows(*csr_from_edges(sources, targets, 10))
+    assert follows[0] == [1, 2, 8, 9]
+    assert all(len(row) == 4 for row in follows)
+
+
+def test_scale_free_edges_attach_preferentially():
+    nodes, degree = 20000, 4
+    sources, targets = scale_free_edges(nodes, degree, np.random.default_rng(3))
+    assert len(sources) == (nodes - 1) * degree // 2
+    # Every node links to nodes that came before it
+    assert (targets < sources).all() and (targets >= 0).all()
+    degrees = np.diff(csr_from_edges(sources, targets, nodes)[0])
+    assert degrees.min() >= 1
+    assert abs(degrees.mean() - degree) < 0.2
+    # Hubs: the oldest nodes collect far more links than the average
+    assert degrees[:10].mean() > 20 * degree
+    assert degrees.max() > 50 * degrees.mean()
+
+
+@pytest.mark.parametrize("network", ["small-world", "scale-free"])
+def test_network_space_stays_consistent_while_humans_rewire(network):
+    model = Simulation(space="network", network=network, networkNodes=400, networkDegree=6, seed=2, inconvenienceThreshold=3, maxIterations=15)
+    assert model.numAgents == 400
+    check_network(model)
+    degrees = np.diff(model.network.indptr)
+    moves = model.totalNumMoves
+    while model.running:
+        model.step()
+    assert model.totalNumMoves > moves
+    check_network(model)
+    assert (np.diff(model.network.indptr) == degrees).all()
+
+
+def test_rewire_swaps_a_follow_for_the_nearest_wanted_node():
+    model = Simulation(space="network", networkNodes=400, networkDegree=6, networkRewiring=0.2, seed=7, inconvenienceThreshold=3)
+    network = model.network
+    rewired = 0
+    for agent in model.schedule.agents:
+        if agent.typeCode not in (TRUSTING, UNTRUSTING):
+            continue
+        wantLLM = agent.typeCode == TRUSTING
+        before = network.neighbor_nodes(agent.pos).tolist()
+        candidates = [node for node in network.within(agent.pos, model.InconvenienceThreshold) if network.isLLM[node] == wantLLM]
+        found, _ = rewire(agent)
+        after = network.neighbor_nodes(agent.pos).tolist()
+        if not found:
+            assert after == before
+            continue
+        rewired += 1
+        (dropped,) = set(before) - set(after)
+        (added,) = set(after) - set(before)
+        assert network.isLLM[dropped] != wantLLM
+        assert added == candidates[0]
+        assert len(after) == len(before)
+    assert rewired > 10
+    check_network(model)
+
+
+def test_edge_list_file(tmp_path):
+    path = tmp_path / "edges.txt"
+    path.write_text("# follower followed\n10 20\n20 30\n30 10\n40 10\n")
+    model = Simulation(space="network", network=str(path), seed=1)
+    assert isinstance(model.network, NetworkSpace)
+    assert model.numAgents == 4
+    assert rows(model.network.indptr, model.network.indices) == [[1, 2, 3], [0, 2], [0, 1], [0]]
@@ -0,0 +1,94 @@
+# Made by Kiwi!
+
+import random
+from collections import Counter
+
+import pytest
+from mesa.space import SingleGrid
+
+from model import BENIGN, Simulation
+from space import EmptyCellIndex, SparseEmptyCellIndex, SparseGrid
+
+
+@pytest.mark.parametrize("width, height, radius", [(30, 30, 1), (30, 30, 3), (7, 5, 2), (5, 9, 4)])
+def test_empty_cells_within_follow_mesa_order(width, height, radius):
+    model = Simulation(width=width, height=height, density=0.6, seed=1)
+    grid = model.grid
+    assert isinstance(grid, SingleGrid)
+    for agent in model.schedule.agents:
+        expected = [
+            cell for cell in grid.get_neighborhood(agent.pos, moore=True, include_center=False, radius=radius)
+            if grid.is_cell_empty(cell)
+        ]
+        assert model.emptyCells.within(agent.pos, radius) == expected
+
+
+class Token:
+    pos = None
+
+
+def test_sparse_grid_places_and_moves_like_single_grid():
+    grid = SparseGrid(5, 4)
+    first, second = Token(), Token()
+    grid.place_agent(first, (1, 1))
+    grid.place_agent(second, (2, 3))
+    assert not grid.is_cell_empty((1, 1)) and grid.is_cell_empty((0, 0))
+    with pytest.raises(Exception):
+        grid.place_agent(Token(), (1, 1))
+
+    # Positions wrap around the torus
+    grid.move_agent(first, (6, -1))
+    assert first.pos == (1, 3)
+    assert grid.is_cell_empty((1, 1))
+    with pytest.raises(Exception):
+        grid.move_agent(first, (2, 3))
+    assert first.pos == (1, 3) and grid.agents == {(1, 3): first, (2, 3): second}
+
+    grid.remove_agent(second)
+    assert second.pos is None and grid.agents == {(1, 3): first}
+
+
+def test_sparse_empty_cell_sampling_is_uniform_over_empty_cells():
+    index = SparseEmptyCellIndex(4, 5)
+    occupied = [(x, y) for x in range(4) for y in range(5) if (x + y) % 3 == 0]
+    index.reset(occupied)
+    assert len(index) == 20 - len(occupied)
+
+    rng = random.Random(2)
+    draws = Counter(index.sample(rng) for _ in range(13000))
+    empty = [(x, y) for x in range(4) for y in range(5) if (x, y) not in occupied]
+    assert set(draws) == set(empty)
+    expected = 13000 / len(empty)
+    assert max(abs(count - expected) for count in draws.values()) < 5 * expected ** 0.5
+
+    index.reset([(x, y) for x in range(4) for y in range(5)])
+    with pytest.raises(Exception):
+        index.sample(rng)
+
+
+@pytest.mark.parametrize("radius", [1, 2, 3])
+def test_sparse_empty_cells_within_match_the_dense_index(radius):
+    rng = random.Random(radius)
+    occupied = {(rng.randrange(9), rng.randrange(7)) for _ in range(30)}
+    dense, sparse = EmptyCellIndex(9, 7), SparseEmptyCellIndex(9, 7)
+    dense.reset(occupied)
+    sparse.reset(occupied)
+    for x in range(9):
+        for y in range(7):
+            assert sparse.within((x, y), radius) == dense.within((x, y), radius)
+
+
+def test_sparse_simulation_keeps_its_indexes_in_step():
+    model = Simulation(space="sparse", width=60, height=50, density=0.3, radius=2, inconvenienceThreshold=4, seed=3)
+    for _ in range(8):
+        model.step()
+    assert model.totalNumMoves > 0
+    agents = model.schedule.agents
+    positions = {agent.pos: agent for agent in agents}
+    assert model.grid.agents == positions
+    assert model.emptyCells.occupied == set(positions)
+    LLMs = [agent for agent in agents if agent.typeCode >= BENIGN]
+    for agent in agents[:200]:
+        neighborhood = set(model.neighborhoods.neighborhood(agent.pos, model.radius)) - {agent.pos}
+        assert set(model.neighborhoods.neighbors(agent.pos)) == {positions[pos] for pos in neighborhood if pos in positions}
+        assert model.LLMField.count(agent.pos) == sum(LLM.pos in neighborhood for LLM in LLMs)
@@ -0,0 +1,114 @@
+# Made by Kiwi!
+
+import json
+import os
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+import sweep
+from model import Simulation
+
+REPO = os.path.dirname(os.path.abspath(__file__))
+
+real_run_simulation = sweep.run_simulation
+
+
+def dying_run(params, engine="agents", checkpoint=None, saveCheckpoint=None):
+    '''
+    Worker function of the sweep test: the runs with radius 9 kill their worker process
+    '''
+    if params["radius"] == 9:
+        with open(os.path.join(os.path.dirname(params["outputDir"]), "attempts"), "a") as attempts:
+            attempts.write(params["outputDir"] + "\n")
+        os._exit(1)
+    return real_run_simulation(params, engine, checkpoint, saveCheckpoint)
+
+
+def test_sweep_charges_a_dead_worker_only_to_its_run(tmp_path, monkeypatch):
+    monkeypatch.setattr(sweep, "run_simulation", dying_run)
+    grid = {"radius": [1, 9, 2], "width": 10, "height": 10, "maxIterations": 3}
+    results = list(sweep.sweep(grid, replicas=2, outputRoot=str(tmp_path / "sweep"), seed=1, processes=2))
+
+    assert sorted(result["run"] for result in results) == list(range(6))
+    for result in results:
+        if result["params"]["radius"] == 9:
+            assert result["error"] == "worker process died"
+        else:
+            assert "error" not in result
+            assert result["iterations"] == 3
+
+    # The shared pool may or may not have started a dying run before it broke, after that
+    # every dying run is tried once alone and then retried MAX_RETRIES times
+    with open(tmp_path / "sweep" / "attempts") as attempts:
+        runs = attempts.read().split()
+    for outputDir in set(runs):
+        assert sweep.MAX_RETRIES + 1 <= runs.count(outputDir) <= sweep.MAX_RETRIES + 2
+    with open(tmp_path / "sweep" / "results.jsonl") as stored:
+        assert len(stored.readlines()) == 6
+
+
+def run_fingerprint(params):
+    '''
+    The final agent states of a seeded run, computed in a fresh interpreter
+    '''
+    script = (
+        "import json, sys\n"
+        "from model import Simulation\n"
+        "model = Simulation(**json.loads(sys.argv[1]))\n"
+        "while model.running:\n"
+        "    model.step()\n"
+        "print(json.dumps([[a.unique_id, a.pos, a.output, a.confidence] for a in model.schedule.agents]))\n"
+    )
+    environment = dict(os.environ, PYTHONPATH=REPO, PYTHONHASHSEED="random")
+    output = subprocess.run(
+        [sys.executable, "-c", script, json.dumps(params)], env=environment, capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+@pytest.mark.parametrize("params", [
+    dict(width=25, height=25, seed=8, maxIterations=10),
+    dict(width=25, height=25, seed=8, maxIterations=10, construction="bulk", activation="dirty"),
+])
+def test_seeded_runs_repeat_across_processes(params):
+    first = run_fingerprint(params)
+    assert run_fingerprint(params) == first
+
+    model = Simulation(**params)
+    while model.running:
+        model.step()
+    here = [[agent.unique_id, list(agent.pos), agent.output, agent.confidence] for agent in model.schedule.agents]
+    assert here == first
+
+
+def test_cached_runs_are_replayed(tmp_path):
+    grid = {"radius": [1, 2], "width": 10, "height": 10, "maxIterations": 4}
+    cache = str(tmp_path / "cache")
+    first = sorted(sweep.sweep(grid, outputRoot=str(tmp_path / "first"), seed=5, cache=cache, processes=1), key=lambda r: r["run"])
+    second = sorted(sweep.sweep(grid, outputRoot=str(tmp_path / "second"), seed=5, cache=cache, processes=1), key=lambda r: r["run"])
+
+    assert not any(result.get("cached") for result in first)
+    assert all(result["cached"] for result in second)
+    for computed, cached in zip(first, second):
+        assert cached["series"] == computed["series"]
+        assert cached["params"]["seed"] == computed["params"]["seed"]
+
+
+def test_code_version_only_follows_the_simulation_modules(tmp_path, monkeypatch):
+    for name in os.listdir(REPO):
+        if name.endswith(".py"):
+            shutil.copy(os.path.join(REPO, name), tmp_path / name)
+    monkeypatch.setattr(sweep, "__file__", str(tmp_path / "sweep.py"))
+    version = sweep.code_version()
+
+    for name in ("test_sweep.py", "benchmark.py", "batch.py"):
+        with open(tmp_path / name, "a") as source:
+            source.write("\n# edited\n")
+    assert sweep.code_version() == version
+
+    with open(tmp_path / "model.py", "a") as source:
+        source.write("\n# edited\n")
+    assert sweep.code_version() != version
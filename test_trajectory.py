@@ -0,0 +1,61 @@
+# Made by Kiwi!
+
+import json
+
+import numpy as np
+import pytest
+
+from model import Simulation
+from trajectory import TrajectoryRecorder, read_trajectory
+
+
+def state(agents):
+    return [(agent.pos, agent.output, np.float32(agent.confidence)) for agent in agents]
+
+
+@pytest.mark.parametrize("stride", [1, 3])
+def test_trajectory_round_trip(tmp_path, stride):
+    path = str(tmp_path / "run.npy")
+    model = Simulation(width=20, height=20, seed=2, maxIterations=10, trajectory=path, trajectoryStride=stride)
+    tracked = model.trajectory.agents
+    expected = {0: state(tracked)}
+    while model.running:
+        model.step()
+        expected[model.iterations] = state(tracked)
+
+    records, agentIds, steps = read_trajectory(path)
+    assert isinstance(records, np.memmap)
+    assert agentIds.tolist() == [agent.unique_id for agent in tracked]
+    assert steps.tolist() == list(range(0, model.iterations + 1, stride))
+    for row, step in enumerate(steps.tolist()):
+        recorded = [
+            ((int(x), int(y)), int(output), confidence)
+            for x, y, output, confidence in zip(records["x"][row], records["y"][row], records["output"][row], records["confidence"][row])
+        ]
+        assert recorded == expected[step]
+
+
+def test_trajectory_of_some_agents(tmp_path):
+    path = str(tmp_path / "some.npy")
+    model = Simulation(width=20, height=20, seed=2, maxIterations=5, trajectory=path, trajectoryAgents=[3, 1, 40])
+    while model.running:
+        model.step()
+    records, agentIds, steps = read_trajectory(path)
+    assert sorted(agentIds.tolist()) == [1, 3, 40]
+    assert records.shape == (6, 3)
+
+
+def test_rows_become_visible_on_flush(tmp_path):
+    path = str(tmp_path / "flush.npy")
+    model = Simulation(width=10, height=10, seed=1, maxIterations=20)
+    recorder = TrajectoryRecorder(path, model.schedule.agents, 0, 20)
+    with open(path + ".json") as stored:
+        assert json.load(stored)["rows"] == 0
+    for step in range(4):
+        recorder.record(step)
+    assert len(read_trajectory(path)[0]) == 0
+    recorder.flush()
+    assert len(read_trajectory(path)[0]) == 4
+    recorder.record(4)
+    recorder.close()
+    assert read_trajectory(path)[2].tolist() == [0, 1, 2, 3, 4]
@@ -0,0 +1,248 @@
+# Made by Kiwi!
+
+import multiprocessing
+import os
+import shutil
+import tempfile
+import traceback
+import weakref
+
+import numpy as np
+
+from array_model import AGENT_FIELDS, ArraySimulation, Tile
+from model import TRUSTING, UNTRUSTING
+
+# Arrays the worker processes share with the model, besides the agent fields
+SHARED_FIELDS = AGENT_FIELDS + ("LLMsInRadius", "shouldMove", "trustingTarget", "untrustingTarget")
+
+
+def tile_bounds(width, tiles):
+    '''
+    (start, stop) rows of every tile, the tiles are as even as they can be
+    '''
+    return [(tile * width // tiles, (tile + 1) * width // tiles) for tile in range(tiles)]
+
+
+def tile_seed(seed, tile):
+    '''
+    Relocation and influence streams of one tile, independent of the model's own streams
+    '''
+    relocationSeed, influenceSeed = np.random.SeedSequence(seed, spawn_key=(3 + tile,)).spawn(2)
+    return np.random.default_rng(relocationSeed), np.random.default_rng(influenceSeed)
+
+
+class TileWorker(ArraySimulation):
+    """
+    One tile of a TiledSimulation, stepped in its own worker process
+
+    The worker maps the model's arrays from shared memory, so it reads the whole grid
+    and writes the rows of its tile in place. Its halo is read straight from the
+    neighboring tiles, which is safe because the model only starts a phase once every
+    tile finished the one before.
+    """
+
+    def __init__(self, spec):
+        """
+        Attach to the shared arrays of a TiledSimulation.
+
+        Args:
+            spec: Dict made by TiledSimulation.start_workers
+        """
+        for name, value in spec["params"].items():
+            setattr(self, name, value)
+        for name, (path, dtype, shape) in spec["fields"].items():
+            setattr(self, name, np.memmap(path, dtype=dtype, mode="r+", shape=shape))
+        self.agentFields = [getattr(self, name) for name in AGENT_FIELDS]
+        self.tile = Tile(self.width, self.height, spec["start"], spec["stop"], halo=self.radius)
+        self.relocationRandom, self.influenceRandom = tile_seed(self.seed, spec["index"])
+        self.pending = None
+
+    def census_tile(self):
+        return self.census(self.tile)
+
+    def empty_tile_cells(self):
+        return self.empty_cells(self.tile)
+
+    def prepare_search(self):
+        self.clear_random_moves(self.tile)
+        if self.InconvenienceThreshold > 1:
+            self.mark_targets(self.tile)
+
+    def search_tile(self, code):
+        return self.search(self.tile, code, self.relocationRandom)
+
+    def influence_tile(self):
+        '''
+        Work out the influence phase of the tile's humans, and return the part of it that
+        lands outside the tile for the model to count
+        '''
+        humans = self.tile.cells(self.stepping(self.tile.own(self.kind)))
+        effects = self.influence_cells(humans, self.influenceRandom)
+        self.pending = humans, effects
+        return {name: effects[name] for name in ("flips", "flippedLLMs", "flippedHumans", "creditTypes")}
+
+    def commit_tile(self):
+        self.commit_influence(*self.pending)
+        self.pending = None
+
+    def confidence_tile(self):
+        self.update_confidence(self.tile)
+
+    def count_tile(self):
+        return self.human_counts(self.tile)
+
+
+def tile_worker(connection, spec):
+    '''
+    Body of a worker process, runs the commands the model sends until it's told to stop
+    '''
+    worker = TileWorker(spec)
+    while True:
+        command, args = connection.recv()
+        if command is None:
+            break
+        try:
+            connection.send(getattr(worker, command)(*args))
+        except Exception:
+            connection.send(RuntimeError("Tile %d failed:\n%s" % (spec["index"], traceback.format_exc())))
+    connection.close()
+
+
+def stop_workers(connections, processes, directory):
+    for connection in connections:
+        try:
+            connection.send((None, ()))
+        except OSError:
+            pass
+    for process in processes:
+        process.join(timeout=5)
+        if process.is_alive():
+            process.terminate()
+    shutil.rmtree(directory, ignore_errors=True)
+
+
+class TiledSimulation(ArraySimulation):
+    """
+    ArraySimulation split into bands of rows (tiles) that are stepped in parallel processes
+
+    The arrays live in shared memory. Every phase of the step runs on all tiles at once,
+    and the model waits for all of them before starting the next phase, so each tile reads
+    the rows around it (its halo) as they were at the end of the previous phase. Moves can
+    cross tiles, so the tiles only report who wants to move where, and the model settles
+    every move itself in one deterministic merge, in tile order.
+
+    Each tile draws from its own random streams, so a run does not reproduce the
+    single-process ArraySimulation with the same seed, but it has the same statistics.
+    """
+
+    def __init__(self, tiles=None, **params):
+        """
+        Create a new tiled Simulation model.
+
+        Args:
+            tiles: Number of tiles and worker processes, one per core by default. It is
+                   lowered when needed so every tile is wider than the radius
+            params: The same as ArraySimulation
+        """
+        super().__init__(**params)
+        if self.width < 2 * self.radius + 1:
+            raise ValueError("A tiled grid must be at least 2 * radius + 1 wide")
+        if tiles is None:
+            tiles = os.cpu_count() or 1
+        self.tiles = max(1, min(tiles, self.width // (self.radius + 1)))
+        # Pipes to the worker processes, started on the first step
+        self.workers = None
+        self.processes = []
+
+        # Move every array the workers touch into shared memory
+        self.sharedDir = tempfile.mkdtemp(prefix="tiles-", dir="/dev/shm" if os.path.isdir("/dev/shm") else None)
+        self.sharedFields = {}
+        for name in SHARED_FIELDS:
+            array = getattr(self, name)
+            path = os.path.join(self.sharedDir, name)
+            shared = np.memmap(path, dtype=array.dtype, mode="w+", shape=array.shape)
+            shared[:] = array
+            setattr(self, name, shared)
+            self.sharedFields[name] = (path, array.dtype.str, array.shape)
+        self.agentFields = [getattr(self, name) for name in AGENT_FIELDS]
+        self.connections = []
+        self.finalizer = weakref.finalize(self, stop_workers, self.connections, self.processes, self.sharedDir)
+
+    def start_workers(self):
+        context = multiprocessing.get_context("spawn")
+        params = {
+            name: getattr(self, name) for name in (
+                "width", "height", "radius", "InconvenienceThreshold", "maliciousLLMs",
+                "proportionLLMs", "resistance", "offsets", "seed",
+            )
+        }
+        connections, processes = self.connections, self.processes
+        for index, (start, stop) in enumerate(tile_bounds(self.width, self.tiles)):
+            spec = {"params": params, "fields": self.sharedFields, "index": index, "start": start, "stop": stop}
+            connection, child = context.Pipe()
+            process = context.Process(target=tile_worker, args=(child, spec), daemon=True)
+            process.start()
+            child.close()
+            connections.append(connection)
+            processes.append(process)
+        self.workers = connections
+
+    def close(self):
+        '''
+        Stop the worker processes and free the shared memory, the model keeps its last state
+        '''
+        self.finalizer()
+        self.workers = []
+
+    def call(self, command, *args):
+        '''
+        Run a command on every tile at once and return the replies in tile order
+        '''
+        if self.workers is None:
+            self.start_workers()
+        for connection in self.workers:
+            connection.send((command, args))
+        replies = [connection.recv() for connection in self.workers]
+        for reply in replies:
+            if isinstance(reply, Exception):
+                raise reply
+        return replies
+
+    def relocate(self):
+        leaving = np.concatenate(self.call("census_tile"))
+        if len(leaving):
+            self.move_randomly(leaving, np.concatenate(self.call("empty_tile_cells")))
+        self.call("prepare_search")
+
+        if self.InconvenienceThreshold <= 1:
+            return
+
+        for code in (TRUSTING, UNTRUSTING):
+            found = self.call("search_tile", code)
+            losers = self.settle(np.concatenate([movers for movers, _ in found]), np.concatenate([choice for _, choice in found]))
+            # The few humans that lost a contested cell search again here, on the shared arrays
+            while len(losers):
+                losers = self.settle(*self.search(self.wholeGrid, code, self.relocationRandom, losers))
+
+    def influence(self):
+        counts = self.call("influence_tile")
+        self.call("commit_tile")
+        for effects in counts:
+            self.count_influence(effects)
+
+    def update_confidence(self, tile=None):
+        self.call("confidence_tile")
+
+    def count_humans(self):
+        if not getattr(self, "workers", None):
+            # Still populating the grid, or the workers were stopped
+            super().count_humans()
+            return
+        counts = self.call("count_tile")
+        self.totalMisinformedHumans = sum(misinformed for misinformed, _ in counts)
+        self.happy = sum(happy for _, happy in counts)
+
+    def step(self):
+        super().step()
+        if not self.running:
+            self.close()
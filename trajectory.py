@@ -0,0 +1,96 @@
+# Made by Kiwi!
+
+import json
+
+import numpy as np
+
+# One record per agent and recorded step
+TRAJECTORY_DTYPE = np.dtype([
+    ("x", "<i4"), ("y", "<i4"), ("output", "i1"), ("confidence", "<f4"), ("information", "<f4"),
+])
+
+
+class TrajectoryRecorder:
+    """
+    Per-step position, output, confidence and information of a set of agents, in a memory-mapped file
+
+    The file is a .npy array of TRAJECTORY_DTYPE records with one row per recorded step and
+    one column per agent. It is preallocated for every step the run can take, so recording
+    only writes into the mapped pages and never grows anything in memory. The agent ids go
+    to path + ".agents.npy", and the steps and number of rows written to path + ".json". That
+    file is written when the recorder is created and again by flush and close, not on every
+    row, so a trajectory read while the run still goes on (see read_trajectory) has the rows
+    up to the latest flush.
+    """
+
+    def __init__(self, path, agents, firstStep, lastStep, stride=1):
+        """
+        Create a trajectory file, overwriting any file at path.
+
+        Args:
+            path: The .npy file of the records
+            agents: The agents to record, in column order
+            firstStep, lastStep: Steps of the first and the latest possible row
+            stride: Record every stride-th step
+        """
+        if stride < 1:
+            raise ValueError("The trajectory stride must be at least 1")
+        self.path = path
+        self.agents = list(agents)
+        self.firstStep = firstStep
+        self.stride = stride
+        self.rows = 0
+        shape = ((lastStep - firstStep) // stride + 1, len(self.agents))
+        self.records = np.lib.format.open_memmap(path, mode="w+", dtype=TRAJECTORY_DTYPE, shape=shape)
+        np.save(path + ".agents.npy", np.array([agent.unique_id for agent in self.agents], dtype=np.int64))
+        self.write_metadata()
+
+    def record(self, step):
+        '''
+        Write the agents' current state as the row of step, if the stride records it
+        '''
+        if (step - self.firstStep) % self.stride or self.rows == len(self.records):
+            return
+        row = self.records[self.rows]
+        agents = self.agents
+        if agents and not isinstance(agents[0].pos, tuple):
+            # On a network the position is the node, recorded as (node, 0)
+            row["x"] = [agent.pos for agent in agents]
+            row["y"] = 0
+        else:
+            row["x"] = [agent.pos[0] for agent in agents]
+            row["y"] = [agent.pos[1] for agent in agents]
+        row["output"] = [agent.output for agent in agents]
+        row["confidence"] = [agent.confidence for agent in agents]
+        # LLMs have no information of their own
+        row["information"] = [getattr(agent, "information", 0) for agent in agents]
+        self.rows += 1
+
+    def flush(self):
+        '''
+        Flush the records to the file and make the rows so far visible to read_trajectory
+        '''
+        self.records.flush()
+        self.write_metadata()
+
+    def close(self):
+        self.flush()
+
+    def write_metadata(self):
+        with open(self.path + ".json", "w") as metadata:
+            json.dump({"firstStep": self.firstStep, "stride": self.stride, "rows": self.rows}, metadata)
+
+
+def read_trajectory(path):
+    '''
+    Open a trajectory written by TrajectoryRecorder without reading it into memory
+    Returns the records as a read-only memory-mapped (steps, agents) array, the agent id of
+    every column and the step of every row
+    e.g. records["confidence"][:, agentIds == 42] is the confidence of agent 42 over the run
+    '''
+    with open(path + ".json") as stored:
+        metadata = json.load(stored)
+    rows = metadata["rows"]
+    records = np.load(path, mmap_mode="r")[:rows]
+    steps = metadata["firstStep"] + metadata["stride"] * np.arange(rows)
+    return records, np.load(path + ".agents.npy", mmap_mode="r"), steps